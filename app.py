@@ -1,21 +1,25 @@
 import sys
 import pathlib
 import os
+import time
+
+_import_start = time.perf_counter()
 
 # ensure project root is importable
 project_root = pathlib.Path(__file__).resolve().parents[0]
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
+import click
 from flask import Flask, redirect, url_for, render_template
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from src.models import db, init_db, User
-from flask_migrate import Migrate
 from flask_babel import Babel
 from flask import request
+from src.timing import startup
 
 def get_locale():
     # Check if language is in query string
@@ -28,8 +32,15 @@ def get_locale():
 from config import get_config
 from src.logging_config import setup_logging, log_request
 
+startup.record('import app modules', time.perf_counter() - _import_start)
+
 def create_app(config_name=None):
-    """Application factory pattern."""
+    """Application factory pattern.
+
+    Only cheap set-up happens here; the disease matcher and the AI client are
+    created by warm_up() (see src/blueprints/main.py).
+    """
+    start = time.perf_counter()
     app = Flask(__name__)
     
     # Load configuration
@@ -40,10 +51,15 @@ def create_app(config_name=None):
     # Initialize logging
     setup_logging(app)
     log_request(app)
+    start = startup.lap('create_app.config', start)
     
     # Initialize extensions
     init_db(app)
-    migrate = Migrate(app, db)
+    if click.get_current_context(silent=True) is not None:
+        # Flask-Migrate (alembic) only serves the `flask db` commands, so it is
+        # registered when the app is loaded by the flask CLI, not in workers
+        from flask_migrate import Migrate
+        migrate = Migrate(app, db)
     babel = Babel(app, locale_selector=get_locale)
     
     # CSRF Protection
@@ -70,6 +86,8 @@ def create_app(config_name=None):
     def load_user(user_id):
         return User.query.get(user_id)
     
+    start = startup.lap('create_app.extensions', start)
+
     # Register Blueprints
     from src.blueprints.auth import auth_bp
     from src.blueprints.patients import patients_bp
@@ -80,6 +98,12 @@ def create_app(config_name=None):
     app.register_blueprint(patients_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(admin_bp)
+    # machine-facing JSON endpoint: callers post JSON, not forms with a CSRF token. It is
+    # deliberately open like /match: it reads only the public catalog, stores nothing,
+    # makes no AI call and is capped by MATCH_API_MAX_QUERIES, so there is no session
+    # action for a forged request to ride on
+    csrf.exempt('src.blueprints.main.api_match')
+    start = startup.lap('create_app.blueprints', start)
     
     # Error Handlers
     @app.errorhandler(404)
@@ -112,8 +136,17 @@ def create_app(config_name=None):
     
     return app
 
+def warm_up(app):
+    """Build the matcher and the AI client now instead of on the first request."""
+    from src.blueprints.main import warm_up as warm_up_main
+    with app.app_context():
+        warm_up_main()
+    app.logger.info("Startup phases (ms): " + ", ".join(
+        f"{stage} {s['max_ms']:.0f}" for stage, s in startup.stats().items()))
+
 app = create_app()
 
 if __name__ == '__main__':
+    warm_up(app)
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=app.config.get('DEBUG', True))
 
@@ -37,6 +37,17 @@ class Config:
     
     # API Keys
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+    AI_CACHE_ENABLED = os.environ.get('AI_CACHE_ENABLED', 'True').lower() == 'true'
+    AI_CACHE_PATH = os.environ.get('AI_CACHE_PATH', str(basedir / 'instance' / 'ai_cache.sqlite3'))  # shared by workers
+    AI_CACHE_TTL = float(os.environ.get('AI_CACHE_TTL', 86400))  # seconds
+    AI_CACHE_MEMORY_ITEMS = int(os.environ.get('AI_CACHE_MEMORY_ITEMS', 256))  # per worker
+    AI_CACHE_MAX_MB = float(os.environ.get('AI_CACHE_MAX_MB', 50))  # on disk
+    AI_LIMITER_PATH = os.environ.get('AI_LIMITER_PATH', str(basedir / 'instance' / 'ai_quota.sqlite3'))  # shared by workers
+    AI_RATE_PER_MINUTE = float(os.environ.get('AI_RATE_PER_MINUTE', 60))  # Gemini requests per minute, all workers
+    AI_BURST = int(os.environ.get('AI_BURST', 10))
+    AI_MAX_CONCURRENT = int(os.environ.get('AI_MAX_CONCURRENT', 4))  # in-flight Gemini requests per worker
+    AI_DEADLINE = float(os.environ.get('AI_DEADLINE', 3.0))  # with AI_STREAMING off: seconds a page waits for Gemini
+    AI_STREAMING = os.environ.get('AI_STREAMING', 'True').lower() == 'true'  # stream AI answers to pages (SSE)
     
     # Security
     SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', 'False').lower() == 'true'
@@ -59,6 +70,10 @@ class Config:
     
     # Disease Matcher
     DISEASE_CSV_PATH = os.environ.get('DISEASE_CSV', str(basedir / 'data' / 'diseases.csv'))
+    MATCHER_WATCH_INTERVAL = float(os.environ.get('MATCHER_WATCH_INTERVAL', 2.0))  # seconds, 0 disables
+    MATCHER_SHARED = os.environ.get('MATCHER_SHARED', 'True').lower() == 'true'  # one model for all workers
+    MATCHER_TIMING = os.environ.get('MATCHER_TIMING', 'True').lower() == 'true'  # per-stage timings on /status
+    MATCH_API_MAX_QUERIES = int(os.environ.get('MATCH_API_MAX_QUERIES', 10000))  # per /api/match request
     
     # Supported Languages
     LANGUAGES = ['en', 'es']
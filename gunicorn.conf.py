@@ -0,0 +1,17 @@
+"""
+Gunicorn settings: gunicorn -c gunicorn.conf.py app:app
+
+Importing app.py is cheap (heavy libraries are imported lazily, see
+src/lazy.py), so each worker warms up the matcher and the AI client in
+post_worker_init, before it accepts its first request.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+timeout = 120
+
+
+def post_worker_init(worker):
+    from app import app, warm_up
+    warm_up(app)
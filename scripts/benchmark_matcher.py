@@ -0,0 +1,290 @@
+"""Reproducible DiseaseMatcher benchmarks on scaled synthetic catalogs.
+
+For each catalog size (default 1k, 10k, 100k and 1M rows) this generates a
+catalog and query workload with `stream_csv` from scripts/generate_diseases.py
+and measures, in a fresh process per size so peak RSS is that size's alone:
+
+- fit time and peak RSS after the fit, after querying and overall,
+- match() p50/p99 latency for the workload's three query kinds: clean symptom
+  lists, the same with a typo, and symptoms replaced by their synonyms,
+- match() and match_many() throughput over all query sets,
+- find_by_name() p50/p99 latency, exact and substring,
+- reload() time (a full refit of the same CSV) and, with the artifact enabled,
+  the time to open the memory-mapped artifact in a new matcher.
+
+The result cache is disabled so every match is scored. Catalogs and workloads
+are byte-for-byte reproducible for a given --seed; they are kept in
+--catalog-dir and reused.
+
+Runs offline with the repo's own dependencies. Results go to a JSON file;
+--compare prints the change against an earlier one.
+
+    python scripts/benchmark_matcher.py
+    python scripts/benchmark_matcher.py --sizes 1000 10000 --out before.json
+    python scripts/benchmark_matcher.py --sizes 1000 10000 --compare before.json
+"""
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts.generate_diseases import stream_csv  # noqa: E402
+
+SYNONYMS_PATH = ROOT / 'data' / 'symptoms_synonyms.csv'
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# rows sampled into each catalog's query workload; --queries takes up to that many per kind
+WORKLOAD_QUERIES = 3000
+
+
+def catalog_paths(catalog_dir: Path, rows: int, seed: int) -> Tuple[Path, Path]:
+    return (catalog_dir / f'catalog_{rows}_seed{seed}.csv',
+            catalog_dir / f'catalog_{rows}_seed{seed}.queries.csv')
+
+
+def read_workload(path: str, count: int) -> Tuple[dict, dict]:
+    """Match query sets by kind and find_by_name queries, from a generated workload file."""
+    sets = {'clean': [], 'typo': [], 'synonym': []}
+    names = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if len(sets.get(row['kind'], ())) < count:
+                sets[row['kind']].append(row['query'])
+            if len(names) < count:
+                names.append(row['disease'])
+    rng = random.Random(0)
+    substring = []
+    for name in names:
+        start = rng.randrange(0, max(1, len(name) - 4))
+        substring.append(name[start:start + rng.randint(4, 8)])
+    return sets, {'exact': [n.lower() for n in names], 'substring': substring}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+
+def latency(fn, inputs: list) -> dict:
+    times = []
+    for x in inputs:
+        start = time.perf_counter()
+        fn(x)
+        times.append(time.perf_counter() - start)
+    ms = np.asarray(times) * 1000
+    return {'p50_ms': float(np.percentile(ms, 50)), 'p99_ms': float(np.percentile(ms, 99)),
+            'mean_ms': float(ms.mean())}
+
+
+def bench_size(csv_path: str, workload_path: str, queries: int, canonicalize: bool, artifact: bool) -> dict:
+    """Measure one catalog; meant to run in its own process."""
+    from src.matcher import DiseaseMatcher
+
+    rss_before = peak_rss_mb()
+    matcher = DiseaseMatcher(synonyms_path=str(SYNONYMS_PATH), use_artifact=False, cache_size=0,
+                             canonicalize=canonicalize)
+    start = time.perf_counter()
+    matcher.fit_from_csv(csv_path)
+    fit_s = time.perf_counter() - start
+    fit_rss = peak_rss_mb()
+
+    sets, names = read_workload(workload_path, queries)
+    for q in sets['clean'][:10]:
+        matcher.match(q)
+    match_latency = {name: latency(matcher.match, qs) for name, qs in sets.items()}
+    everything = [q for qs in sets.values() for q in qs]
+    start = time.perf_counter()
+    for q in everything:
+        matcher.match(q)
+    match_qps = len(everything) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    matcher.match_many(everything)
+    match_many_qps = len(everything) / (time.perf_counter() - start)
+    query_rss = peak_rss_mb()
+
+    find_latency = {
+        'exact': latency(lambda n: matcher.find_by_name(n, exact=True), names['exact']),
+        'substring': latency(matcher.find_by_name, names['substring']),
+    }
+
+    start = time.perf_counter()
+    matcher.reload()
+    reload_s = time.perf_counter() - start
+
+    result = {
+        'rows': matcher.status()['source_rows'],
+        'entries': matcher.status()['entries'],
+        'fit_seconds': fit_s,
+        'fit_peak_rss_mb': fit_rss,
+        'import_rss_mb': rss_before,
+        'match_latency': match_latency,
+        'match_qps': match_qps,
+        'match_many_qps': match_many_qps,
+        'query_peak_rss_mb': query_rss,
+        'find_by_name_latency': find_latency,
+        'reload_seconds': reload_s,
+    }
+    del matcher
+    if artifact:
+        with tempfile.TemporaryDirectory(prefix='matcher-bench-') as tmp:
+            # the artifact lives next to the CSV; link it into a scratch directory
+            tmp_csv = Path(tmp) / Path(csv_path).name
+            os.symlink(os.path.abspath(csv_path), tmp_csv)
+            builder = DiseaseMatcher(synonyms_path=str(SYNONYMS_PATH), cache_size=0, canonicalize=canonicalize)
+            start = time.perf_counter()
+            builder.fit_from_csv(str(tmp_csv))
+            result['artifact_build_seconds'] = time.perf_counter() - start
+            del builder
+            loader = DiseaseMatcher(synonyms_path=str(SYNONYMS_PATH), cache_size=0, canonicalize=canonicalize)
+            start = time.perf_counter()
+            loader.fit_from_csv(str(tmp_csv))
+            result['artifact_load_seconds'] = time.perf_counter() - start
+            result['artifact_match_latency'] = latency(loader.match, sets['clean'])
+            del loader
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def environment() -> dict:
+    import scipy
+    import sklearn
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'scikit-learn': sklearn.__version__,
+    }
+
+
+def run(sizes: list, queries: int, seed: int, canonicalize: bool, artifact: bool, catalog_dir: Path) -> dict:
+    results = []
+    # spawn: each size starts from a clean interpreter, so ru_maxrss is its own peak
+    ctx = multiprocessing.get_context('spawn')
+    for rows in sizes:
+        path, workload = catalog_paths(catalog_dir, rows, seed)
+        if not (path.exists() and workload.exists()):
+            start = time.perf_counter()
+            stream_csv(path, rows, seed=seed, queries_path=workload, query_count=WORKLOAD_QUERIES)
+            print(f"generated {path} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        try:
+            with ProcessPoolExecutor(1, mp_context=ctx) as pool:
+                result = pool.submit(bench_size, str(path), str(workload), queries, canonicalize,
+                                     artifact).result()
+        except BrokenProcessPool:
+            # typically the OOM killer; keep the sizes measured so far
+            result = {'error': 'benchmark process died (out of memory?)'}
+        result = {'size': rows, **result}
+        results.append(result)
+        print_row(result)
+    return {
+        'environment': environment(),
+        'settings': {'sizes': sizes, 'queries': queries, 'seed': seed, 'canonicalize': canonicalize,
+                     'artifact': artifact},
+        'results': results,
+    }
+
+
+HEADER = (f"{'size':>9}  {'fit s':>7}  {'RSS MB':>7}  {'match p50':>9}  {'p99':>7}  {'typo p50':>8}  "
+          f"{'syn p50':>7}  {'match/s':>8}  {'many/s':>8}  {'find p50':>8}  {'reload s':>8}")
+
+
+def print_row(r: dict) -> None:
+    if not getattr(print_row, 'header', False):
+        print(HEADER)
+        print_row.header = True
+    if 'error' in r:
+        print(f"{r['size']:>9}  {r['error']}")
+        return
+    ml = r['match_latency']
+    print(f"{r['size']:>9}  {r['fit_seconds']:>7.2f}  {r['peak_rss_mb']:>7.0f}  {ml['clean']['p50_ms']:>9.3f}  "
+          f"{ml['clean']['p99_ms']:>7.3f}  {ml['typo']['p50_ms']:>8.3f}  {ml['synonym']['p50_ms']:>7.3f}  "
+          f"{r['match_qps']:>8.0f}  {r['match_many_qps']:>8.0f}  "
+          f"{r['find_by_name_latency']['substring']['p50_ms']:>8.3f}  {r['reload_seconds']:>8.2f}")
+
+
+# (label, path into a result); lower is better for all but the throughputs
+COMPARED = [
+    ('fit_seconds', ('fit_seconds',)),
+    ('peak_rss_mb', ('peak_rss_mb',)),
+    ('match p50 clean', ('match_latency', 'clean', 'p50_ms')),
+    ('match p99 clean', ('match_latency', 'clean', 'p99_ms')),
+    ('match p50 typo', ('match_latency', 'typo', 'p50_ms')),
+    ('match p50 synonym', ('match_latency', 'synonym', 'p50_ms')),
+    ('match_qps', ('match_qps',)),
+    ('match_many_qps', ('match_many_qps',)),
+    ('find p50 exact', ('find_by_name_latency', 'exact', 'p50_ms')),
+    ('find p50 substring', ('find_by_name_latency', 'substring', 'p50_ms')),
+    ('reload_seconds', ('reload_seconds',)),
+]
+
+
+def _get(result: dict, path: tuple):
+    for key in path:
+        result = result.get(key) if isinstance(result, dict) else None
+    return result
+
+
+def compare(old: dict, new: dict) -> None:
+    """Print new/old ratios per size for the headline metrics."""
+    old_by_size = {r['size']: r for r in old.get('results', [])}
+    for r in new['results']:
+        before = old_by_size.get(r['size'])
+        if before is None:
+            continue
+        print(f"size {r['size']} (vs {old.get('environment', {}).get('commit') or 'baseline'}):")
+        for label, path in COMPARED:
+            a, b = _get(before, path), _get(r, path)
+            if a and b is not None:
+                print(f"  {label:<20} {a:>12.3f} -> {b:>12.3f}  ({b / a:.2f}x)")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    p = argparse.ArgumentParser(prog='benchmark_matcher')
+    p.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    p.add_argument('--queries', type=int, default=200, help='queries per query set')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--no-canonicalize', action='store_true', help='skip merging rows that repeat a disease name')
+    p.add_argument('--no-artifact', action='store_true', help='skip the artifact build/load measurements')
+    p.add_argument('--catalog-dir', default=str(ROOT / 'benchmarks' / 'catalogs'))
+    p.add_argument('--out', help='JSON results file (default: benchmarks/results/<timestamp>.json)')
+    p.add_argument('--compare', help='earlier results file to compare against')
+    args = p.parse_args()
+    report = run(args.sizes, args.queries, args.seed, not args.no_canonicalize, not args.no_artifact,
+                 Path(args.catalog_dir))
+    out = Path(args.out) if args.out else \
+        ROOT / 'benchmarks' / 'results' / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f"wrote {out}")
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text(encoding='utf-8')), report)
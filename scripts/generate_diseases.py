@@ -4,8 +4,18 @@ This script programmatically builds an expanded dataset (default 500 rows)
 using a curated list of common diseases and symptom templates. It's intended
 for prototyping only — please replace with a verified medical dataset for
 production use.
+
+`--stream` switches to a seeded large-scale mode (`stream_csv`) for stressing
+the matcher: rows are written to disk as they are generated, so any row count
+fits in constant memory. Symptom frequencies follow a Zipf-like skew over a
+configurable vocabulary, some symptoms are misspelt or replaced by a synonym
+from data/symptoms_synonyms.csv, and an optional query workload file is
+written alongside. For a given seed and settings the output is byte-for-byte
+identical on every machine: only a seeded `random.Random` is used and nothing
+depends on set or hash ordering.
 """
 import csv
+import itertools
 import random
 from pathlib import Path
 
@@ -106,14 +116,203 @@ def generate_csv(out_path: Path, target: int = 500) -> None:
             writer.writerow(r)
 
 
+# building blocks for the synthetic part of the streaming vocabulary and names
+BODY_SITES = [
+    "head", "neck", "eye", "ear", "nose", "throat", "jaw", "tongue", "gum", "lip", "scalp", "chest",
+    "breast", "rib", "abdomen", "stomach", "bowel", "bladder", "kidney", "groin", "pelvis", "hip",
+    "back", "spine", "shoulder", "arm", "elbow", "wrist", "hand", "finger", "thigh", "knee", "calf",
+    "ankle", "foot", "toe", "skin", "muscle", "joint", "lymph node",
+]
+FINDINGS = [
+    "pain", "swelling", "numbness", "itching", "rash", "stiffness", "tingling", "redness",
+    "bleeding", "weakness", "cramps", "tenderness", "burning", "discharge", "lump", "spasms",
+]
+QUALIFIERS = ["", "mild", "severe", "sharp", "dull", "intermittent", "persistent", "sudden"]
+NAME_PREFIXES = ["Acute", "Chronic", "Idiopathic", "Familial", "Viral", "Bacterial", "Autoimmune",
+                 "Degenerative", "Reactive", "Juvenile"]
+NAME_KINDS = ["Syndrome", "Disorder", "Inflammation", "Infection", "Neuropathy", "Dysfunction",
+              "Lesion", "Strain"]
+DEFAULT_SYNONYMS = Path(__file__).resolve().parent.parent / 'data' / 'symptoms_synonyms.csv'
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    """One edit past the first letter: drop a letter, swap it with the next, or replace it."""
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice('abcdefghijklmnopqrstuvwxyz'.replace(word[i], '')) + word[i + 1:]
+
+
+def misspell_phrase(phrase: str, rng: random.Random) -> str:
+    words = phrase.split()
+    long_words = [j for j, w in enumerate(words) if len(w) >= 5]
+    if long_words:
+        j = rng.choice(long_words)
+        words[j] = misspell(words[j], rng)
+    return ' '.join(words)
+
+
+def load_synonyms(path: Path = DEFAULT_SYNONYMS) -> dict:
+    """canonical symptom -> list of synonyms, in file order; empty if the file is missing."""
+    out = {}
+    try:
+        with Path(path).open(newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                syns = [s.strip() for s in (row.get('synonyms') or '').split(';') if s.strip()]
+                if syns and row.get('canonical'):
+                    out[row['canonical'].strip().lower()] = syns
+    except OSError:
+        pass
+    return out
+
+
+def build_vocabulary(size: int, synonyms: dict, rng: random.Random) -> list:
+    """`size` distinct symptoms, most common first.
+
+    The curated symptoms (BASE_DISEASES, then the synonym file's canonical
+    terms) take the top ranks; the rest are site/finding/qualifier phrases in
+    a seeded order.
+    """
+    vocab = []
+    seen = set()
+    curated = [s for _, symptoms, _ in BASE_DISEASES for s in symptoms] + list(synonyms)
+    for term in curated:
+        if term not in seen:
+            seen.add(term)
+            vocab.append(term)
+    synthetic = [' '.join(filter(None, (q, site, finding)))
+                 for q, site, finding in itertools.product(QUALIFIERS, BODY_SITES, FINDINGS)]
+    rng.shuffle(synthetic)
+    for term in synthetic:
+        if len(vocab) >= size:
+            break
+        if term not in seen:
+            seen.add(term)
+            vocab.append(term)
+    if len(vocab) < size:
+        raise ValueError(f"vocabulary size {size} exceeds the {len(vocab)} symptoms available")
+    return vocab[:size]
+
+
+def disease_names():
+    """Endless distinct disease names: the curated ones, then prefix/site/kind combinations."""
+    for name, _, _ in BASE_DISEASES:
+        yield name
+    combos = [f"{prefix} {site.title()} {kind}"
+              for prefix, site, kind in itertools.product(NAME_PREFIXES, BODY_SITES, NAME_KINDS)]
+    for n in itertools.count(1):
+        for name in combos:
+            yield name if n == 1 else f"{name} Type {n}"
+
+
+def stream_csv(out_path: Path, count: int, seed: int = 0, vocab_size: int = 500, skew: float = 1.1,
+               min_symptoms: int = 2, max_symptoms: int = 6, misspell_rate: float = 0.02,
+               synonym_rate: float = 0.1, synonyms_path: Path = DEFAULT_SYNONYMS,
+               queries_path: Path = None, query_count: int = 1000) -> None:
+    """Write `count` rows to `out_path` one at a time.
+
+    Each row gets a distinct disease name and `min_symptoms`..`max_symptoms`
+    distinct symptoms drawn with probability proportional to 1 / rank**skew.
+    Every symptom is independently replaced by a synonym with probability
+    `synonym_rate` (when it has one) and misspelt with `misspell_rate`. A row
+    never gets more symptoms than the vocabulary holds.
+
+    If `queries_path` is given, `query_count` rows are reservoir-sampled
+    (with a separate RNG, so the catalog does not depend on the query
+    settings) and written as kind,query,disease: a clean subset of the row's
+    symptoms, the same with a typo, or with synonyms where available.
+    """
+    if vocab_size < 1 or not 1 <= min_symptoms <= max_symptoms:
+        raise ValueError("need vocab_size >= 1 and 1 <= min_symptoms <= max_symptoms")
+    rng = random.Random(seed)
+    synonyms = load_synonyms(synonyms_path)
+    vocab = build_vocabulary(vocab_size, synonyms, rng)
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) ** skew for rank in range(len(vocab))))
+    tips = [t for _, _, t in BASE_DISEASES]
+    names = disease_names()
+    sample_rng = random.Random(seed + 1)
+    reservoir = []
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with out_path.open('w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['disease', 'symptoms', 'tips'])
+        for i in range(count):
+            # drawing k distinct symptoms from fewer would never finish
+            k = min(rng.randint(min_symptoms, max_symptoms), len(vocab))
+            picked = []
+            while len(picked) < k:
+                term = rng.choices(vocab, cum_weights=cum_weights)[0]
+                if term not in picked:
+                    picked.append(term)
+            written = []
+            for term in picked:
+                if term in synonyms and rng.random() < synonym_rate:
+                    term = rng.choice(synonyms[term])
+                if rng.random() < misspell_rate:
+                    term = misspell_phrase(term, rng)
+                written.append(term)
+            name = next(names)
+            writer.writerow((name, '; '.join(written), rng.choice(tips)))
+            if queries_path is not None:
+                # reservoir sample of (name, clean symptoms)
+                if len(reservoir) < query_count:
+                    reservoir.append((name, picked))
+                else:
+                    j = sample_rng.randrange(i + 1)
+                    if j < query_count:
+                        reservoir[j] = (name, picked)
+
+    if queries_path is not None:
+        write_queries(Path(queries_path), reservoir, synonyms, sample_rng)
+
+
+def write_queries(path: Path, sampled: list, synonyms: dict, rng: random.Random) -> None:
+    """Query workload as kind,query,disease; kinds rotate clean, typo, synonym."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['kind', 'query', 'disease'])
+        for n, (name, symptoms) in enumerate(sampled):
+            picked = rng.sample(symptoms, k=rng.randint(1, min(3, len(symptoms))))
+            kind = ('clean', 'typo', 'synonym')[n % 3]
+            if kind == 'synonym' and not any(s in synonyms for s in picked):
+                kind = 'clean'
+            if kind == 'typo':
+                picked = [misspell_phrase(s, rng) for s in picked]
+            elif kind == 'synonym':
+                picked = [rng.choice(synonyms[s]) if s in synonyms else s for s in picked]
+            writer.writerow((kind, ', '.join(picked), name))
+
+
 if __name__ == '__main__':
     import argparse
 
     p = argparse.ArgumentParser(prog='generate_diseases')
     p.add_argument('--out', default='data/diseases_expanded.csv')
     p.add_argument('--count', type=int, default=500)
+    p.add_argument('--stream', action='store_true', help='seeded large-scale mode (see stream_csv)')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--vocab-size', type=int, default=500)
+    p.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of symptom frequencies')
+    p.add_argument('--misspell-rate', type=float, default=0.02)
+    p.add_argument('--synonym-rate', type=float, default=0.1)
+    p.add_argument('--synonyms', default=str(DEFAULT_SYNONYMS))
+    p.add_argument('--queries', help='also write a query workload CSV to this path (--stream only)')
+    p.add_argument('--query-count', type=int, default=1000)
     args = p.parse_args()
     out = Path(args.out)
     print(f"Generating {args.count} diseases into {out}")
-    generate_csv(out, target=args.count)
+    if args.stream:
+        stream_csv(out, args.count, seed=args.seed, vocab_size=args.vocab_size, skew=args.skew,
+                   misspell_rate=args.misspell_rate, synonym_rate=args.synonym_rate,
+                   synonyms_path=Path(args.synonyms), queries_path=Path(args.queries) if args.queries else None,
+                   query_count=args.query_count)
+    else:
+        generate_csv(out, target=args.count)
     print("Done.")
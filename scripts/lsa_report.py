@@ -0,0 +1,125 @@
+"""Recall versus latency of DiseaseMatcher(scoring='lsa') against the exact paths.
+
+For a sample of catalog-derived queries this prints, per `nprobe` setting:
+
+- recall@k of the IVF search against an exhaustive search of the same LSA
+  embeddings (how much the approximate index loses),
+- overlap@k with the exact sparse TF-IDF engine (how differently LSA ranks),
+- p50/p99 scoring latency per query, next to the sparse engine's.
+
+Latency covers scoring only (projection, probe, top-k); query preparation is
+the same for every engine and is left out. Queries are 1-3 symptoms taken from
+random catalog rows, so every query has at least one relevant row.
+
+    python scripts/lsa_report.py --csv data/diseases.csv
+    python scripts/lsa_report.py --csv big.csv --no-canonicalize --json report.json
+"""
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.matcher import DiseaseMatcher  # noqa: E402
+
+
+def sample_queries(matcher: DiseaseMatcher, count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    records = matcher.records
+    queries = []
+    for _ in range(count):
+        items = [s.strip() for s in records[rng.randrange(len(records))].symptoms.split(';') if s.strip()]
+        if items:
+            queries.append(' and '.join(rng.sample(items, k=min(len(items), rng.randint(1, 3)))))
+    return queries
+
+
+def timed_rows(matcher: DiseaseMatcher, q_vecs: list, top_k: int) -> tuple:
+    rows, times = [], []
+    for q_vec in q_vecs:
+        start = time.perf_counter()
+        picked, _ = matcher._score(matcher.model, q_vec, top_k, 0.0)
+        times.append(time.perf_counter() - start)
+        rows.append(set(picked.tolist()))
+    ms = np.asarray(times) * 1000
+    return rows, float(np.percentile(ms, 50)), float(np.percentile(ms, 99))
+
+
+def run(csv_path: str, queries: int, top_k: int, components: int, lists, nprobes: list,
+        canonicalize: bool, seed: int) -> dict:
+    exact = DiseaseMatcher(use_artifact=False, canonicalize=canonicalize)
+    exact.fit_from_csv(csv_path)
+    start = time.perf_counter()
+    lsa = DiseaseMatcher(scoring='lsa', use_artifact=False, canonicalize=canonicalize,
+                         lsa_components=components, ann_lists=lists)
+    lsa.fit_from_csv(csv_path)
+    fit_s = time.perf_counter() - start
+    index = lsa.model.lsa
+
+    texts = sample_queries(exact, queries, seed)
+    q_vecs = [exact.model.vectorizer.transform([' '.join(exact._prepare_query(exact.model, t))]) for t in texts]
+    exact_rows, exact_p50, exact_p99 = timed_rows(exact, q_vecs, top_k)
+
+    index.nprobe = index.n_lists
+    truth, brute_p50, brute_p99 = timed_rows(lsa, q_vecs, top_k)
+    settings = []
+    for nprobe in sorted({min(n, index.n_lists) for n in nprobes}):
+        index.nprobe = nprobe
+        rows, p50, p99 = timed_rows(lsa, q_vecs, top_k)
+        settings.append({
+            'nprobe': nprobe,
+            'recall_at_k': float(np.mean([len(r & t) / max(len(t), 1) for r, t in zip(rows, truth)])),
+            'overlap_with_sparse_at_k': float(np.mean([len(r & e) / max(len(e), 1) for r, e in zip(rows, exact_rows)])),
+            'p50_ms': p50,
+            'p99_ms': p99,
+        })
+    return {
+        'csv': csv_path,
+        'rows': len(exact.records),
+        'queries': len(texts),
+        'top_k': top_k,
+        'components': int(index.components.shape[0]),
+        'lists': index.n_lists,
+        'lsa_fit_seconds': fit_s,
+        'sparse': {'p50_ms': exact_p50, 'p99_ms': exact_p99},
+        'lsa_exhaustive': {'p50_ms': brute_p50, 'p99_ms': brute_p99},
+        'ivf': settings,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"{report['rows']} rows, {report['queries']} queries, top_k={report['top_k']}, "
+          f"{report['components']} components, {report['lists']} lists "
+          f"(LSA fit {report['lsa_fit_seconds']:.1f}s)")
+    print(f"sparse TF-IDF:   p50 {report['sparse']['p50_ms']:.3f} ms  p99 {report['sparse']['p99_ms']:.3f} ms")
+    print(f"LSA exhaustive:  p50 {report['lsa_exhaustive']['p50_ms']:.3f} ms  "
+          f"p99 {report['lsa_exhaustive']['p99_ms']:.3f} ms")
+    print(f"{'nprobe':>6}  {'recall@k':>8}  {'overlap@k':>9}  {'p50 ms':>8}  {'p99 ms':>8}")
+    for s in report['ivf']:
+        print(f"{s['nprobe']:>6}  {s['recall_at_k']:>8.3f}  {s['overlap_with_sparse_at_k']:>9.3f}  "
+              f"{s['p50_ms']:>8.3f}  {s['p99_ms']:>8.3f}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    p = argparse.ArgumentParser(prog='lsa_report')
+    p.add_argument('--csv', default='data/diseases.csv')
+    p.add_argument('--queries', type=int, default=500)
+    p.add_argument('--top-k', type=int, default=3)
+    p.add_argument('--components', type=int, default=128)
+    p.add_argument('--lists', type=int, default=None, help='IVF lists (default: sqrt(rows))')
+    p.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    p.add_argument('--no-canonicalize', action='store_true', help='keep duplicate disease rows')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--json', help='also write the report to this file')
+    args = p.parse_args()
+    report = run(args.csv, args.queries, args.top_k, args.components, args.lists, args.nprobe,
+                 not args.no_canonicalize, args.seed)
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding='utf-8')
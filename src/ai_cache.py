@@ -0,0 +1,304 @@
+"""
+Prompt-response cache for AIClient.
+
+Gemini answers to the same prompt are reused instead of paying for another
+call: /find sends the same "comprehensive information about the disease"
+prompt for every lookup of a name, /match the same recommendation prompt for
+the same symptoms.
+
+`PromptCache` has two tiers:
+
+- an in-process LRU of `memory_items` entries,
+- a SQLite file (`path`) shared by every worker on the host, bounded to
+  `max_bytes` of response text; the least recently used rows are evicted
+  first.
+
+Entries live for `ttl` seconds (wall clock, so an entry promoted from disk to
+memory keeps its original expiry). Keys come from `prompt_key()`: a hash of the
+model name, the whitespace-normalised prompt text and, for multimodal calls, a
+content hash of each image. Only successful responses are stored; AIClient
+never passes its "AI Error:" / "AI Unreachable" strings in, and `put()` refuses
+them as well.
+
+Disk errors (locked or unwritable database) are logged and count as misses,
+so the cache never fails a request.
+
+`fill_lock(key)` lets workers coalesce identical misses: the worker that
+takes the key's lock file calls the model while the others wait for it and
+then find the answer in the shared file. A waiter blocks in flock() on a
+helper thread, so it wakes as soon as the lock is released and never
+polls; after `timeout` seconds it stops waiting and calls the model itself
+(the in-process SingleFlight and the QuotaLimiter still apply). Lock files
+are striped over 4096 names next to the database (`<path>.locks/`), and
+without fcntl (Windows) the lock is a no-op.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process coalescing
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# AIClient's failure strings; never worth caching
+ERROR_PREFIXES = ('AI Error:', 'AI Unreachable', 'AI Client Error')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL
+)
+"""
+
+
+def _part_digest(part) -> Optional[bytes]:
+    """Stable bytes for one content part, or None if the part cannot be keyed."""
+    if isinstance(part, str):
+        return b's' + ' '.join(part.split()).encode('utf-8')
+    if isinstance(part, (bytes, bytearray)):
+        return b'b' + hashlib.sha256(part).digest()
+    if hasattr(part, 'tobytes') and hasattr(part, 'size') and hasattr(part, 'mode'):
+        # PIL image: hash the decoded pixels, so re-encoded uploads of the same picture match
+        h = hashlib.sha256(f'{part.mode}{part.size}'.encode('ascii'))
+        h.update(part.tobytes())
+        return b'i' + h.digest()
+    return None
+
+
+def prompt_key(model_name: str, content) -> Optional[str]:
+    """Cache key for a generate_content() call, or None if `content` has a part we cannot hash."""
+    parts = content if isinstance(content, (list, tuple)) else [content]
+    h = hashlib.sha256(model_name.encode('utf-8'))
+    for part in parts:
+        digest = _part_digest(part)
+        if digest is None:
+            return None
+        h.update(len(digest).to_bytes(8, 'big'))
+        h.update(digest)
+    return h.hexdigest()
+
+
+def _take_lock(f, timeout: float):
+    """Block in flock() on `f` for at most `timeout` seconds; returns `f` once locked, or None.
+
+    The blocking call runs on a helper thread, so the caller sleeps on an event
+    instead of polling. If the caller gives up first, the helper unlocks and
+    closes `f` as soon as its flock() returns.
+    """
+    taken = threading.Event()
+    guard = threading.Lock()
+    state = {'abandoned': False, 'locked': False}
+
+    def wait():
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            locked = True
+        except OSError:
+            locked = False
+        with guard:
+            state['locked'] = locked
+            if not state['abandoned']:
+                taken.set()
+                return
+        if locked:
+            fcntl.flock(f, fcntl.LOCK_UN)
+        f.close()
+
+    threading.Thread(target=wait, name='ai-cache-lock', daemon=True).start()
+    taken.wait(timeout)
+    with guard:
+        if taken.is_set() and state['locked']:
+            return f
+        if not taken.is_set():
+            # the helper still owns `f` and closes it when its flock() returns
+            state['abandoned'] = True
+            return None
+    f.close()
+    return None
+
+
+class PromptCache:
+    """Two-tier (memory LRU + shared SQLite) cache of model responses; see the module docstring."""
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 86400.0, memory_items: int = 256,
+                 max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.disk_errors = 0
+        if path:
+            try:
+                self._db = self._connect(path)
+            except sqlite3.Error as e:
+                logger.warning(f"AI cache disabled on disk ({path}): {e}")
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = sqlite3.connect(path, timeout=2.0, check_same_thread=False, isolation_level=None)
+        # WAL lets workers read while another one writes
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute(_SCHEMA)
+        db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        return db
+
+    def _remember(self, key: str, expires: float, value: str) -> None:
+        # caller holds the lock
+        if self.memory_items <= 0:
+            return
+        self._memory[key] = (expires, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: Optional[str], count_miss: bool = True) -> Optional[str]:
+        """Return the cached response for `key`, or None (not counted as a miss if count_miss is False)."""
+        if key is None:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] >= now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._memory[key]
+            if self._db is not None:
+                try:
+                    row = self._db.execute('SELECT value, expires FROM responses WHERE key = ? AND expires >= ?',
+                                           (key, now)).fetchone()
+                    if row is not None:
+                        self._db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+                        self._remember(key, row[1], row[0])
+                        self.disk_hits += 1
+                        return row[0]
+                except sqlite3.Error as e:
+                    self.disk_errors += 1
+                    logger.warning(f"AI cache read failed: {e}")
+            if count_miss:
+                self.misses += 1
+            return None
+
+    @contextmanager
+    def fill_lock(self, key: Optional[str], timeout: float = 20.0):
+        """Hold the cross-worker lock for filling `key`; gives up waiting after `timeout` seconds.
+
+        Yields True if this process waited for another one, so the caller should
+        look the key up again before calling the model.
+        """
+        if fcntl is None or self._db is None or key is None:
+            yield False
+            return
+        lock_dir = self.path + '.locks'
+        try:
+            os.makedirs(lock_dir, exist_ok=True)
+            f = open(os.path.join(lock_dir, key[:3] + '.lock'), 'a')
+        except OSError as e:
+            logger.warning(f"AI cache lock unavailable: {e}")
+            yield False
+            return
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f = _take_lock(f, timeout)
+            waited = True
+        else:
+            waited = False
+        try:
+            yield waited
+        finally:
+            if f is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+                f.close()
+
+    def put(self, key: Optional[str], value: str) -> None:
+        """Store a successful response; error strings and empty responses are ignored."""
+        if key is None or not value or value.startswith(ERROR_PREFIXES):
+            return
+        now = time.time()
+        expires = now + self.ttl
+        with self._lock:
+            self._remember(key, expires, value)
+            self.stores += 1
+            if self._db is None:
+                return
+            size = len(value.encode('utf-8'))
+            try:
+                self._db.execute('INSERT OR REPLACE INTO responses (key, value, size, expires, accessed) '
+                                 'VALUES (?, ?, ?, ?, ?)', (key, value, size, expires, now))
+                self._evict(now)
+            except sqlite3.Error as e:
+                self.disk_errors += 1
+                logger.warning(f"AI cache write failed: {e}")
+
+    def _evict(self, now: float) -> None:
+        """Drop expired rows, then least recently used rows until the file is under max_bytes."""
+        self.evictions += self._db.execute('DELETE FROM responses WHERE expires < ?', (now,)).rowcount
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        doomed = []
+        for key, size in self._db.execute('SELECT key, size FROM responses ORDER BY accessed'):
+            if total - freed <= self.max_bytes:
+                break
+            doomed.append((key,))
+            freed += size
+        self._db.executemany('DELETE FROM responses WHERE key = ?', doomed)
+        self.evictions += len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM responses')
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            disk_entries = disk_bytes = 0
+            if self._db is not None:
+                try:
+                    disk_entries, disk_bytes = self._db.execute(
+                        'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+                except sqlite3.Error:
+                    pass
+            return {
+                'memory_entries': len(self._memory),
+                'memory_items': self.memory_items,
+                'disk_entries': disk_entries,
+                'disk_bytes': disk_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'disk_errors': self.disk_errors,
+                'hit_rate': hits / lookups if lookups else 0.0,
+            }
@@ -1,15 +1,39 @@
-import google.generativeai as genai
-import time
 import logging
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from src.ai_cache import prompt_key
+from src.ai_limiter import PRIORITY_STANDARD
+from src.lazy import lazy_import
+from src.singleflight import SingleFlight, StreamFlight
+from src.timing import StageTimer
+
+# imported when the first AIClient is created (about a second on its own)
+genai = lazy_import('google.generativeai')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+BUSY_MESSAGE = "AI Unreachable: The AI service is busy. Please try again in a moment."
+RATE_LIMITED_MESSAGE = "AI Unreachable: Rate limit exceeded. Please try again later."
+
 class AIClient:
-    def __init__(self, api_key=None, model_name="gemini-2.5-flash"):
+    def __init__(self, api_key=None, model_name="gemini-2.5-flash", cache=None, limiter=None, max_workers=8):
         self.api_key = api_key
+        # optional PromptCache (src/ai_cache.py) consulted before every call
+        self.cache = cache
+        # optional QuotaLimiter (src/ai_limiter.py) that admits or sheds each outbound call
+        self.limiter = limiter
+        # concurrent identical prompts share one outbound call
+        self.flight = SingleFlight()
+        # runs submit() calls, so views can do local work while Gemini answers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai')
+        # concurrent identical streams read one streaming call, produced on the executor
+        self.streams = StreamFlight(self.executor)
+        # latency of blocking calls against time to first chunk of streamed ones, shown on /status
+        self.timer = StageTimer(enabled=True)
         if self.api_key:
             genai.configure(api_key=self.api_key)
         
@@ -23,28 +47,150 @@ class AIClient:
             logger.error(f"Error initializing model {self.model_name}: {e}")
             return None
 
-    def generate_content(self, content, retries=3, backoff_factor=2):
+    def generate_content(self, content, use_cache=True, priority=PRIORITY_STANDARD):
         """
-        Generates content with automatic retries for rate limit errors (429).
-        Content can be a string (prompt) or a list [prompt, image].
+        Generates content; content can be a string (prompt) or a list [prompt, image].
+        Successful responses are served from / stored in self.cache unless use_cache is False,
+        and concurrent calls with the same prompt share one request to the model.
+        When the limiter has no budget for `priority` (or Gemini answers 429) the call
+        returns an "AI Unreachable" message immediately instead of waiting to retry.
         """
         if not self.model:
             return "AI Client Error: Model not initialized."
 
-        delay = 1
-        for attempt in range(retries):
-            try:
-                response = self.model.generate_content(content)
-                return response.text.strip()
-            except Exception as e:
-                error_str = str(e)
-                if "429" in error_str or "quota" in error_str.lower():
-                    logger.warning(f"Rate limit hit (attempt {attempt + 1}/{retries}). Retrying in {delay}s...")
-                    time.sleep(delay)
-                    delay *= backoff_factor
-                else:
-                    logger.error(f"AI Generation Error: {e}")
-                    # For non-retriable errors, break and return friendly message
-                    return f"AI Error: {str(e)}"
-        
-        return "AI Unreachable: Rate limit exceeded. Please try again later."
+        key = prompt_key(self.model_name, content) if use_cache else None
+        if key is not None and self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        return self.flight.do(key, lambda: self._fill(key, content, priority))
+
+    def cached(self, content):
+        """The cached answer for `content`, or None (never calls the model)."""
+        if self.cache is None:
+            return None
+        return self.cache.get(prompt_key(self.model_name, content))
+
+    def stream_content(self, content, use_cache=True, priority=PRIORITY_STANDARD):
+        """
+        Like generate_content, but yields the answer in chunks as the model produces them.
+        A cached answer is yielded whole; a streamed one is cached once complete. Errors
+        and shed requests are yielded as the usual "AI Error" / "AI Unreachable" text.
+        """
+        if not self.model:
+            yield "AI Client Error: Model not initialized."
+            return
+        key = prompt_key(self.model_name, content) if use_cache else None
+        if key is not None and self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        yield from self.streams.do(key, lambda: self._stream_fill(key, content, priority))
+
+    def _stream_fill(self, key, content, priority):
+        if key is None or self.cache is None:
+            yield from self._stream_model(content, priority, None)
+            return
+        with self.cache.fill_lock(key) as waited:
+            if waited:
+                # another worker streamed the same prompt meanwhile: its answer is in the cache
+                cached = self.cache.get(key, count_miss=False)
+                if cached is not None:
+                    yield cached
+                    return
+            yield from self._stream_model(content, priority, key)
+
+    def _stream_model(self, content, priority, key):
+        if self.limiter is None:
+            yield from self._stream_request(content, key)
+            return
+        with self.limiter.admit(priority) as admitted:
+            if not admitted:
+                yield BUSY_MESSAGE
+                return
+            yield from self._stream_request(content, key)
+
+    def _stream_request(self, content, key):
+        start = time.perf_counter()
+        first = None
+        parts = []
+        try:
+            for chunk in self.model.generate_content(content, stream=True):
+                text = chunk.text
+                if not text:
+                    continue
+                if first is None:
+                    first = time.perf_counter() - start
+                    self.timer.record('stream.first_chunk', first)
+                parts.append(text)
+                yield text
+        except Exception as e:
+            separator = "\n\n" if parts else ""
+            if self._rate_limited(e):
+                yield separator + RATE_LIMITED_MESSAGE
+            else:
+                logger.error(f"AI Generation Error (stream): {e}")
+                yield separator + f"AI Error: {str(e)}"
+            return
+        total = time.perf_counter() - start
+        self.timer.record('stream.complete', total)
+        logger.info(f"Gemini stream: first chunk after {(first or total) * 1000:.0f} ms, "
+                    f"complete after {total * 1000:.0f} ms")
+        if self.limiter is not None:
+            self.limiter.record_success()
+        if key is not None:
+            self.cache.put(key, ''.join(parts).strip())
+
+    def _rate_limited(self, e):
+        """Whether `e` is a 429 / quota error; opens the limiter's back-off window if so."""
+        error_str = str(e)
+        if "429" not in error_str and "quota" not in error_str.lower():
+            return False
+        # no retry on this thread: the limiter sheds calls until its back-off window passes
+        delay = self.limiter.record_rate_limited() if self.limiter is not None else 0.0
+        logger.warning(f"Rate limit hit; shedding AI requests for {delay:.1f}s")
+        return True
+
+    def submit(self, content, **kwargs):
+        """Start generate_content(content, **kwargs) on the client's executor; returns a Future."""
+        return self.executor.submit(self.generate_content, content, **kwargs)
+
+    def _fill(self, key, content, priority):
+        """Call the model for a cache miss, unless another worker answers the same prompt first."""
+        if key is None or self.cache is None:
+            return self._call_model(content, priority)
+        with self.cache.fill_lock(key) as waited:
+            if waited:
+                cached = self.cache.get(key, count_miss=False)
+                if cached is not None:
+                    return cached
+            text = self._call_model(content, priority)
+            self.cache.put(key, text)
+            return text
+
+    def _call_model(self, content, priority):
+        if self.limiter is None:
+            return self._request(content)
+        with self.limiter.admit(priority) as admitted:
+            if not admitted:
+                return BUSY_MESSAGE
+            return self._request(content)
+
+    def _request(self, content):
+        start = time.perf_counter()
+        try:
+            # .text raises too, e.g. for a blocked response
+            text = self.model.generate_content(content).text.strip()
+        except Exception as e:
+            if self._rate_limited(e):
+                return RATE_LIMITED_MESSAGE
+            logger.error(f"AI Generation Error: {e}")
+            return f"AI Error: {str(e)}"
+        # nothing reaches the browser before the whole answer: this is the blocking path's first byte
+        elapsed = time.perf_counter() - start
+        self.timer.record('blocking.complete', elapsed)
+        logger.info(f"Gemini call: complete after {elapsed * 1000:.0f} ms")
+        if self.limiter is not None:
+            self.limiter.record_success()
+        return text
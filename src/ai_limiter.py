@@ -0,0 +1,208 @@
+"""
+Admission control for outbound Gemini requests.
+
+AIClient asks `QuotaLimiter.admit(priority)` before each request to the model.
+The answer is immediate: a request is either admitted or shed. A shed request
+gets a degraded "AI Unreachable" answer straight away, so no worker thread
+ever sleeps waiting for quota.
+
+Three checks, cheapest first:
+
+- a per-worker concurrency gate of `max_concurrent` slots. Lower priority
+  classes may only use part of it, so /chat still finds a free slot when
+  /find lookups pile up;
+- a shared back-off window: after a 429 the limiter refuses everything for
+  an exponentially growing, jittered interval instead of retrying in place;
+- a token bucket (`rate` requests per second, `burst` deep) shared by every
+  worker on the host through a small SQLite file. Lower priority classes
+  must leave a reserve of tokens for the higher ones.
+
+Without a `path` the bucket and back-off state live in this process only.
+"""
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# priority classes, most urgent first
+PRIORITY_INTERACTIVE = 0  # /chat
+PRIORITY_STANDARD = 1     # /match, /skin
+PRIORITY_LOOKUP = 2       # /find encyclopedia lookups
+
+# share of the concurrency slots and of the token bucket each class must leave free
+_SLOT_RESERVE = {PRIORITY_INTERACTIVE: 0.0, PRIORITY_STANDARD: 0.25, PRIORITY_LOOKUP: 0.5}
+_TOKEN_RESERVE = {PRIORITY_INTERACTIVE: 0.0, PRIORITY_STANDARD: 0.2, PRIORITY_LOOKUP: 0.4}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bucket (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    blocked_until REAL NOT NULL,
+    strikes INTEGER NOT NULL
+)
+"""
+
+
+class QuotaLimiter:
+    """Non-blocking concurrency gate, back-off window and shared token bucket; see the module docstring."""
+
+    def __init__(self, path: Optional[str] = None, rate: float = 1.0, burst: int = 10, max_concurrent: int = 4,
+                 base_backoff: float = 1.0, max_backoff: float = 60.0):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._in_use = 0
+        # in-process state, used when there is no shared file (or it cannot be opened)
+        self._state = (float(burst), time.time(), 0.0, 0)
+        self._strikes_seen = 0
+        self._db = None
+        self.admitted = 0
+        self.shed = {'concurrency': 0, 'backoff': 0, 'quota': 0}
+        self.rate_limited = 0
+        if path:
+            try:
+                self._db = self._connect(path)
+            except sqlite3.Error as e:
+                logger.warning(f"AI limiter not shared between workers ({path}): {e}")
+
+    def _connect(self, path: str) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = sqlite3.connect(path, timeout=1.0, check_same_thread=False, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute(_SCHEMA)
+        db.execute('INSERT OR IGNORE INTO bucket VALUES (0, ?, ?, 0, 0)', (float(self.burst), time.time()))
+        return db
+
+    def _update(self, fn):
+        """Apply fn(state, now) -> (new state or None, result) to the bucket state atomically.
+
+        Caller holds self._lock. With a shared file the read-modify-write is one
+        IMMEDIATE transaction, so workers never lose each other's updates. If the
+        file is unusable the in-process state is used instead.
+        """
+        now = time.time()
+        if self._db is not None:
+            try:
+                self._db.execute('BEGIN IMMEDIATE')
+                try:
+                    state = self._db.execute(
+                        'SELECT tokens, updated, blocked_until, strikes FROM bucket WHERE id = 0').fetchone()
+                    new_state, result = fn(state, now)
+                    if new_state is not None:
+                        self._db.execute('UPDATE bucket SET tokens = ?, updated = ?, blocked_until = ?, strikes = ? '
+                                         'WHERE id = 0', new_state)
+                    self._db.execute('COMMIT')
+                    return result
+                except BaseException:
+                    self._db.execute('ROLLBACK')
+                    raise
+            except sqlite3.Error as e:
+                logger.warning(f"AI limiter state unavailable, using this worker's own: {e}")
+        new_state, result = fn(self._state, now)
+        if new_state is not None:
+            self._state = new_state
+        return result
+
+    def _refill(self, state, now: float) -> float:
+        tokens, updated = state[0], state[1]
+        return min(float(self.burst), tokens + max(0.0, now - updated) * self.rate)
+
+    def _take(self, priority: int):
+        reserve = _TOKEN_RESERVE.get(priority, _TOKEN_RESERVE[PRIORITY_LOOKUP]) * self.burst
+
+        def fn(state, now):
+            _, _, blocked_until, strikes = state
+            self._strikes_seen = strikes
+            if now < blocked_until:
+                return None, 'backoff'
+            tokens = self._refill(state, now)
+            if tokens - 1.0 < reserve:
+                return (tokens, now, blocked_until, strikes), 'quota'
+            return (tokens - 1.0, now, blocked_until, strikes), None
+        return self._update(fn)
+
+    def _slots_for(self, priority: int) -> int:
+        share = 1.0 - _SLOT_RESERVE.get(priority, _SLOT_RESERVE[PRIORITY_LOOKUP])
+        return max(1, int(self.max_concurrent * share))
+
+    @contextmanager
+    def admit(self, priority: int = PRIORITY_STANDARD):
+        """Yield True if a request of this priority may go out now, False if it should be shed.
+
+        Never waits. An admitted request holds a concurrency slot until the block exits.
+        """
+        with self._lock:
+            if self._in_use >= self._slots_for(priority):
+                self.shed['concurrency'] += 1
+                reason = 'concurrency'
+            else:
+                reason = self._take(priority)
+                if reason is None:
+                    self._in_use += 1
+                    self.admitted += 1
+                else:
+                    self.shed[reason] += 1
+        if reason is not None:
+            logger.info(f"AI request shed (priority {priority}, {reason})")
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            with self._lock:
+                self._in_use -= 1
+
+    def record_rate_limited(self) -> float:
+        """Open a jittered, exponentially growing back-off window after a 429; returns its length in seconds."""
+        def fn(state, now):
+            tokens, _, blocked_until, strikes = state
+            strikes += 1
+            ceiling = min(self.max_backoff, self.base_backoff * 2 ** (strikes - 1))
+            # "equal jitter": at least half the ceiling, so workers do not all retry at once
+            delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+            return (0.0, now, max(blocked_until, now + delay), strikes), delay
+        with self._lock:
+            self.rate_limited += 1
+            return self._update(fn)
+
+    def record_success(self) -> None:
+        """Reset the back-off growth once a request goes through."""
+        with self._lock:
+            if not self._strikes_seen:
+                return
+            self._strikes_seen = 0
+            self._update(lambda state, now: ((state[0], state[1], state[2], 0), None))
+
+    def snapshot(self) -> Tuple[float, float]:
+        """Current (tokens, seconds of back-off left), without taking a token."""
+        with self._lock:
+            return self._update(lambda state, now: (None, (self._refill(state, now), max(0.0, state[2] - now))))
+
+    def stats(self) -> Dict[str, float]:
+        tokens, backoff = self.snapshot()
+        with self._lock:
+            return {
+                'tokens': tokens,
+                'burst': self.burst,
+                'rate_per_minute': self.rate * 60,
+                'backoff_seconds': backoff,
+                'in_flight': self._in_use,
+                'max_concurrent': self.max_concurrent,
+                'admitted': self.admitted,
+                'shed_concurrency': self.shed['concurrency'],
+                'shed_backoff': self.shed['backoff'],
+                'shed_quota': self.shed['quota'],
+                'rate_limited': self.rate_limited,
+                'shared': self._db is not None,
+            }
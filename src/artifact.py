@@ -0,0 +1,275 @@
+"""
+On-disk artifacts for a fitted DiseaseMatcher.
+
+An artifact is a directory of plain `.npy` files plus a `meta.json`. Arrays are
+loaded with `np.load(mmap_mode='r')`, so opening one costs a few page-table
+entries rather than a refit, and every process that maps the same files shares
+their pages through the OS page cache.
+
+Layout, next to the CSV it was built from:
+
+    data/diseases.csv.matcher/
+        current.json          # stat signature -> content key of the newest build
+        <key>/meta.json
+        <key>/<name>.npy
+
+`<key>` is a SHA-256 over the source files' contents and the build options, so
+a changed CSV or synonyms file always maps to a new directory and stale builds
+are never read. Publishing a build removes the older ones made with the same
+options; builds with other options belong to another configuration sharing the
+CSV and are kept.
+
+Several processes (e.g. gunicorn workers) can share one directory: `build_lock`
+makes sure only one of them fits a given build, and `current.json` carries a
+`generation` number that increases with every newly published key, so the
+others can switch to it by mapping the files (see DiseaseMatcher.start_shared).
+Leadership is an exclusive lock on `.leader.lock`: flock() on POSIX,
+msvcrt.locking() on Windows. Where neither exists `try_leader_lock` never
+succeeds, so no process leads; on Windows `build_lock` does not serialise
+builds either, and each process fits for itself.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from array import array
+from contextlib import contextmanager
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialised, see the module docstring
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:  # POSIX
+    msvcrt = None
+
+# bump when the set or meaning of stored arrays changes
+FORMAT_VERSION = 2
+
+
+def artifact_root(csv_path: str) -> Path:
+    """Directory holding artifacts built from `csv_path`."""
+    p = Path(csv_path)
+    return p.with_name(p.name + '.matcher')
+
+
+def stat_signature(paths: Sequence[str]) -> List:
+    sig = []
+    for path in paths:
+        try:
+            st = Path(path).stat()
+            sig.append([str(path), st.st_size, st.st_mtime_ns])
+        except OSError:
+            sig.append([str(path), None, None])
+    return sig
+
+
+def content_key(paths: Sequence[str], root: Optional[Path] = None,
+                options: Optional[dict] = None) -> Tuple[str, List]:
+    """Hash the contents of `paths` (missing files hash as absent) and any build `options`.
+
+    Returns (key, stat_signature). If `root` has a `current.json` whose stat
+    signature still matches the files, its key is reused so unchanged sources
+    are not re-read on every start. Options are part of the signature too, so
+    builds with different options never share that shortcut.
+    """
+    sig = stat_signature(paths)
+    if options:
+        sig.append(['options', json.dumps(options, sort_keys=True)])
+    if root is not None:
+        try:
+            current = json.loads((root / 'current.json').read_text(encoding='utf-8'))
+            if current.get('stat') == sig and current.get('format') == FORMAT_VERSION:
+                return current['key'], sig
+        except (OSError, ValueError, KeyError):
+            pass
+    h = hashlib.sha256(f"format={FORMAT_VERSION}".encode())
+    if options:
+        h.update(json.dumps(options, sort_keys=True).encode())
+    for path in paths:
+        h.update(b'\0' + Path(path).name.encode() + b'\0')
+        try:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    h.update(block)
+        except OSError:
+            h.update(b'<missing>')
+    return h.hexdigest()[:32], sig
+
+
+class StringPacker:
+    """Accumulate strings into a compact UTF-8 buffer, e.g. while streaming a CSV."""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._offsets = array('q', [0])
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def extend(self, values: Iterable[str]) -> None:
+        encoded = [v.encode('utf-8') for v in values]
+        ends = accumulate(map(len, encoded), initial=len(self._buf))
+        next(ends)
+        self._offsets.extend(ends)
+        self._buf += b''.join(encoded)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Zero-copy views of the packed data; the packer must not be extended afterwards."""
+        blob = np.frombuffer(self._buf, dtype=np.uint8)
+        return blob, np.frombuffer(self._offsets, dtype=np.int64)
+
+    def column(self) -> "StringColumn":
+        return StringColumn(*self.arrays())
+
+
+def pack_strings(values: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode strings as one UTF-8 byte array plus int64 offsets (len(values) + 1)."""
+    packer = StringPacker()
+    packer.extend(values)
+    return packer.arrays()
+
+
+class StringColumn:
+    """Read-only sequence of strings decoded on access from `pack_strings` arrays."""
+
+    __slots__ = ('blob', 'offsets')
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        # plain ndarray views: np.memmap's per-item __getitem__ is several times slower
+        self.blob = np.asarray(blob)
+        self.offsets = np.asarray(offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.blob[start:end].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def write_artifact(root: Path, key: str, arrays: Dict[str, np.ndarray], meta: dict, stat: List) -> Path:
+    """Atomically write an artifact under `root/key` and drop older builds with the same `meta['options']`."""
+    root.mkdir(parents=True, exist_ok=True)
+    target = root / key
+    if not target.exists():
+        tmp = Path(tempfile.mkdtemp(prefix='.tmp-', dir=root))
+        try:
+            for name, arr in arrays.items():
+                np.save(tmp / f'{name}.npy', np.ascontiguousarray(arr), allow_pickle=False)
+            meta = dict(meta, format=FORMAT_VERSION, key=key, arrays=sorted(arrays))
+            (tmp / 'meta.json').write_text(json.dumps(meta), encoding='utf-8')
+            try:
+                os.replace(tmp, target)
+            except OSError:
+                # another process published the same key first
+                if not target.exists():
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+    # publish the stat -> key mapping last so readers only see complete builds
+    previous = read_current(root) or {}
+    generation = previous.get('generation', 0)
+    if previous.get('key') != key:
+        generation += 1
+    fd, tmp_current = tempfile.mkstemp(prefix='.current-', dir=root)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({'format': FORMAT_VERSION, 'key': key, 'stat': stat, 'generation': generation}, f)
+    os.replace(tmp_current, root / 'current.json')
+    options = meta.get('options')
+    for old in root.iterdir():
+        if not old.is_dir() or old.name == key or old.name.startswith('.tmp-'):
+            continue
+        try:
+            old_meta = json.loads((old / 'meta.json').read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            old_meta = None
+        if isinstance(old_meta, dict) and old_meta.get('format') == FORMAT_VERSION \
+                and old_meta.get('options') != options:
+            # another configuration's current build; removing it would make that one refit
+            continue
+        # mapped files stay valid for readers that still hold them open
+        shutil.rmtree(old, ignore_errors=True)
+    return target
+
+
+def read_current(root: Path) -> Optional[dict]:
+    """The newest published build as {'key', 'stat', 'generation', ...}, or None."""
+    try:
+        current = json.loads((Path(root) / 'current.json').read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(current, dict) or current.get('format') != FORMAT_VERSION or 'key' not in current:
+        return None
+    return current
+
+
+@contextmanager
+def build_lock(root: Path):
+    """Hold an exclusive lock on `root/.build.lock`, waiting for any other process that holds it."""
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / '.build.lock', 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def try_leader_lock(root: Path):
+    """Try to take `root/.leader.lock` without waiting.
+
+    Returns the open lock file, which keeps the lock until it is closed or the
+    process exits, or None if another process holds it or the platform has no
+    file locks (a lock that always succeeded would make every process a leader).
+    """
+    if fcntl is None and msvcrt is None:
+        return None
+    root.mkdir(parents=True, exist_ok=True)
+    f = open(root / '.leader.lock', 'a')
+    try:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            # lock the first byte; Windows releases it when the file is closed
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def read_artifact(root: Path, key: str, mmap: bool = True) -> Optional[Tuple[Dict[str, np.ndarray], dict]]:
+    """Load an artifact's arrays (memory-mapped by default) and metadata, or None if absent."""
+    target = root / key
+    try:
+        meta = json.loads((target / 'meta.json').read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if meta.get('format') != FORMAT_VERSION or meta.get('key') != key:
+        return None
+    mode = 'r' if mmap else None
+    arrays = {}
+    try:
+        for name in meta.get('arrays', []):
+            arrays[name] = np.load(target / f'{name}.npy', mmap_mode=mode, allow_pickle=False)
+    except (OSError, ValueError):
+        # removed or replaced by a concurrent writer; caller refits
+        return None
+    return arrays, meta
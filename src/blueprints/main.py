@@ -1,14 +1,24 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, jsonify
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, jsonify, Response
 from src.ai_client import AIClient
-from src.matcher import DiseaseMatcher
-import PIL.Image
+from src.ai_cache import PromptCache
+from src.ai_limiter import QuotaLimiter, PRIORITY_INTERACTIVE, PRIORITY_LOOKUP, PRIORITY_STANDARD
+from src.lazy import lazy_import
+from src.timing import startup
 import io
+import json
 import base64
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
 from flask_login import login_required, current_user
 import os
-import google.generativeai as genai
-import speech_recognition as sr
-from pydub import AudioSegment
+
+# only a few routes need these; import them on first use (see src/lazy.py)
+Image = lazy_import('PIL.Image')
+sr = lazy_import('speech_recognition')
+pydub = lazy_import('pydub')
 
 main_bp = Blueprint('main', __name__)
 
@@ -28,7 +38,7 @@ def transcribe_audio():
         # Web audio is often webm/ogg. SR needs WAV usually.
         # Use pydub to convert.
         audio_data = audio_file.read()
-        audio_segment = AudioSegment.from_file(io.BytesIO(audio_data))
+        audio_segment = pydub.AudioSegment.from_file(io.BytesIO(audio_data))
         wav_io = io.BytesIO()
         audio_segment.export(wav_io, format="wav")
         wav_io.seek(0)
@@ -43,10 +53,12 @@ def transcribe_audio():
         return jsonify({'error': str(e)}), 500
 
 
-# Initialize Matcher but load it lazily or globally
-# For simplicity, we can have a global singleton here or better in a separate extensions file.
-# We'll use a global variable here for now, mimicking app.py behavior.
-matcher = DiseaseMatcher()
+# The matcher and AI client are created by warm_up(), not at import time:
+# gunicorn.conf.py calls it in each worker before it accepts requests, app.py
+# before app.run(), and the first request otherwise (flask run, tests).
+matcher = None
+ai_client = None
+_warm_lock = threading.Lock()
 
 # CSV path will be loaded from config
 def get_csv_path():
@@ -58,10 +70,62 @@ def get_csv_path():
         return os.environ.get('DISEASE_CSV', 'data/diseases.csv')
 
 CSV_PATH = get_csv_path()
-try:
-    matcher.fit_from_csv(CSV_PATH)
-except Exception as e:
-    print(f"Matcher load error: {e}")
+
+# Reload the catalog in the background when the CSV changes (0 disables)
+def get_watch_interval():
+    """Get matcher file-watch interval (seconds) from Flask config or environment."""
+    try:
+        return float(current_app.config.get('MATCHER_WATCH_INTERVAL', 2.0))
+    except RuntimeError:
+        return float(os.environ.get('MATCHER_WATCH_INTERVAL', 2.0))
+
+# Per-stage query timings, reported on /status
+def get_timing_enabled():
+    """Whether the matcher records per-stage timings (MATCHER_TIMING)."""
+    try:
+        return bool(current_app.config.get('MATCHER_TIMING', True))
+    except RuntimeError:
+        return os.environ.get('MATCHER_TIMING', 'True').lower() == 'true'
+
+# Share one model between gunicorn workers through the memory-mapped artifact:
+# one worker refits and publishes, the others switch generations per request
+def get_shared_mode():
+    """Whether the matcher model is shared between worker processes (MATCHER_SHARED)."""
+    try:
+        return bool(current_app.config.get('MATCHER_SHARED', True))
+    except RuntimeError:
+        return os.environ.get('MATCHER_SHARED', 'True').lower() == 'true'
+
+# Reuse Gemini answers to repeated prompts, in memory and in a SQLite file shared by workers
+def get_ai_cache():
+    """Build the AIClient prompt cache from the AI_CACHE_* settings, or None if disabled."""
+    try:
+        config = current_app.config
+    except RuntimeError:
+        config = {}
+    enabled = config.get('AI_CACHE_ENABLED', os.environ.get('AI_CACHE_ENABLED', 'True').lower() == 'true')
+    if not enabled:
+        return None
+    return PromptCache(
+        path=config.get('AI_CACHE_PATH', os.environ.get('AI_CACHE_PATH', 'instance/ai_cache.sqlite3')),
+        ttl=float(config.get('AI_CACHE_TTL', os.environ.get('AI_CACHE_TTL', 86400))),
+        memory_items=int(config.get('AI_CACHE_MEMORY_ITEMS', os.environ.get('AI_CACHE_MEMORY_ITEMS', 256))),
+        max_bytes=int(float(config.get('AI_CACHE_MAX_MB', os.environ.get('AI_CACHE_MAX_MB', 50))) * 1024 * 1024),
+    )
+
+# Admit or shed each Gemini request against a token bucket shared by workers
+def get_ai_limiter():
+    """Build the AIClient admission controller from the AI_* rate settings."""
+    try:
+        config = current_app.config
+    except RuntimeError:
+        config = {}
+    return QuotaLimiter(
+        path=config.get('AI_LIMITER_PATH', os.environ.get('AI_LIMITER_PATH', 'instance/ai_quota.sqlite3')),
+        rate=float(config.get('AI_RATE_PER_MINUTE', os.environ.get('AI_RATE_PER_MINUTE', 60))) / 60.0,
+        burst=int(config.get('AI_BURST', os.environ.get('AI_BURST', 10))),
+        max_concurrent=int(config.get('AI_MAX_CONCURRENT', os.environ.get('AI_MAX_CONCURRENT', 4))),
+    )
 
 # Initialize AI client using configuration
 def get_ai_client():
@@ -71,22 +135,63 @@ def get_ai_client():
         if not api_key:
             current_app.logger.warning("GEMINI_API_KEY not configured")
             return None
-        return AIClient(api_key=api_key)
+        return AIClient(api_key=api_key, cache=get_ai_cache(), limiter=get_ai_limiter())
     except RuntimeError:
         # Outside application context, try environment variable
         api_key = os.environ.get('GEMINI_API_KEY')
         if api_key:
-            return AIClient(api_key=api_key)
+            return AIClient(api_key=api_key, cache=get_ai_cache(), limiter=get_ai_limiter())
         return None
 
-# Initialize global AI client
-ai_client = get_ai_client()
+def load_matcher():
+    """Fit (or map the artifact of) the disease catalog and start keeping it current."""
+    global CSV_PATH
+    # sklearn, scipy and pandas come in with the matcher module
+    with startup.timed('import src.matcher'):
+        from src.matcher import DiseaseMatcher
+    m = DiseaseMatcher()
+    CSV_PATH = get_csv_path()
+    try:
+        m.fit_from_csv(CSV_PATH)
+    except Exception as e:
+        print(f"Matcher load error: {e}")
+    m.timer.enabled = get_timing_enabled()
+    if get_shared_mode() and m.use_artifact:
+        try:
+            m.start_shared(interval=get_watch_interval())
+        except Exception as e:
+            print(f"Matcher shared mode error: {e}")
+    elif get_watch_interval() > 0:
+        m.start_watcher(interval=get_watch_interval())
+    return m
+
+def warm_up():
+    """Create the matcher and the AI client if they do not exist yet (idempotent, thread-safe)."""
+    global matcher, ai_client
+    if matcher is not None:
+        return
+    with _warm_lock:
+        if matcher is not None:
+            return
+        with startup.timed('warm_up.ai_client'):
+            ai_client = get_ai_client()
+        with startup.timed('warm_up.matcher'):
+            m = load_matcher()
+        # published last: other threads skip the lock once they see it
+        matcher = m
+
+@main_bp.before_app_request
+def sync_matcher():
+    if matcher is None:
+        warm_up()
+    # pick up a catalog generation published by another worker (one stat() otherwise)
+    matcher.sync_shared()
  
 
 @main_bp.route('/', methods=['GET'])
 def index():
     loaded = getattr(matcher, 'csv_path', None)
-    count = len(matcher.df) if getattr(matcher, 'df', None) is not None else 0
+    count = len(matcher.records)
     return render_template('index.html', loaded=loaded, count=count)
 
 @main_bp.route('/skin', methods=['GET', 'POST'])
@@ -103,17 +208,33 @@ def skin_analysis():
         return redirect(url_for('main.skin_analysis'))
 
     try:
-        img = None
         if image_file:
-            img = PIL.Image.open(image_file)
-        elif image_data:
+            data = image_file.read()
+        else:
             # data:image/jpeg;base64,...
             header, encoded = image_data.split(",", 1)
             data = base64.b64decode(encoded)
-            img = PIL.Image.open(io.BytesIO(data))
-        
-        if img:
-            prompt = """
+        img = Image.open(io.BytesIO(data))
+
+        if get_ai_streaming() and ai_client is not None:
+            # the page streams the analysis from skin_stream(), which any worker can serve
+            img.verify()
+            token = save_pending('skin_pending', data)
+            try:
+                return render_template('skin.html', image_data=image_data,
+                                       ai_stream_url=url_for('main.skin_stream', token=token))
+            except Exception:
+                # no page will ever ask for it
+                take_pending('skin_pending', token)
+                raise
+        response = ai_client.generate_content([SKIN_PROMPT, img])
+        return render_template('skin.html', result=response, image_data=image_data)
+
+    except Exception as e:
+        flash(f'Error analyzing image: {e}', 'danger')
+        return redirect(url_for('main.skin_analysis'))
+
+SKIN_PROMPT = """
             Analyze this image of a skin condition. Act as a dermatologist.
             1. Describe what you see (color, texture, pattern).
             2. Suggest 3 possible causes (differential diagnosis).
@@ -122,14 +243,211 @@ def skin_analysis():
             
             Format response in Markdown (Bold, Lists).
             """
-            response = ai_client.generate_content([prompt, img])
-            return render_template('skin.html', result=response, image_data=image_data)
-            
-    except Exception as e:
-        flash(f'Error analyzing image: {e}', 'danger')
-        return redirect(url_for('main.skin_analysis'))
 
-    return render_template('skin.html')
+# uploads and prompts waiting for their stream or poll request. Pages open their
+# stream as soon as they load and stop polling after a few minutes, so anything
+# older than PENDING_TTL seconds was abandoned: it is never served again and each
+# worker deletes it within PENDING_SWEEP seconds of its next request.
+PENDING_TTL = 600
+PENDING_SWEEP = 60
+PENDING_DIRS = ('ai_pending', 'skin_pending')
+_pending_swept = 0.0
+
+def pending_dir(name):
+    return os.path.join(current_app.instance_path, name)
+
+def purge_pending(name):
+    """Delete the entries of `name` older than PENDING_TTL."""
+    now = time.time()
+    try:
+        entries = list(os.scandir(pending_dir(name)))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if now - entry.stat().st_mtime > PENDING_TTL:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+@main_bp.before_app_request
+def expire_pending():
+    """Sweep abandoned uploads and prompts, at most once per PENDING_SWEEP in each worker."""
+    global _pending_swept
+    now = time.monotonic()
+    if now - _pending_swept < PENDING_SWEEP:
+        return
+    _pending_swept = now
+    for name in PENDING_DIRS:
+        purge_pending(name)
+
+def save_pending(name, data):
+    """Store `data` for a later stream request (any worker can serve it) and return its token."""
+    folder = pending_dir(name)
+    os.makedirs(folder, exist_ok=True)
+    purge_pending(name)
+    token = secrets.token_hex(16)
+    with open(os.path.join(folder, token), 'wb') as f:
+        f.write(data)
+    return token
+
+def read_pending(name, token):
+    """The data saved under `token`, left in place for later requests; None if there is none or it expired."""
+    if not re.fullmatch(r'[0-9a-f]{32}', token):
+        return None
+    path = os.path.join(pending_dir(name), token)
+    try:
+        with open(path, 'rb') as f:
+            if time.time() - os.fstat(f.fileno()).st_mtime > PENDING_TTL:
+                return None
+            return f.read()
+    except OSError:
+        return None
+
+def take_pending(name, token):
+    """The data saved under `token`, removed so that it streams once; None if there is none."""
+    data = read_pending(name, token)
+    if data is not None:
+        try:
+            os.remove(os.path.join(pending_dir(name), token))
+        except OSError:
+            # another request took it first
+            return None
+    return data
+
+@main_bp.route('/skin/stream/<token>')
+def skin_stream(token):
+    """Stream the analysis of an image saved by skin_analysis() as server-sent events (once per upload)."""
+    data = take_pending('skin_pending', token)
+    if data is None:
+        return jsonify({'error': 'unknown image'}), 404
+    if ai_client is None:
+        return sse_response([])
+    return sse_response(ai_client.stream_content([SKIN_PROMPT, Image.open(io.BytesIO(data))]))
+
+# Stream Gemini answers to the page as they are generated instead of waiting for all of it
+def get_ai_streaming():
+    """Whether pages stream AI answers over server-sent events (AI_STREAMING)."""
+    try:
+        return bool(current_app.config.get('AI_STREAMING', True))
+    except RuntimeError:
+        return os.environ.get('AI_STREAMING', 'True').lower() == 'true'
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(chunks, extra=None):
+    """Server-sent events: one `chunk` event per piece of text, then `extra()`'s events, then `done`."""
+    def generate():
+        for text in chunks:
+            yield sse_event('chunk', {'text': text})
+        if extra is not None:
+            yield from extra()
+        yield sse_event('done', {})
+    # no-cache and X-Accel-Buffering keep proxies from holding events back
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# How long /match and /find wait for Gemini before rendering with local results only
+def get_ai_deadline():
+    """Seconds a page waits for the AI answer (AI_DEADLINE); the rest is fetched by the page."""
+    try:
+        return float(current_app.config.get('AI_DEADLINE', 3.0))
+    except RuntimeError:
+        return float(os.environ.get('AI_DEADLINE', 3.0))
+
+def match_prompt(symptoms):
+    return f"""
+    Based on these symptoms: '{symptoms}', suggest possible diseases that match and provide health recommendations.
+    
+    Please format your response using Markdown:
+    - Use **Bold** for emphasis.
+    - Use lists for recommendations.
+    - Create clear sections like '## Possible Causes' and '## Recommendations'.
+    """
+
+def find_prompt(name):
+    return f"""
+    Provide comprehensive information about the disease '{name}'.
+    
+    Please format your response using Markdown:
+    - Use headings (##) for sections like 'Symptoms', 'Causes', 'Treatments'.
+    - Use bullet points for lists.
+    - Make it easy to read.
+    """
+
+# prompt builder and priority of each kind of AI answer a page can fetch
+AI_PROMPTS = {
+    'match': (match_prompt, PRIORITY_STANDARD),
+    'find': (find_prompt, PRIORITY_LOOKUP),
+}
+
+# calls started by start_ai(), by prompt, so /api/ai/answer polls check them instead of
+# queueing more executor jobs; kept AI_JOB_TTL seconds after they start
+AI_JOB_TTL = 300
+_ai_jobs = {}
+_ai_jobs_lock = threading.Lock()
+
+def start_ai(kind, text, join=False):
+    """Start the Gemini call for a page; returns a Future, or None without an AI client.
+
+    The Future is remembered by prompt. With join=True the remembered one is
+    returned if there is one, so any number of polls share a single call.
+    """
+    if ai_client is None:
+        return None
+    build, priority = AI_PROMPTS[kind]
+    prompt = build(text)
+    now = time.monotonic()
+    with _ai_jobs_lock:
+        for key in [key for key, (_, expires) in _ai_jobs.items() if expires < now]:
+            del _ai_jobs[key]
+        job = _ai_jobs.get(prompt) if join else None
+        if job is None:
+            job = _ai_jobs[prompt] = (ai_client.submit(prompt, priority=priority), now + AI_JOB_TTL)
+    return job[0]
+
+def await_ai(future, deadline):
+    """(answer, pending): wait for `future` until the monotonic `deadline`, not beyond it."""
+    if future is None:
+        return None, False
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic())), False
+    except FutureTimeout:
+        return None, True
+
+def begin_ai(kind, text):
+    """Start a page's AI answer before its local work: (deadline, Future), or None when streaming.
+
+    With AI_STREAMING on (the default) nothing is started here: finish_ai() points
+    the page at /api/ai/stream/<token>, and AI_DEADLINE and the
+    /api/ai/answer/<token> poll are never used. They only apply with
+    AI_STREAMING off.
+    """
+    if get_ai_streaming():
+        return None
+    return time.monotonic() + get_ai_deadline(), start_ai(kind, text)
+
+def save_ai_pending(kind, text):
+    """Token for a page's AI answer; /api/ai/stream and /api/ai/answer look the prompt up by it."""
+    return save_pending('ai_pending', json.dumps({'kind': kind, 'text': text}).encode('utf-8'))
+
+def finish_ai(kind, text, started):
+    """Template arguments for a page's AI card: the answer if it is ready, else where the page gets it."""
+    if ai_client is None:
+        return {'gemini_response': None}
+    if started is None:
+        build, _ = AI_PROMPTS[kind]
+        answer = ai_client.cached(build(text))
+        if answer is not None:
+            return {'gemini_response': answer}
+        # the symptoms stay on the server: the page only gets a one-time token
+        return {'gemini_response': None, 'ai_stream_url': url_for('main.ai_stream', token=save_ai_pending(kind, text))}
+    deadline, future = started
+    answer, pending = await_ai(future, deadline)
+    if not pending:
+        return {'gemini_response': answer}
+    return {'gemini_response': None, 'ai_pending_url': url_for('main.ai_answer', token=save_ai_pending(kind, text))}
 
 @main_bp.route('/match', methods=['GET', 'POST'])
 def match():
@@ -140,25 +458,110 @@ def match():
     if not symptoms.strip():
         flash('Please enter symptoms.', 'warning')
         return redirect(url_for('main.match'))
-        
+
+    # Gemini first, so the matcher runs while it answers
+    started = begin_ai('match', symptoms)
+
     results = []
     try:
         results = matcher.match(symptoms, top_k=10, threshold=0.0)
     except Exception as e:
         flash(f'Error: {e}', 'danger')
-        
-    # Gemini
-    prompt = f"""
-    Based on these symptoms: '{symptoms}', suggest possible diseases that match and provide health recommendations.
-    
-    Please format your response using Markdown:
-    - Use **Bold** for emphasis.
-    - Use lists for recommendations.
-    - Create clear sections like '## Possible Causes' and '## Recommendations'.
+
+    return render_template('results.html', query=symptoms, results=results, **finish_ai('match', symptoms, started))
+
+# /api/match: bulk symptom matching for other systems, no AI call
+API_MATCH_CHUNK = 256
+
+def get_api_match_limit():
+    """Most queries accepted by one /api/match request (MATCH_API_MAX_QUERIES)."""
+    try:
+        return int(current_app.config.get('MATCH_API_MAX_QUERIES', 10000))
+    except RuntimeError:
+        return int(os.environ.get('MATCH_API_MAX_QUERIES', 10000))
+
+def parse_api_items(payload):
+    """Normalise an /api/match body to a list of (id, query) pairs; None marks an invalid item.
+
+    Accepts {"query": "..."}, {"queries": [...]} or a bare list. Items are strings or
+    objects with a "query" and an optional "id".
+    """
+    if isinstance(payload, dict):
+        if 'queries' in payload:
+            payload = payload['queries']
+        elif 'query' in payload:
+            payload = [payload]
+        else:
+            raise ValueError('expected "query" or "queries"')
+    if isinstance(payload, str):
+        payload = [payload]
+    if not isinstance(payload, list):
+        raise ValueError('"queries" must be a list')
+    items = []
+    for item in payload:
+        if isinstance(item, str):
+            items.append((None, item))
+        elif isinstance(item, dict) and isinstance(item.get('query'), str):
+            items.append((item.get('id'), item['query']))
+        else:
+            items.append((item.get('id') if isinstance(item, dict) else None, None))
+    return items
+
+@main_bp.route('/api/match', methods=['POST'])
+def api_match():
+    """Match one query or a list of them and stream one JSON line per query, in order.
+
+    Each line is {"index", "id"?, "query", "matches": [{"disease", "score", "tips",
+    "matched"}]} or {"index", "id"?, "error"} for an item without a query string.
+    Lines are written as each chunk of queries is scored, so a client can start
+    consuming results before the batch is finished.
     """
-    gemini_response = ai_client.generate_content(prompt)
+    if request.mimetype == 'application/x-ndjson':
+        try:
+            payload = [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        except ValueError as e:
+            return jsonify({'error': f'invalid NDJSON: {e}'}), 400
+        if not payload:
+            return jsonify({'error': 'expected at least one NDJSON line'}), 400
+        options = request.args
+    else:
+        payload = request.get_json(silent=True)
+        if payload is None:
+            return jsonify({'error': 'expected a JSON body'}), 400
+        options = payload if isinstance(payload, dict) else request.args
+    try:
+        items = parse_api_items(payload)
+        top_k = int(options.get('top_k', 3))
+        threshold = float(options.get('threshold', 0.2))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    if len(items) > get_api_match_limit():
+        return jsonify({'error': f'too many queries ({len(items)} > {get_api_match_limit()})'}), 413
+
+    m = matcher
+
+    def generate():
+        for start in range(0, len(items), API_MATCH_CHUNK):
+            chunk = list(enumerate(items[start:start + API_MATCH_CHUNK], start))
+            valid = [(i, req_id, q) for i, (req_id, q) in chunk if q is not None]
+            # one vectorisation and scoring pass per chunk
+            results = dict(zip((i for i, _, _ in valid),
+                               m.match_many([q for _, _, q in valid], top_k=top_k, threshold=threshold)))
+            lines = []
+            for i, (req_id, q) in chunk:
+                record = {'index': i}
+                if req_id is not None:
+                    record['id'] = req_id
+                if q is None:
+                    record['error'] = 'item needs a "query" string'
+                else:
+                    record['query'] = q
+                    record['matches'] = [{'disease': d, 'score': score, 'tips': tips, 'matched': matched}
+                                         for d, score, tips, matched in results[i]]
+                lines.append(json.dumps(record))
+            yield '\n'.join(lines) + '\n'
 
-    return render_template('results.html', query=symptoms, results=results, gemini_response=gemini_response)
+    return Response(generate(), mimetype='application/x-ndjson')
 
 @main_bp.route('/find', methods=['GET', 'POST'])
 def find():
@@ -169,32 +572,67 @@ def find():
     if not name.strip():
         return redirect(url_for('main.find'))
         
+    started = begin_ai('find', name)
     results = matcher.find_by_name(name, exact=False, limit=50)
-    
-    gemini_response = None
-    prompt = f"""
-    Provide comprehensive information about the disease '{name}'.
-    
-    Please format your response using Markdown:
-    - Use headings (##) for sections like 'Symptoms', 'Causes', 'Treatments'.
-    - Use bullet points for lists.
-    - Make it easy to read.
+
+    return render_template('find_results.html', name=name, results=results, **finish_ai('find', name, started))
+
+@main_bp.route('/api/ai/answer/<token>')
+def ai_answer(token):
+    """The AI answer a page rendered without, as {"status": "done", "text"} or {"status": "pending"}.
+
+    The token is the one finish_ai() saved with the page's prompt; an unknown
+    token gets a 404 and starts nothing. A poll checks the call the page
+    started (see start_ai). A worker that did not start it starts one call for
+    the prompt and every later poll checks that; it is answered from the AI
+    cache if the original call has finished. The token is spent by the poll
+    that gets the answer.
     """
-    gemini_response = ai_client.generate_content(prompt)
+    data = read_pending('ai_pending', token)
+    if data is None:
+        return jsonify({'error': 'unknown AI answer'}), 404
+    pending = json.loads(data)
+    kind, text = pending['kind'], pending['text']
+    answer = None
+    if ai_client is not None:
+        # a short wait per poll keeps the request from pinning a worker
+        answer, waiting = await_ai(start_ai(kind, text, join=True), time.monotonic() + min(get_ai_deadline(), 1.0))
+        if waiting:
+            return jsonify({'status': 'pending'})
+    take_pending('ai_pending', token)
+    return jsonify({'status': 'done', 'text': answer})
 
-    return render_template('find_results.html', name=name, results=results, gemini_response=gemini_response)
+@main_bp.route('/api/ai/stream/<token>')
+def ai_stream(token):
+    """Stream the AI answer for a /match or /find page as server-sent events (once per page, see finish_ai)."""
+    data = take_pending('ai_pending', token)
+    if data is None:
+        return jsonify({'error': 'unknown AI answer'}), 404
+    pending = json.loads(data)
+    kind, text = pending['kind'], pending['text']
+    if ai_client is None:
+        return sse_response([])
+    build, priority = AI_PROMPTS[kind]
+    return sse_response(ai_client.stream_content(build(text), priority=priority))
 
 @main_bp.route('/status')
 def status():
     loaded = getattr(matcher, 'csv_path', None)
-    count = len(matcher.df) if getattr(matcher, 'df', None) is not None else 0
-    return render_template('status.html', loaded=loaded, count=count)
+    count = len(matcher.records)
+    ai_cache = getattr(ai_client, 'cache', None)
+    return render_template('status.html', loaded=loaded, count=count, matcher_status=matcher.status(),
+                           matcher_stats=matcher.stats(), startup_stats=startup.stats(),
+                           ai_cache_stats=ai_cache.stats() if ai_cache is not None else None,
+                           ai_flight_stats=ai_client.flight.stats() if ai_client is not None else None,
+                           ai_limiter_stats=ai_client.limiter.stats() if getattr(ai_client, 'limiter', None) else None,
+                           ai_timing_stats=ai_client.timer.stats() if ai_client is not None else None)
 
 @main_bp.route('/reload', methods=['POST'])
 def reload():
     path = request.form.get('reload_path', '') or CSV_PATH
     try:
-        matcher.fit_from_csv(path)
+        # builds a new snapshot off to the side and swaps it in atomically
+        matcher.reload(path)
         flash(f'Reloaded CSV: {path}', 'success')
     except Exception as e:
         flash(f'Failed to reload CSV: {e}', 'danger')
@@ -225,9 +663,9 @@ def chat():
                  }}
                  """
                  # Use global ai_client
-                 resp_text = ai_client.generate_content(prompt)
+                 # free-text patient messages are not written to the shared cache
+                 resp_text = ai_client.generate_content(prompt, use_cache=False, priority=PRIORITY_INTERACTIVE)
                  
-                 import json
                  cleaned_text = resp_text.strip()
                  if cleaned_text.startswith('```json'):
                      cleaned_text = cleaned_text[7:-3]
@@ -245,7 +683,7 @@ def chat():
                      symptom_str = " ".join(data['symptoms'])
                      matches = matcher.match(symptom_str, top_k=3)
                      # Serialize matches for JSON
-                     matches = [{'name': m['name'], 'probability': m['probability'], 'precautions': m['precautions']} for m in matches]
+                     matches = [{'name': d, 'probability': score, 'precautions': tips} for d, score, tips, _ in matches]
                  
                  return jsonify({'response': data.get('response', resp_text), 'matches': matches})
              except Exception as e:
@@ -253,5 +691,46 @@ def chat():
                  import traceback
                  traceback.print_exc()
                  return jsonify({'response': f"AI Error: {str(e)}", 'matches': []})
-    return render_template('chat.html')
+    return render_template('chat.html', ai_streaming=get_ai_streaming())
+
+CHAT_STREAM_PROMPT = """
+Act as a medical assistant. User says: "{message}"
+Reply with a helpful, empathetic response (max 50 words), formatted in Markdown (bold key terms).
+Then, on a last line of its own, write "{marker}" followed by the symptoms the user describes
+as a comma-separated list of keywords (nothing after it if they describe none).
+"""
+CHAT_SYMPTOMS_MARKER = 'SYMPTOMS:'
+
+@main_bp.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """/chat as server-sent events: the reply as it is generated, then the catalog matches."""
+    user_input = request.form.get('message', '')
+    if not user_input.strip() or ai_client is None:
+        return sse_response([])
+    prompt = CHAT_STREAM_PROMPT.format(message=user_input, marker=CHAT_SYMPTOMS_MARKER)
+    reply = {'text': ''}
+
+    def visible_chunks():
+        # hold back anything that may be the start of the symptoms line
+        buffer, sent = '', 0
+        for chunk in ai_client.stream_content(prompt, use_cache=False, priority=PRIORITY_INTERACTIVE):
+            buffer += chunk
+            cut = buffer.find(CHAT_SYMPTOMS_MARKER)
+            end = cut if cut >= 0 else max(sent, len(buffer) - len(CHAT_SYMPTOMS_MARKER))
+            if end > sent:
+                yield buffer[sent:end]
+                sent = end
+        if buffer.find(CHAT_SYMPTOMS_MARKER) < 0 and len(buffer) > sent:
+            yield buffer[sent:]
+        reply['text'] = buffer
+
+    def matches():
+        cut = reply['text'].find(CHAT_SYMPTOMS_MARKER)
+        symptoms = [] if cut < 0 else [
+            s.strip() for s in reply['text'][cut + len(CHAT_SYMPTOMS_MARKER):].split(',') if s.strip()]
+        found = matcher.match(' '.join(symptoms), top_k=3) if symptoms else []
+        yield sse_event('matches', [{'name': d, 'probability': score, 'precautions': tips}
+                                    for d, score, tips, _ in found])
+
+    return sse_response(visible_chunks(), extra=matches)
 
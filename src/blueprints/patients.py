@@ -3,21 +3,19 @@ from flask_login import login_required, current_user
 from src.models import db, Patient, PatientDisease, Visit, Appointment, Prescription, LabTest
 import os
 import uuid
-import imagehash
 from werkzeug.utils import secure_filename
-from PIL import Image
 from datetime import datetime
 import csv
 import io
 import base64
-import numpy as np
 from src.analysis import RiskAnalyzer
+from src.lazy import lazy_import
 
-# Try importing face_recognition, handle if missing
-try:
-    import face_recognition
-except ImportError:
-    face_recognition = None
+# image libraries are imported on first use (see src/lazy.py)
+imagehash = lazy_import('imagehash')
+Image = lazy_import('PIL.Image')
+# optional: falsy when face_recognition (dlib) is not installed
+face_recognition = lazy_import('face_recognition', optional=True)
 
 patients_bp = Blueprint('patients', __name__)
 
@@ -115,7 +113,6 @@ def scan_face():
 
 
 
-from src.reports import PDFReportGenerator
 from flask import send_file
 
 @patients_bp.route('/patient/<string:patient_id>/report')
@@ -127,6 +124,8 @@ def download_report(patient_id):
         flash('Access denied.', 'danger')
         return redirect(url_for('main.index'))
     
+    # reportlab is only needed here
+    from src.reports import PDFReportGenerator
     report = PDFReportGenerator(patient)
     pdf = report.generate()
     
@@ -0,0 +1,60 @@
+"""
+Deferred imports for heavy optional dependencies.
+
+`lazy_import('pydub')` returns a stand-in that imports the real module the
+first time one of its attributes is used, so importing the app does not pay
+for libraries that only a few routes need (Pillow, pydub, speech_recognition,
+imagehash, face_recognition, google.generativeai, ...). The time each deferred
+import takes is recorded in `src.timing.startup` as 'import <name>'.
+
+With optional=True a missing module behaves like the old
+`try: import x / except ImportError: x = None` pattern: the stand-in is falsy,
+so `if not face_recognition:` still works (and is what triggers the import).
+"""
+import importlib
+import threading
+import time
+
+from src.timing import startup
+
+
+class LazyModule:
+    """Module stand-in that imports `name` on first attribute access (or truth test)."""
+
+    def __init__(self, name: str, optional: bool = False):
+        self._name = name
+        self._optional = optional
+        self._module = None
+        self._missing = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None and self._missing is None:
+            with self._lock:
+                if self._module is None and self._missing is None:
+                    start = time.perf_counter()
+                    try:
+                        self._module = importlib.import_module(self._name)
+                    except ImportError as e:
+                        if not self._optional:
+                            raise
+                        self._missing = e
+                    startup.record(f'import {self._name}', time.perf_counter() - start)
+        return self._module
+
+    def __getattr__(self, attr):
+        module = self._load()
+        if module is None:
+            raise ImportError(f"{self._name} is not available: {self._missing}")
+        return getattr(module, attr)
+
+    def __bool__(self) -> bool:
+        return self._load() is not None
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self._module is not None else 'missing' if self._missing else 'not loaded'
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str, optional: bool = False) -> LazyModule:
+    return LazyModule(name, optional=optional)
@@ -0,0 +1,139 @@
+"""
+Dense LSA embeddings with an IVF approximate nearest-neighbour index.
+
+`LsaIndex` backs DiseaseMatcher(scoring='lsa'). The fitted TF-IDF matrix is
+projected with a truncated SVD onto `n_components` latent dimensions, and each
+row is stored as an L2-normalised float32 embedding. Terms that co-occur in
+the catalog share latent directions, so a query can score well against a row
+it shares no literal n-gram with, e.g. "runny nose" against "sneezing;
+nasal congestion".
+
+Queries are served through an inverted-file (IVF) index: a spherical k-means
+coarse quantiser splits the rows into `n_lists` lists, and a query only scores
+the rows of its `nprobe` nearest lists. With nprobe == n_lists the search is
+exact in the embedding space. Scores are cosines between embeddings, so they
+are not on the same scale as the sparse TF-IDF cosine; see
+scripts/lsa_report.py for recall and latency against the exact path.
+
+All state is plain arrays (`arrays()` / `from_arrays()`), persisted in the
+matcher artifact and memory-mapped like the rest of it.
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+# below this many matrix cells the SVD is computed densely (exact and deterministic)
+_DENSE_SVD_CELLS = 4_000_000
+# rows per block when assigning rows to lists, to bound the (rows x lists) score block
+_ASSIGN_BLOCK = 8192
+
+
+def _normalize_rows(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    np.divide(x, norms, out=x, where=norms > 0)
+    return x
+
+
+def _nearest(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(x.shape[0], dtype=np.int64)
+    for start in range(0, x.shape[0], _ASSIGN_BLOCK):
+        block = x[start:start + _ASSIGN_BLOCK]
+        out[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def _spherical_kmeans(x: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Lloyd's algorithm on the unit sphere (assignment by dot product)."""
+    n = x.shape[0]
+    centroids = x[rng.choice(n, size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(x, centroids)
+        # per-list sums as one sparse product instead of a Python loop over rows
+        members = sp.csr_matrix((np.ones(n, dtype=x.dtype), (assign, np.arange(n))), shape=(k, n))
+        sums = np.asarray(members @ x)
+        empty = ~sums.any(axis=1)
+        if empty.any():
+            sums[empty] = x[rng.choice(n, size=int(empty.sum()), replace=False)]
+        centroids = _normalize_rows(sums.astype(x.dtype))
+    return centroids
+
+
+class LsaIndex:
+    """Truncated-SVD embeddings of catalog rows, searched through an IVF index."""
+
+    def __init__(self, components: np.ndarray, embeddings: np.ndarray, centroids: np.ndarray,
+                 list_ptr: np.ndarray, list_rows: np.ndarray, nprobe: int = 8):
+        # components: (n_components, n_terms); embeddings: (n_rows, n_components), unit rows
+        self.components = components
+        self.embeddings = embeddings
+        self.centroids = centroids
+        # rows of list i are list_rows[list_ptr[i]:list_ptr[i + 1]]
+        self.list_ptr = list_ptr
+        self.list_rows = list_rows
+        self.nprobe = nprobe
+
+    @property
+    def n_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def fit(cls, tfidf_matrix, n_components: int = 128, n_lists: Optional[int] = None, nprobe: int = 8,
+            iterations: int = 15, train_size: int = 65536, random_state: int = 0) -> "LsaIndex":
+        """Project `tfidf_matrix` and build the IVF lists (`n_lists` defaults to sqrt(rows))."""
+        x = sp.csr_matrix(tfidf_matrix)
+        n_rows, n_terms = x.shape
+        if n_rows == 0:
+            raise ValueError("cannot fit an LSA index on an empty catalog")
+        rng = np.random.default_rng(random_state)
+        if n_rows * n_terms <= _DENSE_SVD_CELLS:
+            _, _, vt = np.linalg.svd(x.toarray(), full_matrices=False)
+            components = vt[:n_components]
+        else:
+            from sklearn.decomposition import TruncatedSVD
+
+            k = max(1, min(n_components, n_terms - 1, n_rows - 1))
+            components = TruncatedSVD(k, algorithm='randomized', random_state=random_state).fit(x).components_
+        components = np.ascontiguousarray(components, dtype=np.float32)
+        embeddings = _normalize_rows(np.asarray(x @ components.T, dtype=np.float32))
+
+        if n_lists is None:
+            n_lists = int(round(np.sqrt(n_rows)))
+        n_lists = max(1, min(n_lists, n_rows))
+        train = embeddings
+        if n_rows > train_size:
+            train = embeddings[np.sort(rng.choice(n_rows, size=train_size, replace=False))]
+        centroids = _spherical_kmeans(train, n_lists, iterations, rng)
+        assign = _nearest(embeddings, centroids)
+        list_rows = np.argsort(assign, kind='stable').astype(np.int64)
+        list_ptr = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=n_lists), out=list_ptr[1:])
+        return cls(components, embeddings, centroids, list_ptr, list_rows, nprobe=nprobe)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'components': self.components, 'embeddings': self.embeddings, 'centroids': self.centroids,
+            'list_ptr': self.list_ptr, 'list_rows': self.list_rows,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], nprobe: int = 8) -> "LsaIndex":
+        return cls(arrays['components'], arrays['embeddings'], arrays['centroids'],
+                   arrays['list_ptr'], arrays['list_rows'], nprobe=nprobe)
+
+    def embed(self, q_mat) -> np.ndarray:
+        """Unit-length embeddings for TF-IDF query rows (all-zero for queries with no known terms)."""
+        return _normalize_rows(np.asarray(q_mat @ self.components.T, dtype=np.float32))
+
+    def search(self, q: np.ndarray, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Cosine scores of one query embedding against the rows of its `nprobe` nearest lists."""
+        if not q.any():
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        if nprobe >= self.n_lists:
+            # every list: score the matrix in place rather than gathering its rows
+            return np.arange(self.embeddings.shape[0]), (self.embeddings @ q).astype(np.float64)
+        lists = np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe]
+        ptr = self.list_ptr
+        rows = np.concatenate([self.list_rows[ptr[i]:ptr[i + 1]] for i in lists])
+        return rows, (self.embeddings[rows] @ q).astype(np.float64)
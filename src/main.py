@@ -1,5 +1,10 @@
+import json
+import os
 import sys
 import pathlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 
 # Ensure project root is on sys.path so `from src.matcher import ...` works
 # when running this file as a script (python src\main.py) and when running
@@ -11,10 +16,147 @@ if str(project_root) not in sys.path:
 from src.matcher import DiseaseMatcher
 
 
+def parse_request(line: str):
+    """Turn one input line into (kind, text, id), kind being 'match' or 'find'.
+
+    Plain lines use the interactive syntax ('find <name>' / 'disease: <name>',
+    anything else is a symptom query). Lines starting with '{' are JSON objects
+    with "query" or "find" and an optional "id" echoed back in the output.
+    Returns None for blank lines; raises ValueError for malformed JSON.
+    """
+    text = line.strip()
+    if not text:
+        return None
+    if text.startswith('{'):
+        obj = json.loads(text)
+        if not isinstance(obj, dict):
+            raise ValueError("expected a JSON object")
+        if obj.get('find') is not None:
+            return 'find', str(obj['find']).strip(), obj.get('id')
+        query = obj.get('query', obj.get('text'))
+        if query is None:
+            raise ValueError('expected a "query" or "find" field')
+        return 'match', str(query), obj.get('id')
+    low = text.lower()
+    if low.startswith('find '):
+        return 'find', text[5:].strip(), None
+    if low.startswith('disease:'):
+        return 'find', text.split(':', 1)[1].strip(), None
+    return 'match', text, None
+
+
+# the matcher each batch worker process serves from (see _init_worker)
+_worker = None
+
+
+def _init_worker(csv_path: str, top_k: int, threshold: float) -> None:
+    global _worker
+    matcher = DiseaseMatcher()
+    # maps the artifact the parent built, so workers share its pages instead of refitting
+    matcher.fit_from_csv(csv_path)
+    _worker = (matcher, top_k, threshold)
+
+
+def _run_chunk(chunk):
+    """Answer one chunk of (line number, raw line) pairs; returns JSON-ready dicts in order."""
+    matcher, top_k, threshold = _worker
+    out = []
+    queries = []
+    for lineno, line in chunk:
+        try:
+            request = parse_request(line)
+        except ValueError as e:
+            out.append({'line': lineno, 'error': f"invalid request: {e}"})
+            continue
+        if request is None:
+            continue
+        kind, text, req_id = request
+        record = {'line': lineno}
+        if req_id is not None:
+            record['id'] = req_id
+        if kind == 'find':
+            record['find'] = text
+            record['results'] = [{'disease': d, 'symptoms': sym, 'tips': tips}
+                                 for d, sym, tips in matcher.find_by_name(text, exact=False, limit=10)] if text else []
+        else:
+            record['query'] = text
+            queries.append(record)
+        out.append(record)
+    # symptom queries in the chunk share one vectorisation and scoring pass
+    results = matcher.match_many([r['query'] for r in queries], top_k=top_k, threshold=threshold)
+    for record, matches in zip(queries, results):
+        record['matches'] = [{'disease': d, 'score': score, 'tips': tips, 'matched': matched}
+                             for d, score, tips, matched in matches]
+    return out
+
+
+def run_batch(lines, csv_path: str = "data/diseases.csv", workers: int = None, chunk_size: int = 64,
+              top_k: int = 3, threshold: float = 0.15):
+    """Yield one result dict per non-blank input line, in input order.
+
+    Lines are read lazily and sent to `workers` processes `chunk_size` at a
+    time; at most two chunks per worker are in flight, so memory stays bounded
+    however long the input is. The model is fitted (or its artifact built) once
+    here, and every worker maps the same artifact.
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    global _worker
+    matcher = DiseaseMatcher()
+    matcher.fit_from_csv(csv_path)
+    numbered = enumerate(lines, 1)
+    chunks = iter(lambda: list(islice(numbered, chunk_size)), [])
+    if workers == 1:
+        _worker = (matcher, top_k, threshold)
+        for chunk in chunks:
+            yield from _run_chunk(chunk)
+        return
+    del matcher
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(csv_path, top_k, threshold)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_run_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def batch_main(argv) -> int:
+    import argparse
+
+    p = argparse.ArgumentParser(prog='main.py batch', description=(
+        "Match queries from a file or stdin (plain lines or JSONL) and write JSONL results in input order."))
+    p.add_argument('input', nargs='?', default='-', help="input file, or '-' for stdin (default)")
+    p.add_argument('-o', '--output', default='-', help="output file, or '-' for stdout (default)")
+    p.add_argument('--csv', default='data/diseases.csv')
+    p.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                   help='worker processes (default: all cores)')
+    p.add_argument('--chunk-size', type=int, default=64, help='lines per task sent to a worker')
+    p.add_argument('--top-k', type=int, default=3)
+    p.add_argument('--threshold', type=float, default=0.15)
+    args = p.parse_args(argv)
+    src = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    dst = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        for record in run_batch(src, args.csv, args.workers, args.chunk_size, args.top_k, args.threshold):
+            dst.write(json.dumps(record, ensure_ascii=False) + '\n')
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    return 0
+
+
 def main():
     csv_path = "data/diseases.csv"
-    matcher = DiseaseMatcher()
+    # per-stage timings are shown by the 'status' command
+    matcher = DiseaseMatcher(timing=True)
     matcher.fit_from_csv(csv_path)
+    # pick up edits to the CSV without restarting
+    matcher.start_watcher()
     print("AI-based Disease Matcher (prototype)")
     print("Type symptoms separated by commas or natural language. Type 'quit' to exit.")
     while True:
@@ -33,9 +175,22 @@ def main():
         # Allow checking status of the loaded data and reloading the CSV at runtime
         if low == 'status':
             path = getattr(matcher, 'csv_path', None)
-            n = len(matcher.df) if getattr(matcher, 'df', None) is not None else 0
+            n = len(matcher.records)
             print(f"Loaded CSV: {path if path else 'None'}")
             print(f"Entries loaded: {n}")
+            info = matcher.status()
+            cache = info['cache']
+            print(f"Model version: {info['version']}")
+            print(f"Catalog rows: {info['source_rows']} in CSV, {info['entries']} after merging "
+                  f"{info['merged_rows']} duplicates")
+            stats = matcher.stats()
+            if stats:
+                print(f"{'stage':<16}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+                for stage, s in stats.items():
+                    print(f"{stage:<16}{s['count']:>8}{s['mean_ms']:>10.3f}{s['p50_ms']:>10.3f}"
+                          f"{s['p90_ms']:>10.3f}{s['p99_ms']:>10.3f}")
+            print(f"Query cache: {cache['size']}/{cache['maxsize']} entries, "
+                  f"{cache['hits']} hits, {cache['misses']} misses, {cache['evictions']} evictions")
             continue
         if low.startswith('reload'):
             # support: 'reload' or 'reload <path>'
@@ -45,7 +200,7 @@ def main():
             else:
                 new_path = matcher.csv_path or csv_path
             try:
-                matcher.fit_from_csv(new_path)
+                matcher.reload(new_path)
                 print(f"Reloaded CSV from: {new_path}")
             except Exception as e:
                 print(f"Failed to reload CSV: {e}")
@@ -96,4 +251,6 @@ def main():
 
 
 if __name__ == '__main__':
+    if sys.argv[1:2] == ['batch']:
+        sys.exit(batch_main(sys.argv[2:]))
     main()
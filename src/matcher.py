@@ -1,12 +1,39 @@
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Iterable, Iterator, Optional, Set
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 from pathlib import Path
 import csv
 import re
 import difflib
+import hashlib
+import logging
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict
+from itertools import islice
+
+from src.artifact import (
+    StringColumn,
+    StringPacker,
+    artifact_root,
+    build_lock,
+    content_key,
+    pack_strings,
+    read_artifact,
+    read_current,
+    stat_signature,
+    try_leader_lock,
+    write_artifact,
+)
+from src.incremental import HashingIndex, HashingView
+from src.lsa import LsaIndex
+from src.timing import StageTimer
+
+logger = logging.getLogger(__name__)
 
 
 def load_synonyms(path: str) -> Dict[str, List[str]]:
@@ -26,21 +53,836 @@ def load_synonyms(path: str) -> Dict[str, List[str]]:
     return mapping
 
 
+_WORD_RE = re.compile(r"\w+")
+
+# characters of one query that get typo correction; tokens past this budget are kept as typed,
+# since each corrected token costs O(len ** max_distance) delete hashes
+_MAX_CORRECTED_CHARS = 256
+
+# upper bound on the stored entries of one query x catalog similarity block in
+# match_many (sparse nnz, or cells in dense mode); about 50 MB of scores and indices
+_PRODUCT_BUDGET = 4_000_000
+
+
+class SynonymExpander:
+    """Rewrite synonym phrases to their canonical form in a single pass.
+
+    Synonyms are compiled into a trie keyed by word tokens, so a text is scanned
+    once left to right and at each token the longest synonym phrase starting
+    there is replaced. Matching is done on whole tokens only, which means a
+    synonym never rewrites part of a longer word. Lookup cost depends on the
+    length of the text and of the longest synonym phrase, not on how many
+    synonyms are loaded.
+    """
+
+    _END = object()
+
+    def __init__(self, synonyms: Dict[str, List[str]]):
+        self.root: Dict = {}
+        self.max_len = 0
+        for canon, syns in synonyms.items():
+            for syn in syns:
+                toks = _WORD_RE.findall(syn.lower())
+                if not toks:
+                    continue
+                node = self.root
+                for tok in toks:
+                    node = node.setdefault(tok, {})
+                # first canonical listed for a synonym wins, as before
+                node.setdefault(self._END, canon)
+                self.max_len = max(self.max_len, len(toks))
+
+    def __bool__(self) -> bool:
+        return bool(self.root)
+
+    def expand(self, text: str) -> str:
+        if not text or not self.root:
+            return text
+        spans = [(m.start(), m.end(), m.group()) for m in _WORD_RE.finditer(text)]
+        out: List[str] = []
+        pos = 0
+        i = 0
+        n = len(spans)
+        while i < n:
+            node = self.root
+            best = None
+            j = i
+            while j < n and j - i < self.max_len:
+                node = node.get(spans[j][2])
+                if node is None:
+                    break
+                j += 1
+                canon = node.get(self._END)
+                if canon is not None:
+                    best = (j, canon)
+            if best is None:
+                i += 1
+                continue
+            end, canon = best
+            out.append(text[pos:spans[i][0]])
+            out.append(canon)
+            pos = spans[end - 1][1]
+            i = end
+        if not out:
+            return text
+        out.append(text[pos:])
+        return "".join(out)
+
+
+def _delete_hash(text: str) -> int:
+    # stable across processes (unlike hash()), so the index can be persisted
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class TypoCorrector:
+    """Fuzzy token correction backed by a symmetric-delete index.
+
+    Every vocabulary word is indexed under all strings reachable by deleting up
+    to `max_distance` characters. A query token generates its own deletes and
+    only the words sharing one of them are scored with difflib's ratio, using
+    the same cutoff and tie-breaking as `difflib.get_close_matches(n=1)`.
+    Candidates therefore differ from a full difflib scan only for long words
+    with more than `max_distance` edits on either side. Tokens longer than the
+    longest vocabulary word plus `max_distance` cannot share a delete with any
+    word and are rejected before any deletes are generated. Recent answers are
+    kept in a bounded LRU so repeated typos are a dict lookup.
+
+    The index is held in flat arrays (sorted 64-bit delete hashes, offsets and
+    word ids) so it can be saved with the matcher artifact and memory-mapped.
+    A hash collision only adds a candidate that then fails the ratio check.
+    """
+
+    def __init__(self, vocab: Iterable[str], cutoff: float = 0.7, max_distance: int = 2, cache_size: int = 4096):
+        self.words: List[str] = sorted(set(vocab))
+        self.cutoff = cutoff
+        self.max_distance = max_distance
+        self.cache_size = cache_size
+        hashes: List[int] = []
+        ids: List[int] = []
+        for wid, word in enumerate(self.words):
+            for d in self._deletes(word):
+                hashes.append(_delete_hash(d))
+                ids.append(wid)
+        h = np.array(hashes, dtype=np.uint64)
+        w = np.array(ids, dtype=np.int32)
+        order = np.lexsort((w, h))
+        h, w = h[order], w[order]
+        keys, starts = np.unique(h, return_index=True)
+        self._init_index(keys, np.append(starts, h.size).astype(np.int64), w)
+
+    @classmethod
+    def from_arrays(cls, words: List[str], keys: np.ndarray, ptr: np.ndarray, word_ids: np.ndarray,
+                    cutoff: float = 0.7, max_distance: int = 2, cache_size: int = 4096) -> "TypoCorrector":
+        """Rebuild a corrector from the arrays returned by `arrays()` (e.g. memory-mapped)."""
+        self = cls.__new__(cls)
+        self.words = list(words)
+        self.cutoff = cutoff
+        self.max_distance = max_distance
+        self.cache_size = cache_size
+        self._init_index(keys, ptr, word_ids)
+        return self
+
+    def _init_index(self, keys: np.ndarray, ptr: np.ndarray, word_ids: np.ndarray) -> None:
+        self.vocab: Set[str] = set(self.words)
+        # longest word a query token could still be `max_distance` deletes away from
+        self.max_len = max(map(len, self.words), default=0)
+        self.keys = keys
+        self.ptr = ptr
+        self.word_ids = word_ids
+        # words added after construction (incremental catalogs): delete hash -> word ids
+        self.extra: Dict[int, List[int]] = {}
+        self._cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add_words(self, words: Iterable[str]) -> None:
+        """Index new vocabulary words without rebuilding the flat arrays."""
+        with self._lock:
+            added = False
+            for word in words:
+                if word in self.vocab:
+                    continue
+                wid = len(self.words)
+                self.words.append(word)
+                self.vocab.add(word)
+                self.max_len = max(self.max_len, len(word))
+                for d in self._deletes(word):
+                    self.extra.setdefault(_delete_hash(d), []).append(wid)
+                added = True
+            if added:
+                # cached "no close match" answers may now have one
+                self._cache.clear()
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {'keys': self.keys, 'ptr': self.ptr, 'word_ids': self.word_ids}
+
+    def _deletes(self, word: str) -> Set[str]:
+        out = {word}
+        frontier = {word}
+        for _ in range(self.max_distance):
+            nxt = set()
+            for w in frontier:
+                if len(w) <= 1:
+                    continue
+                for i in range(len(w)):
+                    nxt.add(w[:i] + w[i + 1:])
+            nxt -= out
+            out |= nxt
+            frontier = nxt
+        return out
+
+    def _lookup(self, token: str) -> Optional[str]:
+        if not self.keys.size and not self.extra:
+            return None
+        hashes = [_delete_hash(d) for d in self._deletes(token)]
+        candidates = set()
+        if self.keys.size:
+            hs = np.array(hashes, dtype=np.uint64)
+            pos = np.searchsorted(self.keys, hs)
+            found = pos < self.keys.size
+            pos, hs = pos[found], hs[found]
+            pos = pos[self.keys[pos] == hs]
+            for p in pos:
+                candidates.update(self.word_ids[self.ptr[p]:self.ptr[p + 1]].tolist())
+        for h in hashes:
+            candidates.update(self.extra.get(h, ()))
+        best = None
+        sm = difflib.SequenceMatcher()
+        sm.set_seq2(token)
+        for wid in candidates:
+            word = self.words[wid]
+            sm.set_seq1(word)
+            if sm.real_quick_ratio() >= self.cutoff and sm.quick_ratio() >= self.cutoff:
+                score = sm.ratio()
+                if score >= self.cutoff and (best is None or (score, word) > best):
+                    best = (score, word)
+        return best[1] if best else None
+
+    def correct(self, token: str) -> Optional[str]:
+        """Return the closest vocabulary word for `token`, or None if nothing is close enough."""
+        if token in self.vocab:
+            return token
+        if len(token) > self.max_len + self.max_distance:
+            return None
+        with self._lock:
+            if token in self._cache:
+                self._cache.move_to_end(token)
+                return self._cache[token]
+        result = self._lookup(token)
+        with self._lock:
+            self._cache[token] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+
+class ResultCache:
+    """Thread-safe LRU cache with a per-entry time-to-live and hit/miss counters."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return the cached value or None."""
+        if self.maxsize <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires < now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _freeze_results(results: List[Tuple[str, float, str, List[str]]]) -> tuple:
+    """ResultCache form of a match() result: tuples all the way down, so no caller can alter it."""
+    return tuple((disease, score, tips, tuple(matched)) for disease, score, tips, matched in results)
+
+
+def _thaw_results(entry: tuple) -> List[Tuple[str, float, str, List[str]]]:
+    """A match() result built from a ResultCache entry; nothing in it is shared with the cache."""
+    return [(disease, score, tips, list(matched)) for disease, score, tips, matched in entry]
+
+
+_ONE_BYTES = np.uint64(0x0101010101010101)
+_HIGH_BITS = np.uint64(0x8080808080808080)
+
+
+def _suffix_chunk(text: np.ndarray, pos: np.ndarray, chunk: int) -> np.ndarray:
+    """Bytes 8*chunk .. 8*chunk+7 of each suffix as big-endian uint64, so integer order is byte order."""
+    key = np.zeros(pos.size, dtype=np.uint64)
+    base = pos.astype(np.int64) + 8 * chunk
+    for j in range(8):
+        key |= text[base + j].astype(np.uint64) << np.uint64(56 - 8 * j)
+    return key
+
+
+def _refine_ties(keys: np.ndarray, group: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """For rows sorted by (group, keys): each row's new group (its first slot) and whether it still ties."""
+    brk = np.ones(keys.size, dtype=bool)
+    np.not_equal(keys[1:], keys[:-1], out=brk[1:])
+    if group is not None:
+        brk[1:] |= group[1:] != group[:-1]
+    starts = np.where(brk, np.arange(keys.size), 0)
+    np.maximum.accumulate(starts, out=starts)
+    tied = np.zeros(keys.size, dtype=bool)
+    tied[1:] = ~brk[1:]
+    tied[:-1] |= ~brk[1:]
+    # a chunk holding the NUL separator ends both suffixes: equal ones stay equal
+    tied &= ((keys - _ONE_BYTES) & ~keys & _HIGH_BITS) == 0
+    return starts, tied
+
+
+def _suffix_array(names: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """(name id, character offset) of every suffix of `names`, in code point order.
+
+    The names are UTF-8 encoded into one NUL-separated buffer (UTF-8 byte order
+    is code point order, and NUL sorts a suffix before its extensions). Suffixes
+    are bucketed by first byte, then sorted 8 bytes at a time: each pass only
+    re-sorts the suffixes still tied with a neighbour, so memory stays a few
+    arrays of one int per suffix instead of one Python string per suffix.
+    Buckets are collected and converted one at a time, so apart from the two
+    int32 results only bucket-sized temporaries are live. Names must not
+    contain NUL.
+    """
+    if not names:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+    # 8 bytes of padding: a tied suffix is never read past its NUL plus one chunk
+    text = np.frombuffer('\0'.join(names).encode('utf-8') + b'\0' * 9, dtype=np.uint8)
+    body = text[:-8]
+    # suffixes start at characters: not at separators or UTF-8 continuation bytes
+    counts = np.bincount(body, minlength=256)
+    counts[0] = 0
+    counts[0x80:0xC0] = 0
+    sa = np.empty(int(counts.sum()), dtype=np.int32)
+    lo = 0
+    for b in np.flatnonzero(counts):
+        hi = lo + int(counts[b])
+        p = sa[lo:hi]
+        p[:] = np.flatnonzero(body == b)
+        lo = hi
+        if p.size < 2:
+            continue
+        keys = _suffix_chunk(text, p, 0)
+        order = np.argsort(keys, kind='stable')
+        p[:] = p[order]
+        starts, tied = _refine_ties(keys[order], None)
+        del keys, order
+        slots = np.flatnonzero(tied)
+        group = starts[slots]
+        del starts, tied
+        chunk = 1
+        while slots.size:
+            sub = p[slots]
+            keys = _suffix_chunk(text, sub, chunk)
+            order = np.lexsort((keys, group))
+            p[slots] = sub[order]
+            starts, tied = _refine_ties(keys[order], group[order])
+            slots, group = slots[tied], starts[tied]
+            chunk += 1
+    name_start = np.flatnonzero(body == 0)
+    name_start[1:] = name_start[:-1] + 1
+    name_start[0] = 0
+    # byte offset -> character offset, only needed for non-ASCII names
+    char_index = np.cumsum((body & 0xC0) != 0x80, dtype=np.int32) if (body & 0x80).any() else None
+    sa_name = np.empty(sa.size, dtype=np.int32)
+    step = 1 << 20
+    for lo in range(0, sa.size, step):
+        pos = sa[lo:lo + step]
+        ids = np.searchsorted(name_start, pos, side='right') - 1
+        sa_name[lo:lo + step] = ids
+        if char_index is None:
+            pos -= name_start[ids].astype(np.int32)
+        else:
+            pos[:] = char_index[pos] - char_index[name_start[ids]]
+    # sa now holds each suffix's character offset within its name
+    return sa_name, sa
+
+
+class NameIndex:
+    """Case-insensitive lookup of catalog rows by disease name, built at fit time.
+
+    Distinct lowercased names are kept sorted in a packed StringColumn, with
+    their rows grouped in CSR form (`ptr`/`rows`, ascending). Substring search uses a suffix array over
+    the distinct names: the suffixes that start with the query form one
+    contiguous range, found by binary search, so a lookup costs O(|q| log S)
+    plus the size of the answer. Exact lookups binary-search the sorted names.
+    Queries are compared as plain strings, never compiled as patterns.
+
+    Every array can be memory-mapped from an artifact. Rows added later in
+    feature_space='hashing' mode go to an overlay dict that is scanned
+    linearly and folded into the arrays once it holds `rebuild_ratio` as many
+    names as the arrays. The state is swapped as one tuple, so readers never lock.
+    """
+
+    def __init__(self, names, ptr: np.ndarray, rows: np.ndarray, sa_name: np.ndarray,
+                 sa_off: np.ndarray, rebuild_ratio: float = 0.1):
+        # names: sorted StringColumn (a plain list of str also works)
+        self._state = (names, ptr, rows, sa_name, sa_off, {})
+        self.rebuild_ratio = rebuild_ratio
+
+    @classmethod
+    def build(cls, diseases: Iterable[str], rebuild_ratio: float = 0.1) -> "NameIndex":
+        lowered = [d.lower() for d in diseases]
+        # a stable sort, so each name's rows stay ascending
+        order = sorted(range(len(lowered)), key=lowered.__getitem__)
+        return cls(*cls._index_sorted([lowered[i] for i in order], order), rebuild_ratio=rebuild_ratio)
+
+    @staticmethod
+    def _index_sorted(keys: List[str], rows: List[int]):
+        """Index arrays for rows with lowercased names `keys`, sorted by name, then row."""
+        names: List[str] = []
+        starts: List[int] = []
+        for i, key in enumerate(keys):
+            if not names or names[-1] != key:
+                names.append(key)
+                starts.append(i)
+        starts.append(len(keys))
+        sa_name, sa_off = _suffix_array(names)
+        return (StringColumn(*pack_strings(names)), np.array(starts, dtype=np.int64),
+                np.array(rows, dtype=np.int64), sa_name, sa_off)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        names, ptr, rows, sa_name, sa_off, extra = self._state
+        if extra:
+            raise ValueError("NameIndex has unmerged rows; rebuild it before saving")
+        if isinstance(names, StringColumn):
+            blob, offsets = names.blob, names.offsets
+        else:
+            blob, offsets = pack_strings(names)
+        return {'blob': blob, 'offsets': offsets, 'ptr': ptr, 'rows': rows, 'sa_name': sa_name, 'sa_off': sa_off}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], rebuild_ratio: float = 0.1) -> "NameIndex":
+        return cls(StringColumn(arrays['blob'], arrays['offsets']), arrays['ptr'], arrays['rows'],
+                   arrays['sa_name'], arrays['sa_off'], rebuild_ratio=rebuild_ratio)
+
+    def lookup(self, name: str) -> List[int]:
+        """Rows whose lowercased disease name equals `name` (already lowercased), ascending."""
+        names, ptr, rows, _, _, extra = self._state
+        lo, hi = 0, len(names)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if names[mid] < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        found = rows[ptr[lo]:ptr[lo + 1]].tolist() if lo < len(names) and names[lo] == name else []
+        # overlay rows were added after every indexed row, so order is kept
+        found.extend(extra.get(name, ()))
+        return found
+
+    def search(self, text: str, limit: Optional[int] = None) -> List[int]:
+        """Rows whose lowercased disease name contains `text` (already lowercased), ascending.
+
+        With `limit`, only the `limit` lowest such rows are returned. They are
+        picked with a partition of the hit rows, so a query matching most of the
+        catalog sorts `limit` rows rather than all of them.
+        """
+        names, ptr, rows, sa_name, sa_off, extra = self._state
+        if text:
+            n = len(text)
+
+            def prefix(i: int) -> str:
+                return names[sa_name[i]][sa_off[i]:sa_off[i] + n]
+
+            lo, hi = 0, len(sa_name)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if prefix(mid) < text:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            start, hi = lo, len(sa_name)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if prefix(mid) <= text:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            # a name can hold the text more than once; gather each name's rows once
+            if (lo - start) * 16 > len(names):
+                # a mask over the names is cheaper than hashing a wide range
+                mask = np.zeros(len(names), dtype=bool)
+                mask[sa_name[start:lo]] = True
+                ids = np.flatnonzero(mask)
+            else:
+                ids = np.unique(sa_name[start:lo])
+            first, counts = ptr[ids], ptr[ids + 1] - ptr[ids]
+            ends = np.cumsum(counts)
+            hits = rows[np.arange(ends[-1] if ends.size else 0) + np.repeat(first - (ends - counts), counts)]
+        else:
+            hits = rows
+        if limit is not None and hits.size > limit:
+            hits = np.partition(hits, limit)[:limit]
+        found = np.sort(hits).tolist()
+        if limit is None or len(found) < limit:
+            # overlay rows were added after every indexed row, so they sort last
+            found.extend(sorted(r for name, rs in extra.items() if text in name for r in rs))
+        return found[:limit]
+
+    def add(self, diseases: Iterable[str], start: int) -> None:
+        """Index names for rows `start, start + 1, ...` (single writer)."""
+        names, ptr, rows, sa_name, sa_off, extra = self._state
+        # copy-on-write: readers may be iterating the current overlay
+        extra = {name: list(rs) for name, rs in extra.items()}
+        for i, disease in enumerate(diseases, start):
+            extra.setdefault(disease.lower(), []).append(i)
+        if len(extra) > self.rebuild_ratio * len(names):
+            groups = {names[i]: rows[ptr[i]:ptr[i + 1]].tolist() for i in range(len(names))}
+            for name, rs in extra.items():
+                groups.setdefault(name, []).extend(rs)
+            keys = sorted(groups)
+            self._state = self._index_sorted([k for k in keys for _ in groups[k]],
+                                             [r for k in keys for r in groups[k]]) + ({},)
+        else:
+            self._state = (names, ptr, rows, sa_name, sa_off, extra)
+
+
+class DiseaseRecord:
+    """Per-row data needed to build a match result, precomputed at fit time."""
+
+    __slots__ = ('disease', 'symptoms', 'tips', 'keywords')
+
+    def __init__(self, disease: str, symptoms: str, tips: str, keywords: frozenset):
+        self.disease = disease
+        self.symptoms = symptoms
+        self.tips = tips
+        # whitespace tokens of the normalised, synonym-expanded symptom text
+        self.keywords = keywords
+
+
+class RecordStore:
+    """Read-only sequence of DiseaseRecord rows decoded lazily from packed string columns.
+
+    Used for streamed fits and memory-mapped artifacts, so only the rows that
+    end up in a result are ever decoded.
+    """
+
+    __slots__ = ('disease', 'symptoms', 'tips', 'keywords')
+
+    def __init__(self, disease: StringColumn, symptoms: StringColumn, tips: StringColumn, keywords: StringColumn):
+        self.disease = disease
+        self.symptoms = symptoms
+        self.tips = tips
+        self.keywords = keywords
+
+    def __len__(self) -> int:
+        return len(self.disease)
+
+    def __getitem__(self, i: int) -> DiseaseRecord:
+        return DiseaseRecord(self.disease[i], self.symptoms[i], self.tips[i], frozenset(self.keywords[i].split()))
+
+    def columns(self) -> Dict[str, StringColumn]:
+        return {'disease': self.disease, 'symptoms': self.symptoms, 'tips': self.tips, 'keywords': self.keywords}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def _column_as_str(df: pd.DataFrame, column: str) -> List[str]:
+    if column not in df.columns:
+        return [""] * len(df)
+    return df[column].fillna("").astype(str).tolist()
+
+
+def _name_key(name: str) -> str:
+    # disease names are grouped lowercased with whitespace collapsed
+    return " ".join(name.lower().split())
+
+
+def _merge_items(*texts: str) -> str:
+    """Union of ';'-separated items in first-seen order, dropping case-insensitive repeats."""
+    items: Dict[str, str] = {}
+    for text in texts:
+        for item in text.split(';'):
+            item = item.strip()
+            if item and item.lower() not in items:
+                items[item.lower()] = item
+    return "; ".join(items.values())
+
+
+class CatalogMerger:
+    """Collapse catalog rows that share a normalised disease name into one row.
+
+    The first spelling of a name is kept, and symptoms and tips are merged with
+    `_merge_items`. Rows seen once are kept verbatim, as are rows without a
+    name. Merged rows keep the position of their name's first row.
+
+    Each `add()` batch is merged on its own first, then packed into
+    StringPacker buffers together with a 64-bit hash of each row's name, so
+    memory is the packed text plus one int per row instead of Python strings
+    per distinct disease. Rows of the same name in different batches are found
+    by sorting the hashes and comparing names only within runs of equal hashes.
+    """
+
+    def __init__(self):
+        self._columns = (StringPacker(), StringPacker(), StringPacker())
+        self._hashes = array('q')
+        # (rows folded into an earlier row, {first row: rows of its name}); built lazily
+        self._groups: Optional[Tuple[np.ndarray, Dict[int, List[int]]]] = None
+        self.rows_in = 0
+
+    def __len__(self) -> int:
+        skip, _ = self._group()
+        return skip.size - int(skip.sum())
+
+    def add(self, diseases: Iterable[str], symptoms: Iterable[str], tips: Iterable[str]) -> None:
+        first: Dict[str, int] = {}
+        batch: List[List[str]] = []
+        for disease, sym, tip in zip(diseases, symptoms, tips):
+            key = _name_key(disease)
+            self.rows_in += 1
+            i = first.get(key) if key else None
+            if i is None:
+                # unnamed rows are never merged
+                if key:
+                    first[key] = len(batch)
+                batch.append([disease, sym, tip])
+                self._hashes.append(hash(key))
+            else:
+                batch[i][1] = _merge_items(batch[i][1], sym)
+                batch[i][2] = _merge_items(batch[i][2], tip)
+        for packer, values in zip(self._columns, zip(*batch)):
+            packer.extend(values)
+        self._groups = None
+
+    def _group(self) -> Tuple[np.ndarray, Dict[int, List[int]]]:
+        if self._groups is None:
+            n = len(self._hashes)
+            skip = np.zeros(n, dtype=bool)
+            members: Dict[int, List[int]] = {}
+            hashes = np.frombuffer(self._hashes, dtype=np.int64)
+            order = np.argsort(hashes, kind='stable')
+            ends = np.flatnonzero(np.diff(hashes[order])) + 1
+            del hashes
+            starts = np.concatenate([[0], ends])
+            ends = np.concatenate([ends, [n]])
+            disease = self._columns[0].column()
+            for s in np.flatnonzero(ends - starts > 1):
+                # a run of equal hashes: usually one name, but check for collisions
+                by_name: Dict[str, List[int]] = {}
+                for j in order[starts[s]:ends[s]].tolist():
+                    key = _name_key(disease[j])
+                    if key:
+                        by_name.setdefault(key, []).append(j)
+                for rows in by_name.values():
+                    if len(rows) > 1:
+                        members[rows[0]] = rows
+                        skip[rows[1:]] = True
+            self._groups = (skip, members)
+        return self._groups
+
+    def rows(self) -> Iterator[Tuple[str, str, str]]:
+        skip, members = self._group()
+        disease, symptoms, tips = (packer.column() for packer in self._columns)
+        for i in np.flatnonzero(~skip).tolist():
+            rows = members.get(i)
+            if rows is None:
+                yield disease[i], symptoms[i], tips[i]
+            else:
+                yield (disease[i], _merge_items(*(symptoms[j] for j in rows)),
+                       _merge_items(*(tips[j] for j in rows)))
+
+
+class MatcherModel:
+    """Immutable snapshot of everything a fitted DiseaseMatcher reads at query time.
+
+    A request takes one reference to the current snapshot and uses it throughout,
+    so a reload that swaps in a new snapshot can never be observed half-built.
+    Snapshots are never mutated after construction. In feature_space='hashing'
+    mode the records list, NameIndex and HashingIndex storage is shared between
+    versions and updated in place, but each snapshot reads it through its own
+    HashingView: rows added or removed after the snapshot was published stay
+    invisible to it (see src/incremental.py). What does change under a hashing
+    snapshot is the idf weighting and the typo corrector's vocabulary, which only
+    grows, so a query may be corrected towards a word that snapshot cannot match.
+    """
+
+    __slots__ = (
+        'version', 'vectorizer', 'tfidf_matrix', 'postings', 'index', 'records', 'names',
+        'synonyms', 'expander', 'vocab', 'corrector', 'csv_path', 'csv_mtime', 'source_stat', 'catalog',
+        'artifact', 'generation', 'lsa',
+    )
+
+    def __init__(self, version: int = 0, vectorizer=None, tfidf_matrix=None, postings=None,
+                 index: Optional[HashingView] = None, records=(), names: Optional[NameIndex] = None,
+                 synonyms=None, expander=None, corrector=None, csv_path: Optional[str] = None,
+                 csv_mtime: Optional[float] = None, source_stat=None, catalog: Optional[dict] = None,
+                 artifact: Optional[str] = None, generation: int = 0, lsa: Optional[LsaIndex] = None):
+        self.version = version
+        self.vectorizer = vectorizer
+        self.tfidf_matrix = tfidf_matrix
+        self.postings = postings
+        # view of the HashingIndex in feature_space='hashing' mode, else None
+        self.index = index
+        self.records = records
+        self.names = names if names is not None else NameIndex.build(r.disease for r in records)
+        self.synonyms = synonyms or {}
+        self.expander = expander or SynonymExpander({})
+        self.corrector = corrector or TypoCorrector(())
+        self.vocab = self.corrector.vocab
+        self.csv_path = csv_path
+        self.csv_mtime = csv_mtime
+        # stat signature of the CSV and synonyms file taken before this snapshot was built
+        self.source_stat = source_stat
+        # row counts from loading the CSV (see DiseaseMatcher._iter_rows)
+        self.catalog = catalog or {}
+        # key and generation of the artifact this snapshot is mapped from, if any
+        self.artifact = artifact
+        self.generation = generation
+        # LsaIndex when the matcher uses scoring='lsa', else None
+        self.lsa = lsa
+
+    def evolve(self, **changes) -> "MatcherModel":
+        """Shallow copy with some fields replaced (the version is assigned on swap)."""
+        fields = {name: getattr(self, name) for name in self.__slots__ if name not in ('version', 'vocab')}
+        fields.update(changes)
+        return MatcherModel(**fields)
+
+    def is_live(self, row: int) -> bool:
+        """Whether `row` is a catalog row of this snapshot (hashing mode can remove rows)."""
+        return self.index is None or self.index.is_live(row)
+
+    def live_count(self) -> int:
+        return self.index.n_live if self.index is not None else len(self.records)
+
+
+def _budget_slices(costs, budget: float) -> List[Tuple[int, int]]:
+    """Split rows 0..len(costs) into consecutive (start, end) slices whose summed cost is at most budget.
+
+    A row that alone exceeds the budget gets a slice of its own.
+    """
+    slices = []
+    start, total = 0, 0.0
+    for i, c in enumerate(costs):
+        if i > start and total + c > budget:
+            slices.append((start, i))
+            start, total = i, 0.0
+        total += c
+    if start < len(costs):
+        slices.append((start, len(costs)))
+    return slices
+
+
 class DiseaseMatcher:
     """Load diseases from a CSV and match free-text symptom input to diseases.
 
     CSV format (header): disease,symptoms,tips
     - symptoms should be a short text (semicolon or comma separated symptoms is fine)
+
+    Fitted state lives in an immutable MatcherModel snapshot (`self.model`).
+    `fit_from_csv` and `reload` build a new snapshot and swap it in with a single
+    assignment; `start_watcher` does the same from a background thread whenever
+    the CSV or synonyms file changes, so queries never stat files or refit.
     """
 
-    def __init__(self):
-        self.df = None
-        self.vectorizer = None
-        self.tfidf_matrix = None
-        self.synonyms = {}
-        self.vocab = set()
-        self.csv_path = None
-        self.csv_mtime = None
+    SCORING_ENGINES = ('sparse', 'dense', 'lsa')
+    FEATURE_SPACES = ('tfidf', 'hashing')
+
+    def __init__(self, scoring: str = 'sparse', synonyms_path: str = 'data/symptoms_synonyms.csv',
+                 use_artifact: bool = True, cache_size: int = 1024, cache_ttl: float = 300.0,
+                 feature_space: str = 'tfidf', chunk_size: int = 50000, canonicalize: bool = True,
+                 lsa_components: int = 128, ann_lists: Optional[int] = None, ann_nprobe: int = 8,
+                 timing: bool = False):
+        if scoring not in self.SCORING_ENGINES:
+            raise ValueError(f"Unknown scoring engine: {scoring!r}")
+        if feature_space not in self.FEATURE_SPACES:
+            raise ValueError(f"Unknown feature space: {feature_space!r}")
+        if scoring == 'lsa' and feature_space != 'tfidf':
+            raise ValueError("scoring='lsa' needs feature_space='tfidf'")
+        # 'tfidf' fits a vocabulary and needs a full refit for any catalog change;
+        # 'hashing' (src/incremental.py) supports add_diseases/remove_diseases in place
+        # and is never persisted as an artifact
+        self.feature_space = feature_space
+        # rows per chunk when streaming the CSV during a fit
+        self.chunk_size = chunk_size
+        # merge rows that repeat a disease name into one entry (see CatalogMerger)
+        self.canonicalize = canonicalize
+        # 'sparse' scores only rows sharing a term with the query via column postings,
+        # 'dense' is the original full cosine_similarity pass over the catalog,
+        # 'lsa' searches truncated-SVD embeddings through an IVF index (src/lsa.py)
+        self.scoring = scoring
+        self.lsa_components = lsa_components
+        self.ann_lists = ann_lists
+        self.ann_nprobe = ann_nprobe
+        self.synonyms_path = synonyms_path
+        # load/save a memory-mapped fitted artifact next to the CSV (see src/artifact.py)
+        self.use_artifact = use_artifact
+        self.model = MatcherModel()
+        # match() results keyed by (model version, corrected tokens, top_k, threshold);
+        # cache_size=0 disables it
+        self.cache = ResultCache(cache_size, cache_ttl)
+        # per-stage query timings (src/timing.py); fit and reload durations are
+        # always recorded, query stages only while `timer.enabled` is set
+        self.timer = StageTimer(enabled=timing)
+        self._version = 0
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._watch_stop = threading.Event()
+        # start_shared(): the held leader lock file, the watcher settings and the
+        # last seen stat of current.json
+        self._leader = None
+        self._shared: Optional[Tuple[float, float]] = None
+        self._next_lead_attempt = 0.0
+        self._current_sig = None
+
+    # read-only views of the current snapshot, kept for existing callers
+    vectorizer = property(lambda self: self.model.vectorizer)
+    tfidf_matrix = property(lambda self: self.model.tfidf_matrix)
+    postings = property(lambda self: self.model.postings)
+    records = property(lambda self: self.model.records)
+    synonyms = property(lambda self: self.model.synonyms)
+    expander = property(lambda self: self.model.expander)
+    vocab = property(lambda self: self.model.vocab)
+    corrector = property(lambda self: self.model.corrector)
+    csv_path = property(lambda self: self.model.csv_path)
+    csv_mtime = property(lambda self: self.model.csv_mtime)
+    version = property(lambda self: self.model.version)
 
     def _normalize_text(self, text: str) -> str:
         if text is None:
@@ -48,15 +890,9 @@ class DiseaseMatcher:
         # basic normalization: lowercase and replace separators with spaces
         return text.lower().replace(";", " ").replace(",", " ")
 
-    def _expand_with_synonyms(self, text: str) -> str:
-        # expand text by replacing canonical synonyms with their variants
-        s = text
-        for canon, syns in self.synonyms.items():
-            # replace canonical with itself and synonyms
-            for syn in syns:
-                if syn and syn in s:
-                    s = s.replace(syn, canon)
-        return s
+    def _expand_with_synonyms(self, text: str, model: Optional[MatcherModel] = None) -> str:
+        # replace synonym phrases with their canonical term (compiled at fit time)
+        return (model or self.model).expander.expand(text)
 
     def _tokenize(self, text: str) -> List[str]:
         # extract word-like tokens; keep simple alphanum tokens
@@ -65,76 +901,637 @@ class DiseaseMatcher:
         tokens = re.findall(r"\w+", text.lower())
         return tokens
 
-    def _correct_and_dedup_tokens(self, tokens: List[str]) -> List[str]:
+    def _correct_and_dedup_tokens(self, tokens: List[str], model: Optional[MatcherModel] = None) -> List[str]:
         """Correct tokens by fuzzy-matching against vocabulary and remove duplicates (preserve order)."""
+        corrector = (model or self.model).corrector
         seen = set()
         out: List[str] = []
-        vocab = list(self.vocab)
+        budget = _MAX_CORRECTED_CHARS
         for t in tokens:
             if not t:
                 continue
             corrected = t
-            if t not in self.vocab and vocab:
-                # try fuzzy match
-                best = difflib.get_close_matches(t, vocab, n=1, cutoff=0.7)
-                if best:
-                    corrected = best[0]
+            if t not in corrector.vocab and budget > 0:
+                budget -= len(t)
+                # fuzzy match against the index built at fit time
+                corrected = corrector.correct(t) or t
             if corrected not in seen:
                 seen.add(corrected)
                 out.append(corrected)
         return out
 
     def fit_from_csv(self, csv_path: str) -> None:
-        self.df = pd.read_csv(csv_path)
-        # remember path and mtime for auto-reload
-        self.csv_path = str(csv_path)
+        """Fit (or load the cached artifact for) `csv_path` and make it the current model."""
+        with self._reload_lock:
+            start = time.perf_counter()
+            self._swap(self._build(str(csv_path)))
+            self.timer.lap('fit', start)
+
+    def reload(self, csv_path: Optional[str] = None) -> int:
+        """Rebuild from `csv_path` (default: the current CSV) and swap it in; returns the new version.
+
+        The old snapshot keeps serving queries until the new one is complete. On
+        error the current snapshot is left untouched and the exception propagates.
+        """
+        path = str(csv_path or self.model.csv_path or '')
+        if not path:
+            raise RuntimeError("Matcher not trained. Call fit_from_csv(csv_path) first.")
+        with self._reload_lock:
+            start = time.perf_counter()
+            model = self.model
+            if model.index is not None and path == model.csv_path \
+                    and self._source_stat(path)[1] == model.source_stat[1]:
+                # same CSV, same synonyms: apply the row differences in place
+                version = self._sync_rows(model, path)
+            else:
+                version = self._swap(self._build(path))
+            self.timer.lap('reload', start)
+            return version
+
+    def _swap(self, model: MatcherModel) -> int:
+        self._version += 1
+        model.version = self._version
+        # single reference assignment: readers see either the old or the new snapshot
+        self.model = model
+        # keys carry the model version, so entries for the old snapshot can no
+        # longer hit; dropping them just frees the memory
+        self.cache.clear()
+        return model.version
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Timing percentiles per stage (see `StageTimer.stats`), for /status and the CLI.
+
+        Query stages: normalize, expand, tokenize, correct, cache, transform,
+        score, results and the whole `match`; `batch.*` for match_many chunks;
+        `find` for find_by_name; plus `fit`, `reload` and `sync` (switching to
+        another process's generation).
+        """
+        return self.timer.stats()
+
+    def status(self) -> Dict[str, object]:
+        """Summary of the loaded catalog and query cache, for the /status page and CLI."""
+        model = self.model
+        return {
+            'csv_path': model.csv_path,
+            'entries': model.live_count(),
+            'source_rows': model.catalog.get('source_rows', 0),
+            'merged_rows': model.catalog.get('merged_rows', 0),
+            'dropped_columns': model.catalog.get('dropped_columns', []),
+            'version': model.version,
+            'generation': model.generation,
+            'shared_role': None if self._shared is None else ('leader' if self._leader is not None else 'follower'),
+            'scoring': self.scoring,
+            'feature_space': self.feature_space,
+            'cache': self.cache.stats(),
+        }
+
+    def _source_stat(self, csv_path: str) -> list:
+        return stat_signature([csv_path, self.synonyms_path])
+
+    def _build(self, csv_path: str) -> MatcherModel:
+        # stat before reading so a change made during the build is picked up next time
+        source_stat = self._source_stat(csv_path)
         try:
-            self.csv_mtime = Path(csv_path).stat().st_mtime
+            csv_mtime = Path(csv_path).stat().st_mtime
         except Exception:
-            self.csv_mtime = None
-        if 'symptoms' not in self.df.columns:
-            raise ValueError("CSV must contain a 'symptoms' column")
+            csv_mtime = None
+        info = {'csv_path': csv_path, 'csv_mtime': csv_mtime, 'source_stat': source_stat}
+        if self.feature_space == 'hashing':
+            return self._fit_hashing(info)
+        if not self.use_artifact:
+            return self._fit_csv(info)
+        root = artifact_root(csv_path)
+        key, stat = content_key([csv_path, self.synonyms_path], root, self._artifact_options())
+        loaded = read_artifact(root, key)
+        if loaded is not None:
+            return self._load_artifact(*loaded, info)
+        try:
+            # one process fits; any other that needs the same build waits and maps it
+            with build_lock(root):
+                loaded = read_artifact(root, key)
+                if loaded is None:
+                    model = self._fit_csv(info)
+                    self.save_artifact(root, key, stat, model)
+                    # serve the mapped copy, so this process shares its pages too
+                    loaded = read_artifact(root, key)
+        except OSError as e:
+            logger.warning(f"Could not write matcher artifact to {root}: {e}")
+            return self._fit_csv(info)
+        return self._load_artifact(*loaded, info) if loaded is not None else model
+
+    def _artifact_options(self) -> dict:
+        # build settings that change the fitted arrays, and so the artifact key
+        options = {'canonicalize': self.canonicalize}
+        if self.scoring == 'lsa':
+            options['lsa'] = {'components': self.lsa_components, 'lists': self.ann_lists}
+        return options
+
+    def _load_synonyms(self) -> Tuple[Dict[str, List[str]], SynonymExpander, Set[str]]:
         # load synonyms if present (data/symptoms_synonyms.csv)
-        self.synonyms = load_synonyms('data/symptoms_synonyms.csv')
-
-        # normalize and expand symptom text
-        symptom_texts = (
-            self.df['symptoms'].fillna("")
-            .apply(self._normalize_text)
-            .apply(self._expand_with_synonyms)
-            .tolist()
-        )
-        # build vocabulary from symptom texts and synonyms for fuzzy correction
+        synonyms = load_synonyms(self.synonyms_path)
+        # synonyms and canonicals are part of the fuzzy-correction vocabulary
         vocab = set()
-        for txt in symptom_texts:
-            for tok in self._tokenize(txt):
-                vocab.add(tok)
-        # include synonyms and canonicals
-        for canon, syns in self.synonyms.items():
+        for canon, syns in synonyms.items():
             for tok in self._tokenize(canon):
                 vocab.add(tok)
             for syn in syns:
                 for tok in self._tokenize(syn):
                     vocab.add(tok)
-        self.vocab = vocab
-        self.vectorizer = TfidfVectorizer(ngram_range=(1,2), stop_words='english')
-        self.tfidf_matrix = self.vectorizer.fit_transform(symptom_texts)
+        return synonyms, SynonymExpander(synonyms), vocab
 
-    def _maybe_reload(self):
-        """If the CSV file changed on disk since last load, reload it automatically."""
-        if not self.csv_path:
-            return
+    def _iter_rows(self, csv_path: str, stats: dict) -> Iterator[Tuple[List[str], List[str], List[str]]]:
+        """Stream the CSV in `chunk_size` row chunks as (diseases, symptoms, tips).
+
+        Only the disease, symptoms and tips columns are parsed; any others (such
+        as trailing empty columns) are dropped. With `canonicalize` on, rows are
+        merged by disease name first. `stats` receives source_rows,
+        merged_rows and dropped_columns.
+        """
+        header = pd.read_csv(csv_path, nrows=0).columns
+        if 'symptoms' not in header:
+            raise ValueError("CSV must contain a 'symptoms' column")
+        columns = [c for c in header if c in ('disease', 'symptoms', 'tips')]
+        stats.update(source_rows=0, merged_rows=0, dropped_columns=[str(c) for c in header if c not in columns])
+        merger = CatalogMerger() if self.canonicalize else None
+        for chunk in pd.read_csv(csv_path, usecols=columns, chunksize=self.chunk_size):
+            rows = (_column_as_str(chunk, 'disease'), _column_as_str(chunk, 'symptoms'), _column_as_str(chunk, 'tips'))
+            stats['source_rows'] += len(chunk)
+            if merger is None:
+                yield rows
+            else:
+                merger.add(*rows)
+        if merger is not None:
+            stats['merged_rows'] = merger.rows_in - len(merger)
+            merged = merger.rows()
+            while True:
+                batch = list(islice(merged, self.chunk_size))
+                if not batch:
+                    break
+                diseases, symptoms, tips = (list(col) for col in zip(*batch))
+                yield diseases, symptoms, tips
+
+    def _iter_catalog(self, csv_path: str, expander: SynonymExpander,
+                      stats: dict) -> Iterator[Tuple[List[str], ...]]:
+        """Like `_iter_rows`, plus each row's normalised, synonym-expanded symptom text."""
+        for diseases, symptoms, tips in self._iter_rows(csv_path, stats):
+            # normalize and expand symptom text
+            texts = [expander.expand(self._normalize_text(t)) for t in symptoms]
+            yield diseases, symptoms, tips, texts
+
+    def _fit_hashing(self, info: dict) -> MatcherModel:
+        synonyms, expander, vocab = self._load_synonyms()
+        index = HashingIndex()
+        records: List[DiseaseRecord] = []
+        stats: dict = {}
+        for diseases, symptoms, tips, texts in self._iter_catalog(info['csv_path'], expander, stats):
+            # one regex pass per chunk; tokens never span the joining space
+            vocab.update(self._tokenize(' '.join(texts)))
+            records.extend(
+                DiseaseRecord(d, sym, tip, frozenset(text.split()))
+                for d, sym, tip, text in zip(diseases, symptoms, tips, texts)
+            )
+            index.add(texts)
+        return MatcherModel(
+            vectorizer=index.vectorizer, index=index.view(), records=records, synonyms=synonyms,
+            expander=expander, corrector=TypoCorrector(vocab), catalog=stats, **info,
+        )
+
+    def add_diseases(self, rows: Iterable) -> int:
+        """Append catalog rows without a refit (feature_space='hashing' only).
+
+        `rows` are (disease, symptoms, tips) tuples or dicts with those keys.
+        Returns the number of rows added. With `canonicalize` on, a row naming
+        a disease already in the catalog is merged into that entry, which is
+        replaced. Cost is proportional to the new rows' terms, not to the
+        catalog size; see src/incremental.py for the score tolerance against a
+        full refit.
+        """
+        with self._reload_lock:
+            model = self._incremental_model()
+            added = self._add_rows(model, rows)
+            self._swap(model.evolve(index=model.index.base.view()))
+            return added
+
+    def remove_diseases(self, names: Iterable[str]) -> int:
+        """Remove every row whose disease name matches one of `names` (case-insensitive).
+
+        feature_space='hashing' only. Returns the number of rows removed.
+        """
+        wanted = {n.strip().lower() for n in names}
+        with self._reload_lock:
+            model = self._incremental_model()
+            rows = [i for name in wanted for i in model.names.lookup(name) if model.is_live(i)]
+            removed = model.index.base.remove(rows)
+            self._swap(model.evolve(index=model.index.base.view()))
+            return removed
+
+    def _incremental_model(self) -> MatcherModel:
+        model = self._trained_model()
+        if model.index is None:
+            raise RuntimeError("Incremental updates need DiseaseMatcher(feature_space='hashing').")
+        return model
+
+    def _add_rows(self, model: MatcherModel, rows: Iterable, stale: Iterable[int] = ()) -> int:
+        """Index `rows`, then tombstone `stale` rows and any live rows the new ones replace."""
+        stale = set(stale)
+        incoming = []
+        for row in rows:
+            if isinstance(row, dict):
+                disease, symptoms, tips = row.get('disease', ''), row.get('symptoms', ''), row.get('tips', '')
+            else:
+                disease, symptoms, tips = row
+            incoming.append((str(disease or ''), str(symptoms or ''), str(tips or '')))
+        replaced = sorted(stale)
+        rows_to_add = incoming
+        if self.canonicalize:
+            # fold the new rows into any live entry with the same name, which is then replaced
+            merger = CatalogMerger()
+            for key in {_name_key(disease) for disease, _, _ in incoming} - {''}:
+                for i in model.names.lookup(key):
+                    if model.is_live(i) and i not in stale:
+                        rec = model.records[i]
+                        merger.add([rec.disease], [rec.symptoms], [rec.tips])
+                        replaced.append(i)
+            if incoming:
+                merger.add(*zip(*incoming))
+            rows_to_add = list(merger.rows())
+        new_records = []
+        texts = []
+        for disease, symptoms, tips in rows_to_add:
+            text = model.expander.expand(self._normalize_text(symptoms))
+            texts.append(text)
+            new_records.append(DiseaseRecord(disease, symptoms, tips, frozenset(text.split())))
+        if texts:
+            model.corrector.add_words(tok for text in texts for tok in self._tokenize(text))
+            # records first: the index only publishes rows once they are fully indexed
+            start = len(model.records)
+            model.records.extend(new_records)
+            model.names.add((rec.disease for rec in new_records), start)
+            model.index.base.add(texts)
+        # after the add, so the next snapshot never finds the disease missing
+        model.index.base.remove(replaced)
+        return len(incoming)
+
+    def _sync_rows(self, model: MatcherModel, csv_path: str) -> int:
+        """Bring a hashing-mode catalog in line with `csv_path` by adding/removing changed rows."""
+        source_stat = self._source_stat(csv_path)
+        stats: dict = {}
+        wanted = Counter()
+        for diseases, symptoms, tips in self._iter_rows(csv_path, stats):
+            wanted.update(zip(diseases, symptoms, tips))
+        stale = []
+        for i, rec in enumerate(model.records):
+            if not model.is_live(i):
+                continue
+            key = (rec.disease, rec.symptoms, rec.tips)
+            if wanted[key] > 0:
+                wanted[key] -= 1
+            else:
+                stale.append(i)
+        # stale rows are tombstoned only once their replacements are indexed
+        self._add_rows(model, list(wanted.elements()), stale)
         try:
-            m = Path(self.csv_path).stat().st_mtime
+            csv_mtime = Path(csv_path).stat().st_mtime
         except Exception:
+            csv_mtime = None
+        return self._swap(model.evolve(index=model.index.base.view(), csv_mtime=csv_mtime,
+                                       source_stat=source_stat, catalog=stats))
+
+    def _fit_csv(self, info: dict) -> MatcherModel:
+        """Fit TF-IDF by streaming the CSV, without holding it as a DataFrame.
+
+        Each chunk is counted with a CountVectorizer and its columns are remapped
+        to a growing global vocabulary, so the raw term counts accumulate as flat
+        CSR arrays and the row strings as packed UTF-8 buffers. Idf weighting and
+        L2 normalisation are then applied in place. The result is identical to
+        TfidfVectorizer.fit_transform on the whole column, and peak memory is the
+        packed strings plus the matrix rather than a DataFrame and text lists.
+        """
+        synonyms, expander, vocab = self._load_synonyms()
+        counter = CountVectorizer(ngram_range=(1,2), stop_words='english')
+        term_ids: Dict[str, int] = {}
+        indices = array('i')
+        data = array('d')
+        indptr = array('q', [0])
+        columns = {name: StringPacker() for name in ('disease', 'symptoms', 'tips', 'keywords')}
+        stats: dict = {}
+        for diseases, symptoms, tips, texts in self._iter_catalog(info['csv_path'], expander, stats):
+            # one regex pass per chunk; tokens never span the joining space
+            vocab.update(self._tokenize(' '.join(texts)))
+            columns['disease'].extend(diseases)
+            columns['symptoms'].extend(symptoms)
+            columns['tips'].extend(tips)
+            columns['keywords'].extend(texts)
+            try:
+                counts = counter.fit_transform(texts).tocsr()
+            except ValueError:
+                # no terms in this chunk at all (e.g. only stop words)
+                indptr.extend([indptr[-1]] * len(texts))
+                continue
+            local = counter.get_feature_names_out()
+            remap = np.fromiter((term_ids.setdefault(t, len(term_ids)) for t in local),
+                                dtype=np.int32, count=len(local))
+            indices.frombytes(remap[counts.indices].astype(np.int32).tobytes())
+            data.frombytes(counts.data.astype(np.float64).tobytes())
+            indptr.frombytes((counts.indptr[1:] + indptr[-1]).astype(np.int64).tobytes())
+        if not term_ids:
+            raise ValueError("empty vocabulary; the CSV has no usable symptom text")
+        n_docs = len(indptr) - 1
+
+        # sklearn orders the vocabulary alphabetically; renumber columns to match
+        terms = sorted(term_ids)
+        order = np.empty(len(terms), dtype=np.int32)
+        order[np.fromiter((term_ids[t] for t in terms), dtype=np.int32, count=len(terms))] = np.arange(len(terms), dtype=np.int32)
+        del term_ids
+        col = order[np.frombuffer(indices, dtype=np.int32)]
+        del indices
+        val = np.frombuffer(data, dtype=np.float64).copy()
+        del data
+        ptr = np.frombuffer(indptr, dtype=np.int64).copy()
+
+        # same weighting as TfidfVectorizer(smooth_idf=True, norm='l2')
+        doc_freq = np.bincount(col, minlength=len(terms)).astype(np.float64)
+        idf = np.log((1.0 + n_docs) / (1.0 + doc_freq)) + 1.0
+        val *= idf[col]
+        row_len = np.diff(ptr)
+        sq = np.zeros(n_docs)
+        nonempty = row_len > 0
+        sq[nonempty] = np.add.reduceat(val * val, ptr[:-1][nonempty])
+        norms = np.sqrt(sq)
+        norms[norms == 0] = 1.0
+        val /= np.repeat(norms, row_len)
+        tfidf_matrix = sp.csr_matrix((val, col, ptr), shape=(n_docs, len(terms)))
+        tfidf_matrix.sort_indices()
+
+        vectorizer = TfidfVectorizer(
+            ngram_range=(1,2), stop_words='english', vocabulary={t: i for i, t in enumerate(terms)})
+        vectorizer.idf_ = idf
+        records = RecordStore(*[columns[name].column() for name in ('disease', 'symptoms', 'tips', 'keywords')])
+        return MatcherModel(
+            vectorizer=vectorizer, tfidf_matrix=tfidf_matrix, names=NameIndex.build(records.disease),
+            # column-major copy: each column lists the rows containing that term
+            postings=tfidf_matrix.tocsc(),
+            records=records, synonyms=synonyms, expander=expander, corrector=TypoCorrector(vocab),
+            catalog=stats, lsa=self._fit_lsa(tfidf_matrix), **info,
+        )
+
+    def _fit_lsa(self, tfidf_matrix) -> Optional[LsaIndex]:
+        if self.scoring != 'lsa':
+            return None
+        return LsaIndex.fit(tfidf_matrix, n_components=self.lsa_components, n_lists=self.ann_lists,
+                            nprobe=self.ann_nprobe)
+
+    def save_artifact(self, root: Path, key: str, stat: list, model: Optional[MatcherModel] = None) -> Path:
+        """Write a fitted snapshot (default: the current one) as a memory-mappable artifact under `root/key`."""
+        model = model or self.model
+        m = model.tfidf_matrix.tocsr()
+        c = model.postings
+        arrays = {
+            'idf': model.vectorizer.idf_,
+            'csr_data': m.data, 'csr_indices': m.indices, 'csr_indptr': m.indptr,
+            'csc_data': c.data, 'csc_indices': c.indices, 'csc_indptr': c.indptr,
+        }
+        for name, arr in model.corrector.arrays().items():
+            arrays[f'typo_{name}'] = arr
+        for name, arr in model.names.arrays().items():
+            arrays[f'names_{name}'] = arr
+        if model.lsa is not None:
+            for name, arr in model.lsa.arrays().items():
+                arrays[f'lsa_{name}'] = arr
+        if isinstance(model.records, RecordStore):
+            for name, col in model.records.columns().items():
+                arrays[f'{name}_blob'], arrays[f'{name}_offsets'] = col.blob, col.offsets
+        else:
+            columns = {
+                'disease': [r.disease for r in model.records],
+                'symptoms': [r.symptoms for r in model.records],
+                'tips': [r.tips for r in model.records],
+                'keywords': [" ".join(sorted(r.keywords)) for r in model.records],
+            }
+            for name, values in columns.items():
+                arrays[f'{name}_blob'], arrays[f'{name}_offsets'] = pack_strings(values)
+        meta = {
+            'shape': list(m.shape),
+            'terms': model.vectorizer.get_feature_names_out().tolist(),
+            'ngram_range': list(model.vectorizer.ngram_range),
+            'stop_words': model.vectorizer.stop_words,
+            'synonyms': model.synonyms,
+            'typo_words': model.corrector.words,
+            'typo_cutoff': model.corrector.cutoff,
+            'typo_max_distance': model.corrector.max_distance,
+            'catalog': model.catalog,
+            'options': self._artifact_options(),
+        }
+        return write_artifact(Path(root), key, arrays, meta, stat)
+
+    def _load_artifact(self, arrays: dict, meta: dict, info: dict) -> MatcherModel:
+        shape = tuple(meta['shape'])
+        terms = meta['terms']
+        vectorizer = TfidfVectorizer(
+            ngram_range=tuple(meta['ngram_range']), stop_words=meta['stop_words'],
+            vocabulary={t: i for i, t in enumerate(terms)},
+        )
+        vectorizer.idf_ = np.asarray(arrays['idf'])
+        synonyms = meta['synonyms']
+        current = read_current(artifact_root(info['csv_path']))
+        generation = current.get('generation', 0) if current and current['key'] == meta['key'] else 0
+        # nothing is parsed from the CSV
+        return MatcherModel(
+            vectorizer=vectorizer,
+            tfidf_matrix=sp.csr_matrix(
+                (arrays['csr_data'], arrays['csr_indices'], arrays['csr_indptr']), shape=shape, copy=False),
+            postings=sp.csc_matrix(
+                (arrays['csc_data'], arrays['csc_indices'], arrays['csc_indptr']), shape=shape, copy=False),
+            records=RecordStore(*[
+                StringColumn(arrays[f'{name}_blob'], arrays[f'{name}_offsets'])
+                for name in ('disease', 'symptoms', 'tips', 'keywords')
+            ]),
+            names=NameIndex.from_arrays({
+                name[len('names_'):]: arr for name, arr in arrays.items() if name.startswith('names_')}),
+            synonyms=synonyms,
+            expander=SynonymExpander(synonyms),
+            catalog=meta.get('catalog'),
+            corrector=TypoCorrector.from_arrays(
+                meta['typo_words'], arrays['typo_keys'], arrays['typo_ptr'], arrays['typo_word_ids'],
+                cutoff=meta['typo_cutoff'], max_distance=meta['typo_max_distance']),
+            artifact=meta['key'],
+            generation=generation,
+            lsa=LsaIndex.from_arrays({
+                name[len('lsa_'):]: arr for name, arr in arrays.items() if name.startswith('lsa_')},
+                nprobe=self.ann_nprobe) if 'lsa_components' in arrays else None,
+            **info,
+        )
+
+    def start_shared(self, interval: float = 2.0, debounce: float = 1.0) -> bool:
+        """Share one fitted model between processes, e.g. gunicorn workers, through the artifact.
+
+        Every process maps the same artifact files read-only, so the matrices and
+        row store are held once in the page cache. The first process to take
+        the leader lock in the artifact directory runs the watcher and alone
+        refits and publishes new generations; the others call `sync_shared()`
+        at the start of each request to switch to them. If the leader exits, a
+        follower takes over within `interval` seconds. With `interval <= 0`
+        nothing is watched and new generations only come from `reload()`.
+        Returns True if this process leads.
+        """
+        if not self.use_artifact or self.feature_space != 'tfidf':
+            raise RuntimeError("start_shared() needs use_artifact=True and feature_space='tfidf'.")
+        self._shared = (interval, debounce)
+        return self._try_lead()
+
+    def _try_lead(self) -> bool:
+        model = self.model
+        now = time.monotonic()
+        if self._leader is not None or not model.csv_path or now < self._next_lead_attempt:
+            return self._leader is not None
+        # an open() and a non-blocking flock(), at most once a second
+        self._next_lead_attempt = now + max(self._shared[0], 1.0)
+        try:
+            self._leader = try_leader_lock(artifact_root(model.csv_path))
+        except OSError as e:
+            logger.warning(f"Could not take the matcher leader lock: {e}")
+        if self._leader is None:
+            return False
+        if self._shared[0] > 0:
+            self.start_watcher(*self._shared)
+        return True
+
+    def sync_shared(self) -> bool:
+        """Switch to the newest artifact generation if another process published one.
+
+        Cheap enough to call on every request: unless current.json has changed
+        it costs a single stat(). Returns True if a new snapshot was swapped in.
+        """
+        if self._shared is None:
+            return False
+        model = self.model
+        if self._leader is None:
+            self._try_lead()
+        if not model.csv_path:
+            return False
+        root = artifact_root(model.csv_path)
+        try:
+            st = (root / 'current.json').stat()
+        except OSError:
+            return False
+        sig = (st.st_ino, st.st_size, st.st_mtime_ns)
+        if sig == self._current_sig:
+            return False
+        with self._reload_lock:
+            current = read_current(root)
+            model = self.model
+            if current is None or current['key'] == model.artifact:
+                self._current_sig = sig
+                return False
+            loaded = read_artifact(root, current['key'])
+            if loaded is None:
+                # replaced again while we looked; retry on the next call
+                return False
+            self._current_sig = sig
+            if loaded[1].get('options') != self._artifact_options():
+                # published by a process with different settings
+                return False
+            info = {
+                'csv_path': model.csv_path,
+                'csv_mtime': model.csv_mtime,
+                # the files as they were when the leader built this generation
+                'source_stat': current['stat'][:2],
+            }
+            start = time.perf_counter()
+            self._swap(self._load_artifact(*loaded, info))
+            self.timer.lap('sync', start)
+            logger.info(f"Switched to disease catalog generation {current.get('generation')}")
+            return True
+
+    def start_watcher(self, interval: float = 2.0, debounce: float = 1.0) -> None:
+        """Poll the CSV and synonyms file in a daemon thread and reload when they change.
+
+        A change is applied only once the files' size and mtime have stayed the
+        same for `debounce` seconds, so a CSV that is still being written is not
+        loaded half-way. Calling this again while a watcher runs is a no-op.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
             return
-        if self.csv_mtime is None or m != self.csv_mtime:
-            # reload
+        self._watch_stop.clear()
+        self._watcher = threading.Thread(
+            target=self._watch_loop, args=(interval, debounce), name='disease-matcher-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self, timeout: Optional[float] = None) -> None:
+        self._watch_stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout)
+            self._watcher = None
+        if self._leader is not None:
+            # hand leadership to another process
+            self._leader.close()
+            self._leader = None
+            self._shared = None
+
+    def _watch_loop(self, interval: float, debounce: float) -> None:
+        pending = None
+        pending_since = 0.0
+        failed = None
+        while not self._watch_stop.wait(interval):
+            model = self.model
+            if not model.csv_path:
+                continue
+            current = self._source_stat(model.csv_path)
+            if current == model.source_stat or current == failed:
+                pending = None
+                continue
+            if current != pending:
+                # changed since the last poll; wait until it settles
+                pending, pending_since = current, time.monotonic()
+                continue
+            if time.monotonic() - pending_since < debounce:
+                continue
             try:
-                self.fit_from_csv(self.csv_path)
-            except Exception:
-                # ignore reload errors for now
-                pass
+                version = self.reload(model.csv_path)
+                logger.info(f"Reloaded disease catalog {model.csv_path} (version {version})")
+                failed = None
+            except Exception as e:
+                # keep serving the previous snapshot; retry once the files change again
+                logger.warning(f"Failed to reload disease catalog {model.csv_path}: {e}")
+                failed = current
+            pending = None
+
+    def _prepare_query(self, model: MatcherModel, user_symptoms: str) -> List[str]:
+        """Normalise, expand, tokenize and spell-correct a query; returns deduplicated tokens."""
+        timer = self.timer.active()
+        if timer is None:
+            query = self._normalize_text(user_symptoms)
+            query = self._expand_with_synonyms(query, model)
+            # tokenize, correct misspellings and remove duplicates
+            tokens = self._tokenize(query)
+            return self._correct_and_dedup_tokens(tokens, model)
+        start = timer.now()
+        query = self._normalize_text(user_symptoms)
+        start = timer.lap('normalize', start)
+        query = self._expand_with_synonyms(query, model)
+        start = timer.lap('expand', start)
+        tokens = self._tokenize(query)
+        start = timer.lap('tokenize', start)
+        tokens = self._correct_and_dedup_tokens(tokens, model)
+        timer.lap('correct', start)
+        return tokens
+
+    def _build_results(self, model: MatcherModel, tokens: List[str], rows: np.ndarray,
+                       scores: np.ndarray) -> List[Tuple[str, float, str, List[str]]]:
+        query_tokens = set(tokens)
+        results = []
+        for idx, score in zip(rows, scores):
+            rec = model.records[idx]
+            # matched keywords: query tokens present in the disease's symptom text
+            matched = sorted(query_tokens & rec.keywords)
+            results.append((rec.disease, float(score), rec.tips, matched))
+        return results
+
+    def _trained_model(self) -> MatcherModel:
+        model = self.model
+        if model.vectorizer is None:
+            raise RuntimeError("Matcher not trained. Call fit_from_csv(csv_path) first.")
+        return model
 
     def match(self, user_symptoms: str, top_k: int = 3, threshold: float = 0.2) -> List[Tuple[str, float, str, List[str]]]:
         """Return up to top_k matches as (disease, score, tips, matched_keywords).
@@ -143,57 +1540,248 @@ class DiseaseMatcher:
         - threshold: minimum score to include a match
         - matched_keywords: a list of symptom keywords from the disease entry that contributed to the match
         """
-        # auto-reload if file changed
-        self._maybe_reload()
-
-        if self.df is None or self.vectorizer is None:
-            raise RuntimeError("Matcher not trained. Call fit_from_csv(csv_path) first.")
-        query = self._normalize_text(user_symptoms)
-        query = self._expand_with_synonyms(query)
-        # tokenize, correct misspellings and remove duplicates
-        tokens = self._tokenize(query)
-        tokens = self._correct_and_dedup_tokens(tokens)
-        query = " ".join(tokens)
-        q_vec = self.vectorizer.transform([query])
-        sims = cosine_similarity(q_vec, self.tfidf_matrix).flatten()
-        # get indices sorted by descending similarity
-        idx_sorted = np.argsort(-sims)
-        results = []
-        for idx in idx_sorted[:top_k]:
-            score = float(sims[idx])
-            if score < threshold:
-                continue
-            disease = str(self.df.iloc[idx]['disease'])
-            tips = str(self.df.iloc[idx]['tips']) if 'tips' in self.df.columns else ""
-            # extract matched keywords by intersecting token sets
-            disease_sym_text = self._expand_with_synonyms(self._normalize_text(str(self.df.iloc[idx]['symptoms'])))
-            query_tokens = set(query.split())
-            disease_tokens = set(disease_sym_text.split())
-            matched = sorted(list(query_tokens & disease_tokens))
-            results.append((disease, score, tips, matched))
+        model = self._trained_model()
+        timer = self.timer.active()
+        begin = start = timer.now() if timer else 0.0
+        tokens = self._prepare_query(model, user_symptoms)
+        # token order matters (bigrams), so the key keeps it rather than sorting
+        key = (model.version, tuple(tokens), top_k, threshold)
+        if timer:
+            start = timer.now()
+        cached = self.cache.get(key)
+        if timer:
+            start = timer.lap('cache', start)
+        if cached is not None:
+            if timer:
+                timer.lap('match', begin)
+            return _thaw_results(cached)
+        q_vec = model.vectorizer.transform([" ".join(tokens)])
+        if timer:
+            start = timer.lap('transform', start)
+        rows, scores = self._score(model, q_vec, top_k, threshold)
+        if timer:
+            start = timer.lap('score', start)
+        results = self._build_results(model, tokens, rows, scores)
+        self.cache.put(key, _freeze_results(results))
+        if timer:
+            timer.lap('results', start)
+            timer.lap('match', begin)
         return results
 
+    def match_many(self, queries: Iterable[str], top_k: int = 3, threshold: float = 0.2,
+                   chunk_size: int = 1024) -> List[List[Tuple[str, float, str, List[str]]]]:
+        """Match a batch of queries; returns one `match()`-style result list per query, in order.
+
+        Queries are processed `chunk_size` at a time: each chunk is vectorised with a
+        single transform call and scored with sparse matrix products against the
+        catalog. A chunk is split further so that no product holds more than
+        `_PRODUCT_BUDGET` entries (estimated from the catalog's term document
+        frequencies) and each block is reduced to its top_k rows before the next
+        one is built, so memory is bounded regardless of query length or how
+        common the query terms are. Repeated queries in a chunk are prepared and
+        scored once.
+
+        Throughput against a match() loop depends on the catalog: about 11x at
+        1k rows, 8x at 10k and 4x at 100k on the benchmark workloads
+        (scripts/benchmark_matcher.py). The product has to produce every catalog
+        row that shares a term with a query. On the 100k-row generator catalog
+        that is about 32k rows per query, and computing them is most of the cost
+        of both paths. The batch only saves the per-query overhead around it.
+        """
+        model = self._trained_model()
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        out: List[List[Tuple[str, float, str, List[str]]]] = []
+        chunk: List[str] = []
+        for q in queries:
+            chunk.append(q)
+            if len(chunk) >= chunk_size:
+                out.extend(self._match_chunk(model, chunk, top_k, threshold))
+                chunk = []
+        if chunk:
+            out.extend(self._match_chunk(model, chunk, top_k, threshold))
+        return out
+
+    def _match_chunk(self, model: MatcherModel, queries: List[str], top_k: int,
+                     threshold: float) -> List[List[Tuple[str, float, str, List[str]]]]:
+        # bulk inputs repeat notes verbatim; each distinct text is normalised and corrected once
+        prepared: Dict[str, List[str]] = {}
+        for q in queries:
+            if q not in prepared:
+                prepared[q] = self._prepare_query(model, q)
+        token_lists = [prepared[q] for q in queries]
+        keys = [(model.version, tuple(tokens), top_k, threshold) for tokens in token_lists]
+        out: List[Optional[List[Tuple[str, float, str, List[str]]]]] = []
+        for key in keys:
+            cached = self.cache.get(key)
+            out.append(_thaw_results(cached) if cached is not None else None)
+        # queries that prepare to the same tokens are scored once
+        misses: Dict[tuple, List[int]] = {}
+        for i, r in enumerate(out):
+            if r is None:
+                misses.setdefault(keys[i], []).append(i)
+        if not misses:
+            return out
+        token_lists = [token_lists[group[0]] for group in misses.values()]
+        timer = self.timer.active()
+        start = timer.now() if timer else 0.0
+        q_mat = model.vectorizer.transform([" ".join(tokens) for tokens in token_lists])
+        if timer:
+            start = timer.lap('batch.transform', start)
+        if model.index is not None:
+            # postings are scored per query; the index has no catalog matrix to multiply
+            q_mat = q_mat.tocsr()
+            picks = [self._score(model, q_mat[i], top_k, threshold) for i in range(q_mat.shape[0])]
+        elif self.scoring == 'lsa':
+            n_rows = model.tfidf_matrix.shape[0]
+            # one projection for the chunk, then an IVF probe per query
+            q_emb = model.lsa.embed(q_mat)
+            picks = [self._select(n_rows, *model.lsa.search(q), top_k, threshold) for q in q_emb]
+        elif self.scoring == 'dense':
+            n_rows = model.tfidf_matrix.shape[0]
+            all_rows = np.arange(n_rows)
+            picks = []
+            for lo, hi in _budget_slices(np.full(q_mat.shape[0], n_rows), _PRODUCT_BUDGET):
+                sims = cosine_similarity(q_mat[lo:hi], model.tfidf_matrix)
+                picks.extend(self._select(n_rows, all_rows, row, top_k, threshold) for row in sims)
+        else:
+            # sparse-sparse products; each result row holds only the catalog rows
+            # that share a term with that query, so its nnz is at most the summed
+            # document frequency of the query's terms
+            n_rows = model.tfidf_matrix.shape[0]
+            q_mat = q_mat.tocsr()
+            df = np.diff(model.postings.indptr)
+            q_rows = np.repeat(np.arange(q_mat.shape[0]), np.diff(q_mat.indptr))
+            cost = np.bincount(q_rows, weights=df[q_mat.indices], minlength=q_mat.shape[0])
+            picks = []
+            for lo, hi in _budget_slices(cost, _PRODUCT_BUDGET):
+                # postings is the CSC copy of the catalog, so its transpose is CSR for free
+                sims = (q_mat[lo:hi] @ model.postings.T).tocsr()
+                indptr, indices, data = sims.indptr, sims.indices, sims.data
+                picks.extend(
+                    self._select(n_rows, indices[indptr[i]:indptr[i + 1]], data[indptr[i]:indptr[i + 1]],
+                                 top_k, threshold)
+                    for i in range(sims.shape[0])
+                )
+                del sims, indptr, indices, data
+        if timer:
+            start = timer.lap('batch.score', start)
+        for (key, group), tokens, (rows, scores) in zip(misses.items(), token_lists, picks):
+            results = self._build_results(model, tokens, rows, scores)
+            frozen = _freeze_results(results)
+            self.cache.put(key, frozen)
+            out[group[0]] = results
+            for i in group[1:]:
+                out[i] = _thaw_results(frozen)
+        if timer:
+            timer.lap('batch.results', start)
+        return out
+
+    @staticmethod
+    def _top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Pick the k best (row, score) pairs ordered by score desc, then row index asc.
+
+        Scores are compared at 12 decimals so that the sparse and dense engines,
+        whose sums can differ in the last bit, rank tied rows the same way.
+        """
+        if k <= 0 or rows.size == 0:
+            return rows[:0], scores[:0]
+        key = np.round(scores, 12)
+        if rows.size > k:
+            part = np.argpartition(-key, k - 1)[:k]
+            # keep every row tied with the k-th score so ties resolve by index
+            keep = np.flatnonzero(key >= key[part].min())
+            rows, scores, key = rows[keep], scores[keep], key[keep]
+        order = np.lexsort((rows, -key))[:k]
+        return rows[order], scores[order]
+
+    def _score(self, model: MatcherModel, q_vec, top_k: int, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Score a single transformed query and return its top_k rows at or above threshold."""
+        if model.index is not None:
+            n_rows = model.index.n_rows
+            cand, sims = model.index.score(q_vec)
+            return self._select(n_rows, cand, sims, top_k, threshold, model.index)
+        n_rows = model.tfidf_matrix.shape[0]
+        if self.scoring == 'dense':
+            sims = cosine_similarity(q_vec, model.tfidf_matrix).ravel()
+            return self._select(n_rows, np.arange(sims.size), sims, top_k, threshold)
+        if self.scoring == 'lsa':
+            cand, sims = model.lsa.search(model.lsa.embed(q_vec)[0])
+            return self._select(n_rows, cand, sims, top_k, threshold)
+        # TF-IDF rows and the query are L2-normalised, so the dot product is the
+        # cosine; only rows that appear in a query term's postings can score > 0
+        q = q_vec.tocsr()
+        indptr, indices, data = model.postings.indptr, model.postings.indices, model.postings.data
+        hit_rows = []
+        hit_vals = []
+        for term, weight in zip(q.indices, q.data):
+            start, end = indptr[term], indptr[term + 1]
+            hit_rows.append(indices[start:end])
+            hit_vals.append(data[start:end] * weight)
+        if hit_rows:
+            cand, inverse = np.unique(np.concatenate(hit_rows), return_inverse=True)
+            sims = np.bincount(inverse, weights=np.concatenate(hit_vals), minlength=cand.size)
+        else:
+            cand, sims = np.empty(0, dtype=np.intp), np.empty(0)
+        return self._select(n_rows, cand, sims, top_k, threshold)
+
+    def _select(self, n_rows: int, rows: np.ndarray, sims: np.ndarray, top_k: int,
+                threshold: float, view: Optional[HashingView] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Apply top_k and threshold to scored candidate rows (rows not listed score 0)."""
+        rows, scores = self._top_k(rows, sims, top_k)
+        if rows.size < top_k and threshold <= 0 and rows.size < n_rows:
+            # the dense path also returns zero-score rows; pad them in index order
+            seen = set(rows.tolist())
+            live = view.live_mask() if view is not None else None
+            pad = []
+            for r in range(n_rows):
+                if len(pad) + rows.size >= top_k:
+                    break
+                if r not in seen and (live is None or live[r]):
+                    pad.append(r)
+            rows = np.concatenate([rows, np.asarray(pad, dtype=rows.dtype)])
+            scores = np.concatenate([scores, np.zeros(len(pad))])
+        keep = scores >= threshold
+        return rows[keep], scores[keep]
+
     def find_by_name(self, name: str, exact: bool = False, limit: int = 10) -> List[Tuple[str, str, str]]:
         """Find disease entries by name.
 
         Returns a list of (disease, symptoms, tips). If exact is True, matches exact disease name
         (case-insensitive). Otherwise performs a case-insensitive substring search and returns up to `limit` results.
+        The name is matched as plain text through the model's NameIndex, so only result rows are decoded.
         """
-        # auto-reload if file changed
-        self._maybe_reload()
-
-        if self.df is None:
-            raise RuntimeError("Matcher not trained. Call fit_from_csv(csv_path) first.")
+        model = self._trained_model()
+        timer = self.timer.active()
+        start = timer.now() if timer else 0.0
         q = name.strip().lower()
-        if exact:
-            mask = self.df['disease'].fillna("").str.lower() == q
-            matches = self.df[mask]
-        else:
-            mask = self.df['disease'].fillna("").str.lower().str.contains(q)
-            matches = self.df[mask].drop_duplicates(subset='disease')
-        results = []
-        for _, row in matches.head(limit).iterrows():
-            results.append((str(row['disease']), str(row.get('symptoms', '')), str(row.get('tips', ''))))
+        is_live = model.is_live
+        records = model.records
+        # packed stores can decode the name alone, so duplicates are skipped cheaply
+        disease_of = records.disease.__getitem__ if isinstance(records, RecordStore) else (lambda i: records[i].disease)
+        wanted = limit
+        while True:
+            rows = model.names.lookup(q) if exact else model.names.search(q, wanted)
+            results = []
+            seen = set()
+            for i in rows:
+                if len(results) >= limit:
+                    break
+                if not is_live(i):
+                    continue
+                if not exact:
+                    disease = disease_of(i)
+                    if disease in seen:
+                        continue
+                    seen.add(disease)
+                rec = records[i]
+                results.append((rec.disease, rec.symptoms, rec.tips))
+            if exact or len(results) >= limit or len(rows) < wanted:
+                break
+            # removed rows or repeated names used up part of the hits; fetch more
+            wanted *= 4
+        if timer:
+            timer.lap('find', start)
         return results
 
 
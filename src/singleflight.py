@@ -0,0 +1,144 @@
+"""
+Single-flight call coalescing.
+
+`SingleFlight.do(key, fn)` runs `fn` once per key at a time: a caller that
+arrives while another thread is already computing the same key waits for
+that call and gets its result (or its exception) instead of starting its
+own. AIClient uses it so a burst of /find lookups for one disease makes a
+single Gemini request per worker; across workers the same requests meet at
+PromptCache.fill_lock() (see src/ai_cache.py).
+
+`StreamFlight` is the streaming counterpart: one producer per key reads the
+source iterator on an executor thread and every concurrent caller, the first
+one included, replays its chunks as they arrive. The producer does not depend
+on any reader, so a client that disconnects mid-stream neither stalls the
+others nor cuts the answer short before it is cached.
+"""
+import threading
+from typing import Callable, Dict, Hashable, Iterable, Iterator, Optional
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key; see the module docstring."""
+
+    def __init__(self, timeout: float = 120.0):
+        # followers stop waiting after `timeout` seconds and make their own call
+        self.timeout = timeout
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: Optional[Hashable], fn: Callable):
+        if key is None:
+            return fn()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+        if not leader:
+            if not call.done.wait(self.timeout):
+                return fn()
+            with self._lock:
+                self.coalesced += 1
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'calls': self.calls, 'coalesced': self.coalesced, 'in_flight': len(self._calls)}
+
+
+class _Broadcast:
+    """Append-only chunk list that any number of readers iterate while it grows."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.cond = threading.Condition()
+
+    def publish(self, chunk) -> None:
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def close(self) -> None:
+        with self.cond:
+            self.done = True
+            self.cond.notify_all()
+
+    def __iter__(self) -> Iterator:
+        seen = 0
+        while True:
+            with self.cond:
+                while seen >= len(self.chunks) and not self.done:
+                    self.cond.wait()
+                new = self.chunks[seen:]
+                finished = self.done
+            seen += len(new)
+            yield from new
+            if finished and seen >= len(self.chunks):
+                return
+
+
+class StreamFlight:
+    """Share one streaming call per key between concurrent readers; see the module docstring."""
+
+    def __init__(self, executor):
+        self.executor = executor
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: Optional[Hashable], source: Callable[[], Iterable]) -> Iterator:
+        """Iterate the chunks of `source()`, run once per key at a time on the executor."""
+        with self._lock:
+            stream = self._streams.get(key) if key is not None else None
+            if stream is None:
+                stream = _Broadcast()
+                if key is not None:
+                    self._streams[key] = stream
+                self.calls += 1
+                self.executor.submit(self._produce, key, stream, source)
+            else:
+                self.coalesced += 1
+        return iter(stream)
+
+    def _produce(self, key, stream: _Broadcast, source) -> None:
+        try:
+            for chunk in source():
+                stream.publish(chunk)
+        except Exception as e:
+            stream.publish(f"AI Error: {e}")
+        finally:
+            with self._lock:
+                if key is not None and self._streams.get(key) is stream:
+                    del self._streams[key]
+            stream.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'calls': self.calls, 'coalesced': self.coalesced, 'in_flight': len(self._streams)}
@@ -0,0 +1,158 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src import ai_cache
+from src.ai_cache import PromptCache, prompt_key
+from src.ai_client import AIClient
+
+
+class FakeModel:
+    def __init__(self, replies, delay=0.0):
+        self.replies = list(replies)
+        self.delay = delay
+        self.calls = 0
+
+    def generate_content(self, content):
+        self.calls += 1
+        time.sleep(self.delay)
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return SimpleNamespace(text=reply)
+
+
+def make_client(cache, replies, delay=0.0):
+    client = AIClient(cache=cache)
+    client.model = FakeModel(replies, delay)
+    return client
+
+
+def run_concurrently(calls):
+    results = [None] * len(calls)
+
+    def run(i, fn):
+        results[i] = fn()
+
+    threads = [threading.Thread(target=run, args=(i, fn)) for i, fn in enumerate(calls)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_prompt_key_normalises_whitespace_and_separates_models():
+    assert prompt_key('m', 'about  the\n    disease') == prompt_key('m', ' about the disease ')
+    assert prompt_key('m', 'flu') != prompt_key('other', 'flu')
+    assert prompt_key('m', ['flu', b'img']) != prompt_key('m', ['flu', b'img2'])
+    assert prompt_key('m', ['flu', object()]) is None
+
+
+def test_responses_are_shared_through_disk_and_errors_are_not_cached(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    client = make_client(PromptCache(path), ['  **Flu** info ', 'second'])
+    assert client.generate_content('info about flu') == '**Flu** info'
+    assert client.generate_content('info  about flu') == '**Flu** info'
+    assert client.model.calls == 1
+
+    # another worker: empty memory tier, same file
+    other = make_client(PromptCache(path), [])
+    assert other.generate_content('info about flu') == '**Flu** info'
+    assert other.cache.stats()['disk_hits'] == 1
+
+    failing = make_client(PromptCache(path), [ValueError('boom'), 'ok'])
+    assert failing.generate_content('p').startswith('AI Error:')
+    assert failing.generate_content('p') == 'ok'
+    assert failing.model.calls == 2
+
+
+def test_expired_and_oversized_entries_are_evicted(tmp_path):
+    cache = PromptCache(str(tmp_path / 'c.sqlite3'), ttl=-1)
+    cache.put('k', 'v')
+    assert cache.get('k') is None
+
+    cache = PromptCache(str(tmp_path / 'd.sqlite3'), max_bytes=25, memory_items=0)
+    for i in range(5):
+        cache.put(f'k{i}', 'x' * 10)
+    stats = cache.stats()
+    assert stats['disk_bytes'] <= 25 and stats['evictions'] == 3
+    assert cache.get('k4') == 'x' * 10 and cache.get('k0') is None
+
+
+def test_concurrent_identical_prompts_share_one_call(tmp_path):
+    client = make_client(PromptCache(str(tmp_path / 'c.sqlite3')), ['answer'], delay=0.3)
+    results = run_concurrently([lambda: client.generate_content('about flu')] * 8)
+    assert results == ['answer'] * 8
+    assert client.model.calls == 1
+    assert client.flight.stats()['coalesced'] == 7
+
+
+@pytest.mark.skipif(ai_cache.fcntl is None, reason='needs fcntl file locks')
+def test_workers_coalesce_through_the_shared_cache_file(tmp_path):
+    path = str(tmp_path / 'c.sqlite3')
+    # two "workers": separate clients, memory tiers and lock file handles
+    first = make_client(PromptCache(path), ['answer'], delay=0.3)
+    second = make_client(PromptCache(path), ['duplicate'])
+    results = run_concurrently([lambda: first.generate_content('about flu'),
+                                lambda: (time.sleep(0.1), second.generate_content('about flu'))[1]])
+    assert results == ['answer', 'answer']
+    assert first.model.calls + second.model.calls == 1
+
+
+@pytest.mark.skipif(ai_cache.fcntl is None, reason='needs fcntl file locks')
+def test_fill_lock_waiters_wake_on_release_and_time_out(tmp_path):
+    path = str(tmp_path / 'c.sqlite3')
+    holder, waiter = PromptCache(path), PromptCache(path)
+    key = prompt_key('m', 'about flu')
+    with holder.fill_lock(key) as waited:
+        assert waited is False
+        start = time.monotonic()
+        with waiter.fill_lock(key, timeout=0.2) as waited:
+            assert waited is True
+        assert 0.15 < time.monotonic() - start < 1.0
+        release_at = time.monotonic() + 0.3
+        entered = []
+
+        def wait_for_it():
+            with waiter.fill_lock(key, timeout=5.0) as waited:
+                entered.append((waited, time.monotonic()))
+        t = threading.Thread(target=wait_for_it)
+        t.start()
+        time.sleep(max(0.0, release_at - time.monotonic()))
+    t.join(5.0)
+    # woken by the release, not by a poll interval or the timeout
+    assert entered and entered[0][0] is True and entered[0][1] - release_at < 0.2
+    # the abandoned wait let go of the lock too: nothing holds the key any more
+    start = time.monotonic()
+    with holder.fill_lock(key, timeout=0.5):
+        pass
+    assert time.monotonic() - start < 0.4
+
+
+class StreamingModel:
+    def __init__(self, parts):
+        self.parts = parts
+        self.calls = 0
+
+    def generate_content(self, content, stream=False):
+        self.calls += 1
+
+        def chunks():
+            for part in self.parts:
+                time.sleep(0.05)
+                yield SimpleNamespace(text=part)
+        return chunks()
+
+
+def test_concurrent_streams_share_one_call_and_fill_the_cache(tmp_path):
+    client = AIClient(cache=PromptCache(str(tmp_path / 'c.sqlite3')))
+    client.model = StreamingModel(['## Flu', ' is', ' common '])
+    results = run_concurrently([lambda: list(client.stream_content('about flu'))] * 4)
+    assert results == [['## Flu', ' is', ' common ']] * 4
+    assert client.model.calls == 1
+    assert client.generate_content('about flu') == '## Flu is common'
+    assert list(client.stream_content('about flu')) == ['## Flu is common']
+    assert client.timer.stats()['stream.first_chunk']['count'] == 1
@@ -0,0 +1,58 @@
+import time
+
+from src.ai_client import AIClient, BUSY_MESSAGE, RATE_LIMITED_MESSAGE
+from src.ai_limiter import PRIORITY_INTERACTIVE, PRIORITY_LOOKUP, QuotaLimiter
+
+
+def admitted(limiter, priority):
+    with limiter.admit(priority) as ok:
+        return ok
+
+
+def test_low_priority_leaves_tokens_and_slots_for_interactive(tmp_path):
+    limiter = QuotaLimiter(str(tmp_path / 'q.sqlite3'), rate=0.0, burst=5, max_concurrent=4)
+    # lookups must leave 40% of the bucket: 2 of 5 tokens
+    assert [admitted(limiter, PRIORITY_LOOKUP) for _ in range(4)] == [True, True, True, False]
+    assert [admitted(limiter, PRIORITY_INTERACTIVE) for _ in range(3)] == [True, True, False]
+    assert limiter.stats()['shed_quota'] == 2
+
+    limiter = QuotaLimiter(rate=100.0, burst=100, max_concurrent=4)
+    with limiter.admit(PRIORITY_LOOKUP), limiter.admit(PRIORITY_LOOKUP):
+        assert not admitted(limiter, PRIORITY_LOOKUP)
+        assert admitted(limiter, PRIORITY_INTERACTIVE)
+    assert admitted(limiter, PRIORITY_LOOKUP)
+
+
+def test_bucket_and_back_off_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / 'q.sqlite3')
+    first, second = QuotaLimiter(path, rate=0.0, burst=2), QuotaLimiter(path, rate=0.0, burst=2)
+    assert admitted(first, PRIORITY_INTERACTIVE) and admitted(second, PRIORITY_INTERACTIVE)
+    assert not admitted(first, PRIORITY_INTERACTIVE)
+
+    first, second = QuotaLimiter(path + '2', base_backoff=10.0), QuotaLimiter(path + '2', base_backoff=10.0)
+    delay = first.record_rate_limited()
+    assert 5.0 <= delay <= 10.0
+    assert not admitted(second, PRIORITY_INTERACTIVE)
+    assert second.stats()['shed_backoff'] == 1
+
+
+class QuotaError(Exception):
+    pass
+
+
+class RateLimitedModel:
+    calls = 0
+
+    def generate_content(self, content):
+        self.calls += 1
+        raise QuotaError('429 Resource has been exhausted (e.g. check quota).')
+
+
+def test_client_sheds_instead_of_sleeping_after_a_429():
+    client = AIClient(limiter=QuotaLimiter(base_backoff=30.0))
+    client.model = RateLimitedModel()
+    start = time.perf_counter()
+    assert client.generate_content('p') == RATE_LIMITED_MESSAGE
+    assert client.generate_content('p') == BUSY_MESSAGE
+    assert time.perf_counter() - start < 1.0
+    assert client.model.calls == 1
@@ -0,0 +1,235 @@
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+import src.blueprints.main as main
+from src.blueprints.main import await_ai, parse_api_items
+from src.matcher import DiseaseMatcher
+
+
+class FakeAI:
+    """Stands in for AIClient: submit() answers 'answer' after `delay` seconds."""
+
+    def __init__(self, delay=0.0, cached=None):
+        self.pool = ThreadPoolExecutor(2)
+        self.delay = delay
+        self.answer = cached
+        self.submitted = []
+
+    def submit(self, prompt, priority=None):
+        self.submitted.append(prompt)
+        return self.pool.submit(lambda: time.sleep(self.delay) or 'answer')
+
+    def cached(self, prompt):
+        return self.answer
+
+
+@pytest.fixture
+def page_app(monkeypatch, tmp_path):
+    app = Flask(__name__, instance_path=str(tmp_path))
+    app.register_blueprint(main.main_bp)
+    monkeypatch.setattr(main, 'matcher', SimpleNamespace(sync_shared=lambda: None))
+    monkeypatch.setattr(main, '_ai_jobs', {})
+    return app
+
+
+def test_parse_api_items_accepts_single_list_and_objects():
+    assert parse_api_items({'query': 'fever'}) == [(None, 'fever')]
+    assert parse_api_items({'queries': ['a', {'id': 2, 'query': 'b'}, 3]}) == [(None, 'a'), (2, 'b'), (None, None)]
+    assert parse_api_items(['x', {'id': 'k'}]) == [(None, 'x'), ('k', None)]
+    with pytest.raises(ValueError):
+        parse_api_items({'symptoms': 'fever'})
+    with pytest.raises(ValueError):
+        parse_api_items(42)
+
+
+def test_await_ai_returns_by_the_deadline():
+    with ThreadPoolExecutor(1) as pool:
+        slow = pool.submit(time.sleep, 0.5)
+        start = time.monotonic()
+        assert await_ai(slow, start + 0.1) == (None, True)
+        assert time.monotonic() - start < 0.3
+        assert await_ai(pool.submit(str, 'done'), time.monotonic() + 1.0) == ('done', False)
+    assert await_ai(None, time.monotonic()) == (None, False)
+
+
+def test_streaming_mode_starts_no_call_and_points_at_the_stream(page_app, monkeypatch):
+    fake = FakeAI()
+    monkeypatch.setattr(main, 'ai_client', fake)
+    page_app.config.update(AI_STREAMING=True)
+    with page_app.test_request_context():
+        started = main.begin_ai('match', 'fever')
+        assert started is None and fake.submitted == []
+        args = main.finish_ai('match', 'fever', started)
+        assert args['gemini_response'] is None and 'fever' not in args['ai_stream_url']
+        fake.answer = 'cached answer'
+        assert main.finish_ai('match', 'fever', started) == {'gemini_response': 'cached answer'}
+
+
+def test_stream_tokens_stream_once_and_without_a_client(page_app, monkeypatch):
+    monkeypatch.setattr(main, 'ai_client', None)
+    page_app.config.update(AI_STREAMING=True)
+    client = page_app.test_client()
+    with page_app.test_request_context():
+        url = main.url_for('main.ai_stream', token=main.save_pending('ai_pending', b'{"kind": "match", "text": "x"}'))
+        skin_url = main.url_for('main.skin_stream', token=main.save_pending('skin_pending', b'not an image'))
+    for stream_url in (url, skin_url):
+        resp = client.get(stream_url)
+        assert resp.mimetype == 'text/event-stream'
+        assert resp.get_data(as_text=True) == 'event: done\ndata: {}\n\n'
+        # a token is spent by its first request
+        assert client.get(stream_url).status_code == 404
+    assert client.get('/api/ai/stream/' + 'f' * 32).status_code == 404
+    assert client.get('/skin/stream/../../etc').status_code == 404
+
+
+def test_pending_uploads_expire_and_are_dropped_when_the_page_fails(page_app, monkeypatch):
+    import io
+    import os
+    from PIL import Image
+
+    monkeypatch.setattr(main, 'ai_client', FakeAI())
+    monkeypatch.setattr(main, '_pending_swept', 0.0)
+    page_app.config.update(AI_STREAMING=True)
+    page_app.secret_key = 'test'
+    client = page_app.test_client()
+    with page_app.test_request_context():
+        token = main.save_pending('skin_pending', b'photo')
+        path = os.path.join(main.pending_dir('skin_pending'), token)
+    old = time.time() - main.PENDING_TTL - 1
+    os.utime(path, (old, old))
+    with page_app.test_request_context():
+        assert main.read_pending('skin_pending', token) is None
+    # an expired upload is never served, and the next request's sweep deletes it
+    assert client.get('/skin/stream/' + token).status_code == 404
+    assert not os.path.exists(path)
+
+    png = io.BytesIO()
+    Image.new('RGB', (2, 2)).save(png, format='PNG')
+    # this app has no templates, so rendering the page fails after the upload was saved
+    resp = client.post('/skin', data={'image': (io.BytesIO(png.getvalue()), 'rash.png')})
+    assert resp.status_code == 302
+    assert os.listdir(os.path.join(page_app.instance_path, 'skin_pending')) == []
+
+
+def test_deadline_mode_polls_check_the_call_the_page_started(page_app, monkeypatch):
+    fake = FakeAI(delay=0.5)
+    monkeypatch.setattr(main, 'ai_client', fake)
+    page_app.config.update(AI_STREAMING=False, AI_DEADLINE=0.05)
+    with page_app.test_request_context():
+        args = main.finish_ai('find', 'flu', main.begin_ai('find', 'flu'))
+    assert args['gemini_response'] is None and 'flu' not in args['ai_pending_url']
+    client = page_app.test_client()
+    statuses = []
+    for _ in range(100):
+        body = client.get(args['ai_pending_url']).get_json()
+        statuses.append(body['status'])
+        if body['status'] == 'done':
+            break
+    assert statuses[0] == 'pending' and body == {'status': 'done', 'text': 'answer'}
+    # every poll checked the page's call instead of submitting its own
+    assert len(fake.submitted) == 1
+
+    # the poll that got the answer spent the token
+    assert client.get(args['ai_pending_url']).status_code == 404
+
+    # a worker that did not render the page starts one call for all its polls
+    with page_app.test_request_context():
+        args = main.finish_ai('find', 'flu', main.begin_ai('find', 'flu'))
+    main._ai_jobs.clear()
+    fake.delay = 0.2
+    for _ in range(3):
+        client.get(args['ai_pending_url'])
+    assert len(fake.submitted) == 3
+
+    # a poll names a prompt the server saved; anything else starts no call
+    for url in ('/api/ai/answer/' + 'f' * 32, '/api/ai/answer/..', '/api/ai/find?q=anything'):
+        assert client.get(url).status_code == 404
+    assert len(fake.submitted) == 3
+
+
+def test_match_page_polls_for_the_answer_with_streaming_off(monkeypatch, tmp_path):
+    from app import create_app
+
+    app = create_app('testing')
+    app.instance_path = str(tmp_path)
+    app.config.update(AI_STREAMING=False, AI_DEADLINE=0.05)
+    fake = FakeAI(delay=0.3)
+    monkeypatch.setattr(main, 'ai_client', fake)
+    monkeypatch.setattr(main, 'matcher', SimpleNamespace(sync_shared=lambda: None, match=lambda *a, **k: []))
+    monkeypatch.setattr(main, '_ai_jobs', {})
+    client = app.test_client()
+    page = client.post('/match', data={'symptoms': 'private symptom text'}).get_data(as_text=True)
+    poll_url = json.loads(re.search(r'fetch\(("[^"]+")\)', page).group(1))
+    assert poll_url.startswith('/api/ai/answer/') and 'private' not in poll_url
+    for _ in range(100):
+        body = client.get(poll_url).get_json()
+        if body['status'] == 'done':
+            break
+        time.sleep(0.02)
+    assert body == {'status': 'done', 'text': 'answer'}
+    assert fake.submitted == [main.match_prompt('private symptom text')]
+
+
+class CountingMatcher:
+    """A fitted DiseaseMatcher that counts match_many calls."""
+
+    def __init__(self):
+        self.matcher = DiseaseMatcher(use_artifact=False)
+        self.matcher.fit_from_csv('data/diseases.csv')
+        self.calls = 0
+
+    def sync_shared(self):
+        return False
+
+    def match_many(self, queries, **kwargs):
+        self.calls += 1
+        return self.matcher.match_many(queries, **kwargs)
+
+
+@pytest.fixture
+def api_client(page_app, monkeypatch):
+    m = CountingMatcher()
+    monkeypatch.setattr(main, 'matcher', m)
+    client = page_app.test_client()
+    client.matcher = m
+    return client
+
+
+def test_api_match_rejects_bad_bodies_and_oversized_batches(api_client, page_app):
+    assert api_client.post('/api/match').status_code == 400
+    assert api_client.post('/api/match', data='', content_type='application/json').status_code == 400
+    assert api_client.post('/api/match', data='\n \n', content_type='application/x-ndjson').status_code == 400
+    bad = api_client.post('/api/match', data='{"query": "fever"}\n{oops\n', content_type='application/x-ndjson')
+    assert bad.status_code == 400 and 'invalid NDJSON' in bad.get_json()['error']
+    assert api_client.post('/api/match', json={'query': 'fever', 'top_k': 'many'}).status_code == 400
+    page_app.config.update(MATCH_API_MAX_QUERIES=3)
+    assert api_client.post('/api/match', json=['a', 'b', 'c', 'd']).status_code == 413
+    assert api_client.post('/api/match', json=['a', 'b', 'c']).status_code == 200
+    ndjson = '\n'.join(json.dumps({'id': i, 'query': 'fever'}) for i in range(4))
+    assert api_client.post('/api/match', data=ndjson, content_type='application/x-ndjson').status_code == 413
+    # nothing was scored for a rejected request
+    assert api_client.matcher.calls == 1
+
+
+def test_api_match_streams_one_chunk_at_a_time(api_client, monkeypatch):
+    monkeypatch.setattr(main, 'API_MATCH_CHUNK', 2)
+    queries = ['fever cough', {'id': 'x', 'query': 'headache nausea'}, {'id': 9}, 'sneezing runny nose', 'rash']
+    resp = api_client.post('/api/match', json={'queries': queries, 'top_k': 2}, buffered=False)
+    assert resp.status_code == 200 and resp.mimetype == 'application/x-ndjson' and resp.is_streamed
+    body = iter(resp.response)
+    first = next(body)
+    # only the first chunk has been scored when its lines arrive
+    assert api_client.matcher.calls == 1
+    lines = [json.loads(line) for line in (first + b''.join(body)).decode().splitlines()]
+    resp.close()
+    assert api_client.matcher.calls == 3
+    assert [r['index'] for r in lines] == [0, 1, 2, 3, 4]
+    assert lines[1]['id'] == 'x' and lines[2] == {'index': 2, 'id': 9, 'error': 'item needs a "query" string'}
+    assert all(len(r['matches']) <= 2 for r in lines if 'matches' in r)
+    assert lines[0]['matches'][0]['disease']
@@ -0,0 +1,26 @@
+import json
+
+from src.main import parse_request, run_batch
+
+
+def test_parse_request_accepts_plain_lines_and_jsonl():
+    assert parse_request('fever, cough') == ('match', 'fever, cough', None)
+    assert parse_request('find cold') == ('find', 'cold', None)
+    assert parse_request('Disease: Influenza') == ('find', 'Influenza', None)
+    assert parse_request('{"id": 3, "query": "rash"}') == ('match', 'rash', 3)
+    assert parse_request('{"find": "flu"}') == ('find', 'flu', None)
+    assert parse_request('   ') is None
+
+
+def test_batch_results_keep_input_order_across_workers():
+    lines = ['fever cough', 'find cold', '', '{"id": "a", "query": "sneezing runny nose"}', '{oops',
+             'headache nausea', 'disease: asthma', 'itchy eyes'] * 3
+    serial = list(run_batch(lines, workers=1, chunk_size=4))
+    parallel = list(run_batch(lines, workers=2, chunk_size=2))
+    assert json.dumps(parallel) == json.dumps(serial)
+    assert [r['line'] for r in serial] == [i for i, line in enumerate(lines, 1) if line]
+    first = serial[0]
+    assert first['query'] == 'fever cough' and first['matches']
+    assert serial[1]['find'] == 'cold' and any('Cold' in r['disease'] for r in serial[1]['results'])
+    assert serial[2]['id'] == 'a'
+    assert 'error' in serial[3]
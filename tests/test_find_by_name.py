@@ -13,3 +13,69 @@ def test_find_exact_and_partial():
     partial = m.find_by_name('cold', exact=False)
     assert len(partial) >= 1
     assert any('cold' in d.lower() for d, _, _ in partial)
+
+
+def test_name_index_substring_is_literal_and_tracks_added_rows():
+    from src.matcher import NameIndex
+
+    idx = NameIndex.build(['Common Cold', 'Cold Sore', 'Flu (A)', 'common cold', 'Asthma'])
+    assert idx.lookup('common cold') == [0, 3]
+    assert idx.search('cold') == [0, 1, 3]
+    assert idx.search('old s') == [1]
+    assert idx.search('(a)') == [2]
+    assert idx.search('.*') == []
+    assert idx.search('') == [0, 1, 2, 3, 4]
+
+    # the first addition stays in the overlay, the second one triggers a rebuild
+    idx.rebuild_ratio = 0.5
+    idx.add(['Head Cold'], start=5)
+    assert idx.search('cold') == [0, 1, 3, 5]
+    idx.add(['Cold Sore', 'Sinusitis'], start=6)
+    assert idx.search('cold') == [0, 1, 3, 5, 6]
+    assert idx.lookup('cold sore') == [1, 6]
+    assert idx.lookup('sinusitis') == [7]
+
+
+def test_name_index_suffix_order_handles_prefixes_and_non_ascii():
+    from src.matcher import NameIndex
+
+    names = ['Ménière Disease', 'Ménière', 'Straße Fieber', 'ab', 'abab', 'ababababababababab', 'Naïve T-cell']
+    idx = NameIndex.build(names)
+    lowered = [n.lower() for n in names]
+    for query in ('è', 'ère', 'ß', 'abab', 'b', 'ïve t', 'ababababababab', 'é d', 'x'):
+        assert idx.search(query) == [i for i, n in enumerate(lowered) if query in n]
+
+
+def test_name_index_search_limit_keeps_the_lowest_rows():
+    from src.matcher import NameIndex
+
+    names = [f'Type {i % 7} Fever' for i in range(40)] + ['Cold Cold', 'Head Cold']
+    idx = NameIndex.build(names)
+    # narrow and wide suffix ranges take different paths to the distinct names
+    assert idx.search('cold') == [40, 41]
+    assert idx.search('cold', 1) == [40]
+    assert idx.search('type', 3) == [0, 1, 2]
+    assert idx.search('type 3', 4) == [3, 10, 17, 24]
+    assert idx.search('', 2) == [0, 1]
+    assert idx.search('type', 0) == []
+    idx.add(['Chest Cold'], start=42)
+    assert idx.search('cold', 5) == [40, 41, 42]
+    assert idx.search('cold', 2) == [40, 41]
+
+
+def test_find_by_name_limit_skips_repeated_names(tmp_path):
+    csv_path = tmp_path / 'diseases.csv'
+    csv_path.write_text('disease,symptoms,tips\n' + 'Flu,fever,Rest\n' * 12 + 'Flu B,cough,Tea\nFlu C,chills,Soup\n',
+                        encoding='utf-8')
+    m = DiseaseMatcher(use_artifact=False, canonicalize=False)
+    m.fit_from_csv(str(csv_path))
+    assert [d for d, _, _ in m.find_by_name('flu', limit=3)] == ['Flu', 'Flu B', 'Flu C']
+    assert [d for d, _, _ in m.find_by_name('flu', limit=2)] == ['Flu', 'Flu B']
+
+
+def test_find_by_name_does_not_treat_input_as_regex():
+    m = DiseaseMatcher()
+    m.fit_from_csv('data/diseases.csv')
+    assert all('(' in d for d, _, _ in m.find_by_name('(', limit=5))
+    assert m.find_by_name('.*') == []
+    assert m.find_by_name('[') == []
@@ -0,0 +1,19 @@
+from scripts.generate_diseases import stream_csv
+
+
+def test_stream_csv_is_byte_identical_for_a_seed(tmp_path):
+    runs = []
+    for name in ('a', 'b'):
+        stream_csv(tmp_path / name / 'diseases.csv', 300, seed=7, vocab_size=80,
+                   queries_path=tmp_path / name / 'queries.csv', query_count=40)
+        runs.append([(tmp_path / name / f).read_bytes() for f in ('diseases.csv', 'queries.csv')])
+    assert runs[0] == runs[1]
+    stream_csv(tmp_path / 'c.csv', 300, seed=8, vocab_size=80)
+    assert (tmp_path / 'c.csv').read_bytes() != runs[0][0]
+
+
+def test_stream_csv_caps_symptoms_at_the_vocabulary_size(tmp_path):
+    # more symptoms per row than the vocabulary holds used to loop forever
+    stream_csv(tmp_path / 'small.csv', 20, vocab_size=3, min_symptoms=2, max_symptoms=6)
+    rows = (tmp_path / 'small.csv').read_text(encoding='utf-8').splitlines()[1:]
+    assert len(rows) == 20
@@ -0,0 +1,24 @@
+import sys
+
+from src.lazy import lazy_import
+from src.timing import startup
+
+
+def test_lazy_module_imports_on_first_use_and_records_it():
+    sys.modules.pop('colorsys', None)
+    colorsys = lazy_import('colorsys')
+    assert 'colorsys' not in sys.modules
+    assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0)[0] == 0.0
+    assert 'colorsys' in sys.modules
+    assert startup.stats()['import colorsys']['count'] == 1
+
+
+def test_missing_optional_module_is_falsy():
+    missing = lazy_import('no_such_module_xyz', optional=True)
+    assert not missing
+    try:
+        missing.anything
+    except ImportError:
+        pass
+    else:
+        raise AssertionError('expected ImportError')
@@ -0,0 +1,451 @@
+from pathlib import Path
+
+import numpy as np
+
+from src.matcher import DiseaseMatcher, SynonymExpander, TypoCorrector
+
+
+def test_synonym_expander_longest_match_and_word_boundaries():
+    exp = SynonymExpander({
+        'fever': ['pyrexia', 'high temperature', 'high temp'],
+        'cough': ['tussis'],
+    })
+    assert exp.expand('high temperature and tussis') == 'fever and cough'
+    assert exp.expand('high temp; pyrexia') == 'fever; fever'
+    # synonyms only match whole tokens
+    assert exp.expand('tussiss hightemp') == 'tussiss hightemp'
+
+
+def test_match_uses_synonyms():
+    m = DiseaseMatcher()
+    m.fit_from_csv('data/diseases.csv')
+    results = m.match('pyrexia and tussis with chills', top_k=3)
+    assert results
+    # one entry per disease name, so the best hit is an influenza variant
+    flu = results[0]
+    assert flu[0].startswith('Influenza')
+    assert {'fever', 'cough', 'chills'} <= set(flu[3])
+    # 1003 CSV rows, merged to one entry per disease name
+    assert len(m.records) == 123
+
+
+def test_typo_corrector_matches_difflib_cutoff():
+    c = TypoCorrector(['headache', 'nausea', 'fever', 'vomiting'])
+    assert c.correct('headche') == 'headache'
+    assert c.correct('vomitting') == 'vomiting'
+    assert c.correct('fever') == 'fever'
+    assert c.correct('xyz') is None
+    # repeated lookups are served from the LRU
+    assert c.correct('headche') == 'headache'
+    assert 'headche' in c._cache
+
+
+def test_long_random_tokens_are_not_corrected():
+    import random
+    import time
+
+    rng = random.Random(0)
+    token = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(800))
+    c = TypoCorrector(['headache', 'nausea', 'fever', 'vomiting'])
+    start = time.perf_counter()
+    assert c.correct(token) is None
+    assert c.correct('headache' + 'x' * 3) is None
+    m = DiseaseMatcher(use_artifact=False)
+    m.fit_from_csv('data/diseases.csv')
+    # many medium-length junk tokens: only the first few hundred characters are corrected
+    junk = ' '.join(''.join(rng.choice('abcdefghij') for _ in range(12)) for _ in range(400))
+    m.match(token + ' fever ' + junk)
+    assert time.perf_counter() - start < 2.0
+
+
+def test_sparse_and_dense_scoring_agree():
+    sparse = DiseaseMatcher()
+    sparse.fit_from_csv('data/diseases.csv')
+    dense = DiseaseMatcher(scoring='dense')
+    dense.fit_from_csv('data/diseases.csv')
+    for query in ['fever cough', 'headache nausea', 'itchy eyes sneezing', 'zzzz']:
+        for top_k, threshold in [(3, 0.2), (10, 0.0)]:
+            a = sparse.match(query, top_k=top_k, threshold=threshold)
+            b = dense.match(query, top_k=top_k, threshold=threshold)
+            assert [r[0] for r in a] == [r[0] for r in b]
+            assert all(abs(x[1] - y[1]) < 1e-12 for x, y in zip(a, b))
+
+
+def test_match_many_matches_single_queries():
+    m = DiseaseMatcher()
+    m.fit_from_csv('data/diseases.csv')
+    queries = ['fever cough', 'headache nausea', 'sneezing runny nose', '', 'vomitting']
+    batch = m.match_many(queries, top_k=5, threshold=0.0, chunk_size=2)
+    assert len(batch) == len(queries)
+    for q, got in zip(queries, batch):
+        expected = m.match(q, top_k=5, threshold=0.0)
+        assert [r[0] for r in got] == [r[0] for r in expected]
+        assert [r[3] for r in got] == [r[3] for r in expected]
+
+
+def test_match_many_prepares_and_scores_repeated_queries_once(monkeypatch):
+    m = DiseaseMatcher(cache_size=0)
+    m.fit_from_csv('data/diseases.csv')
+    prepared, selected = [], []
+    prepare, select = m._prepare_query, m._select
+    monkeypatch.setattr(m, '_prepare_query', lambda model, q: prepared.append(q) or prepare(model, q))
+    monkeypatch.setattr(m, '_select', lambda *args: selected.append(args[1]) or select(*args))
+    queries = ['fever cough', 'headache', 'fever cough', 'Fever,  COUGH', 'headache']
+    batch = m.match_many(queries, top_k=3, threshold=0.0)
+    assert prepared == ['fever cough', 'headache', 'Fever,  COUGH']
+    assert len(selected) == 2
+    assert batch[0] == batch[2] == batch[3] == m.match('fever cough', top_k=3, threshold=0.0)
+    # repeats get their own lists, not the first answer's
+    batch[0][0][3].append('changed')
+    assert batch[2] == batch[3] != batch[0]
+
+
+def test_match_many_splits_chunks_by_product_budget(monkeypatch):
+    import src.matcher as matcher_module
+    queries = ['fever cough', 'headache nausea', 'sneezing runny nose', '', 'fever fever chills']
+    for scoring in ('sparse', 'dense'):
+        m = DiseaseMatcher(scoring=scoring)
+        m.fit_from_csv('data/diseases.csv')
+        expected = m.match_many(queries, top_k=5, threshold=0.0)
+        m.cache.clear()
+        # every block holds a single query; one over the budget still gets scored
+        monkeypatch.setattr(matcher_module, '_PRODUCT_BUDGET', 1)
+        assert m.match_many(queries, top_k=5, threshold=0.0) == expected
+        monkeypatch.undo()
+    assert matcher_module._budget_slices([3, 3, 3, 10, 1], 6) == [(0, 2), (2, 3), (3, 4), (4, 5)]
+
+
+def test_artifact_is_reused_and_rebuilt_on_change(tmp_path):
+    csv_path = tmp_path / 'diseases.csv'
+    csv_path.write_text(
+        'disease,symptoms,tips\n'
+        'Common Cold,sneezing; cough; runny nose,Rest\n'
+        'Migraine,headache; nausea,Dark room\n',
+        encoding='utf-8',
+    )
+    first = DiseaseMatcher()
+    first.fit_from_csv(str(csv_path))
+    assert (tmp_path / 'diseases.csv.matcher' / 'current.json').exists()
+
+    second = DiseaseMatcher()
+    second.fit_from_csv(str(csv_path))
+    # served from the memory-mapped artifact, not refitted
+    assert not second.tfidf_matrix.data.flags.writeable
+    assert second.match('headache nausea', top_k=1) == first.match('headache nausea', top_k=1)
+
+    csv_path.write_text(csv_path.read_text(encoding='utf-8') + 'Influenza,fever; chills,Fluids\n', encoding='utf-8')
+    third = DiseaseMatcher()
+    third.fit_from_csv(str(csv_path))
+    # refitted, published as a new generation and then served mapped as well
+    assert third.model.artifact != second.model.artifact
+    assert third.model.generation == second.model.generation + 1
+    assert len(third.records) == 3
+    builds = [p for p in (tmp_path / 'diseases.csv.matcher').iterdir() if p.is_dir()]
+    assert len(builds) == 1
+
+
+def test_artifact_builds_with_other_options_are_kept(tmp_path):
+    csv_path = tmp_path / 'diseases.csv'
+    csv_path.write_text('disease,symptoms,tips\nFlu,fever,Rest\nflu,cough,Tea\n', encoding='utf-8')
+    root = tmp_path / 'diseases.csv.matcher'
+    merged, raw = DiseaseMatcher(), DiseaseMatcher(canonicalize=False)
+    merged.fit_from_csv(str(csv_path))
+    raw.fit_from_csv(str(csv_path))
+    assert sorted(p.name for p in root.iterdir() if p.is_dir()) == sorted([merged.model.artifact, raw.model.artifact])
+
+    # the other configuration maps its build instead of refitting
+    again = DiseaseMatcher()
+    again.fit_from_csv(str(csv_path))
+    assert again.model.artifact == merged.model.artifact and not again.tfidf_matrix.data.flags.writeable
+
+    # a new build replaces only the older build made with the same options
+    csv_path.write_text(csv_path.read_text(encoding='utf-8') + 'Mumps,swelling,Ice\n', encoding='utf-8')
+    newer = DiseaseMatcher()
+    newer.fit_from_csv(str(csv_path))
+    assert sorted(p.name for p in root.iterdir() if p.is_dir()) == sorted([newer.model.artifact, raw.model.artifact])
+
+
+def test_watcher_swaps_in_new_snapshot(tmp_path):
+    import time
+
+    csv_path = tmp_path / 'diseases.csv'
+    csv_path.write_text('disease,symptoms,tips\nMigraine,headache; nausea,Dark room\n', encoding='utf-8')
+    m = DiseaseMatcher(use_artifact=False)
+    m.fit_from_csv(str(csv_path))
+    old_model = m.model
+    m.start_watcher(interval=0.02, debounce=0.05)
+    try:
+        csv_path.write_text(
+            'disease,symptoms,tips\nMigraine,headache; nausea,Dark room\nInfluenza,fever; chills,Fluids\n',
+            encoding='utf-8',
+        )
+        deadline = time.monotonic() + 5
+        while m.version == old_model.version and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        m.stop_watcher()
+    assert m.version > old_model.version
+    assert len(m.records) == 2
+    # the previous snapshot is untouched
+    assert len(old_model.records) == 1
+
+
+def test_result_cache_hits_and_invalidates_on_reload():
+    m = DiseaseMatcher()
+    m.fit_from_csv('data/diseases.csv')
+    first = m.match('fever cough', top_k=3)
+    # a misspelled/duplicated variant normalises to the same tokens
+    again = m.match('Fever, cough cough', top_k=3)
+    assert again == first
+    stats = m.status()['cache']
+    assert stats['hits'] == 1 and stats['misses'] == 1
+    m.reload()
+    assert m.status()['cache']['size'] == 0
+    assert m.match('fever cough', top_k=3) == first
+    assert m.status()['cache']['misses'] == 2
+
+
+def test_cached_results_are_not_shared_with_callers():
+    m = DiseaseMatcher()
+    m.fit_from_csv('data/diseases.csv')
+    expected = [(d, score, tips, list(matched)) for d, score, tips, matched in m.match('fever cough', top_k=3)]
+    for got in (m.match('fever cough', top_k=3), m.match_many(['fever cough'], top_k=3)[0]):
+        # a caller editing its results must not change what later hits return
+        got[0][3].append('tampered')
+        got.pop()
+    first = m.match('fever cough', top_k=3)
+    assert first == expected and m.match_many(['fever cough'], top_k=3)[0] == expected
+    assert m.status()['cache']['hits'] >= 3
+
+
+def test_hashing_feature_space_incremental_updates(tmp_path):
+    rows = [
+        ('Common Cold', 'sneezing; cough; runny nose', 'Rest'),
+        ('Migraine', 'headache; nausea; sensitivity to light', 'Dark room'),
+        ('Influenza', 'fever; chills; body aches', 'Fluids'),
+    ]
+    csv_path = tmp_path / 'diseases.csv'
+    csv_path.write_text(
+        'disease,symptoms,tips\n' + ''.join(f'{d},{s},{t}\n' for d, s, t in rows[:2]), encoding='utf-8')
+    inc = DiseaseMatcher(feature_space='hashing')
+    inc.fit_from_csv(str(csv_path))
+    assert inc.add_diseases([rows[2]]) == 1
+
+    full_csv = tmp_path / 'full.csv'
+    full_csv.write_text(
+        'disease,symptoms,tips\n' + ''.join(f'{d},{s},{t}\n' for d, s, t in rows), encoding='utf-8')
+    full = DiseaseMatcher(use_artifact=False)
+    full.fit_from_csv(str(full_csv))
+    for query in ['fever chills', 'headache', 'cough fever']:
+        a = inc.match(query, top_k=3, threshold=0.0)
+        b = full.match(query, top_k=3, threshold=0.0)
+        assert [r[0] for r in a] == [r[0] for r in b]
+        assert all(abs(x[1] - y[1]) < 0.01 for x, y in zip(a, b))
+
+    assert inc.remove_diseases(['migraine']) == 1
+    assert inc.find_by_name('Migraine') == []
+    assert 'Migraine' not in [r[0] for r in inc.match('headache nausea', top_k=3, threshold=0.0)]
+    assert inc.status()['entries'] == 2
+
+    # a reload of the same CSV applies only the row differences
+    csv_path.write_text(full_csv.read_text(encoding='utf-8'), encoding='utf-8')
+    inc.reload()
+    assert sorted(d for d, _, _ in inc.find_by_name('')) == ['Common Cold', 'Influenza', 'Migraine']
+
+
+def test_hashing_views_keep_their_rows_across_updates_and_compaction():
+    from src.incremental import HashingIndex
+
+    index = HashingIndex(compact_ratio=0.5)
+    index.add(['fever chills', 'fever cough', 'headache nausea', 'rash itching'])
+    before = index.view()
+    q = index.vectorizer.transform(['fever'])
+    assert index.remove([0]) == 1
+    index.add(['fever aches'])
+    after = index.view()
+    assert before.score(q)[0].tolist() == [0, 1]
+    assert after.score(q)[0].tolist() == [1, 4]
+    assert (before.n_live, after.n_live) == (4, 4)
+    assert (before.is_live(0), after.is_live(0), before.is_live(4)) == (True, False, False)
+
+    postings = index.postings
+    assert index.remove([1, 2]) == 2
+    # over half of the postings entries are tombstones now, so they are rebuilt without them
+    assert index.postings is not postings
+    assert all(r not in (0, 1, 2) for p in index.postings.values() for r in p.rows[:p.n].tolist())
+    assert before.score(q)[0].tolist() == [0, 1]
+    assert after.score(q)[0].tolist() == [1, 4]
+    assert index.view().score(q)[0].tolist() == [4]
+    assert index.view().live_mask().tolist() == [False, False, False, True, True]
+
+
+def test_hashing_reload_indexes_changed_rows_before_dropping_old_ones(tmp_path):
+    csv_path = tmp_path / 'diseases.csv'
+    csv_path.write_text('disease,symptoms,tips\nFlu,fever; chills,Rest\nMigraine,headache,Dark room\n',
+                        encoding='utf-8')
+    inc = DiseaseMatcher(feature_space='hashing')
+    inc.fit_from_csv(str(csv_path))
+    index = inc.model.index.base
+    add = index.add
+    during = []
+
+    def add_and_query(texts):
+        during.append(([d for d, _, _ in inc.find_by_name('flu', exact=True)],
+                       [r[0] for r in inc.match('fever', top_k=3, threshold=0.1)]))
+        return add(texts)
+
+    index.add = add_and_query
+    csv_path.write_text('disease,symptoms,tips\nFlu,fever; cough,Fluids\nMigraine,headache,Dark room\n',
+                        encoding='utf-8')
+    inc.reload()
+    assert during == [(['Flu'], ['Flu'])]
+    assert inc.find_by_name('flu', exact=True) == [('Flu', 'fever; cough', 'Fluids')]
+    assert inc.status()['entries'] == 2
+
+
+def test_chunked_fit_matches_whole_file_tfidf():
+    import pandas as pd
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    m = DiseaseMatcher(use_artifact=False, chunk_size=97, canonicalize=False)
+    m.fit_from_csv('data/diseases.csv')
+    df = pd.read_csv('data/diseases.csv')
+    texts = [m.expander.expand(m._normalize_text(s)) for s in df['symptoms'].fillna('')]
+    ref = TfidfVectorizer(ngram_range=(1, 2), stop_words='english')
+    expected = ref.fit_transform(texts)
+    assert list(m.vectorizer.get_feature_names_out()) == list(ref.get_feature_names_out())
+    assert abs(expected - m.tfidf_matrix).max() < 1e-12
+    assert m.records[500].disease == df['disease'][500]
+
+
+def test_canonicalize_merges_rows_by_disease_name(tmp_path):
+    csv_path = tmp_path / 'diseases.csv'
+    csv_path.write_text(
+        'disease,symptoms,tips,,\n'
+        'Flu,fever; cough,Rest,,\n'
+        'Migraine,headache,Dark room,,\n'
+        ' flu ,Cough; chills,Rest; fluids,,\n', encoding='utf-8')
+    m = DiseaseMatcher(use_artifact=False)
+    m.fit_from_csv(str(csv_path))
+    assert [(r.disease, r.symptoms, r.tips) for r in m.records] == [
+        ('Flu', 'fever; cough; chills', 'Rest; fluids'),
+        ('Migraine', 'headache', 'Dark room'),
+    ]
+    status = m.status()
+    assert (status['source_rows'], status['entries'], status['merged_rows']) == (3, 2, 1)
+    assert len(status['dropped_columns']) == 2
+    assert m.tfidf_matrix.shape[0] == 2
+
+    raw = DiseaseMatcher(use_artifact=False, canonicalize=False)
+    raw.fit_from_csv(str(csv_path))
+    assert len(raw.records) == 3
+
+    inc = DiseaseMatcher(feature_space='hashing')
+    inc.fit_from_csv(str(csv_path))
+    assert inc.add_diseases([('FLU', 'sore throat', 'Rest')]) == 1
+    assert inc.find_by_name('flu', exact=True) == [('Flu', 'fever; cough; chills; sore throat', 'Rest; fluids')]
+    assert inc.status()['entries'] == 2
+
+
+def test_catalog_merger_merges_across_batches_and_hash_collisions(monkeypatch):
+    import src.matcher as matcher_module
+    batches = [
+        (['Flu', 'Cold', '', 'FLU '], ['fever; cough', 'sneezing', 'x', 'Cough; chills'], ['Rest', 'Tea', '', 'Fluids']),
+        (['cold', '', 'Mumps', 'flu'], ['runny nose', 'y', 'swelling', 'aches'], ['', '', 'Ice', 'Rest']),
+    ]
+    expected = [
+        ('Flu', 'fever; cough; chills; aches', 'Rest; Fluids'),
+        ('Cold', 'sneezing; runny nose', 'Tea'),
+        ('', 'x', ''),
+        ('', 'y', ''),
+        ('Mumps', 'swelling', 'Ice'),
+    ]
+    for collide in (False, True):
+        if collide:
+            # every name hashes alike: rows must still be grouped by the name itself
+            monkeypatch.setattr(matcher_module, 'hash', lambda key: 0, raising=False)
+        merger = matcher_module.CatalogMerger()
+        for batch in batches:
+            merger.add(*batch)
+        assert (merger.rows_in, len(merger)) == (8, 5)
+        assert list(merger.rows()) == expected
+
+
+def test_shared_followers_switch_to_the_leaders_generation(tmp_path):
+    csv_path = tmp_path / 'diseases.csv'
+    csv_path.write_text('disease,symptoms,tips\nMigraine,headache; nausea,Dark room\n', encoding='utf-8')
+    leader, follower = DiseaseMatcher(), DiseaseMatcher()
+    leader.fit_from_csv(str(csv_path))
+    follower.fit_from_csv(str(csv_path))
+    try:
+        assert leader.start_shared(interval=60)
+        assert not follower.start_shared(interval=60)
+        assert follower.status()['shared_role'] == 'follower'
+        assert not follower.sync_shared()
+
+        csv_path.write_text(csv_path.read_text(encoding='utf-8') + 'Influenza,fever; chills,Fluids\n', encoding='utf-8')
+        leader.reload()
+        assert follower.sync_shared()
+        assert follower.model.artifact == leader.model.artifact
+        assert follower.status()['generation'] == leader.status()['generation'] == 2
+        assert follower.find_by_name('influenza', exact=True)
+        assert not follower.tfidf_matrix.data.flags.writeable
+    finally:
+        leader.stop_watcher()
+        follower.stop_watcher()
+
+
+def test_no_process_leads_without_file_locks(tmp_path, monkeypatch):
+    import src.artifact as artifact
+    root = tmp_path / 'diseases.csv.matcher'
+    first = artifact.try_leader_lock(root)
+    assert first is not None and artifact.try_leader_lock(root) is None
+    first.close()
+    monkeypatch.setattr(artifact, 'fcntl', None)
+    monkeypatch.setattr(artifact, 'msvcrt', None)
+    assert artifact.try_leader_lock(root) is None
+
+
+def test_lsa_backend_round_trips_through_the_artifact(tmp_path):
+    csv_path = tmp_path / 'diseases.csv'
+    csv_path.write_text(Path('data/diseases.csv').read_text(encoding='utf-8'), encoding='utf-8')
+    fitted = DiseaseMatcher(scoring='lsa', lsa_components=32)
+    fitted.fit_from_csv(str(csv_path))
+    mapped = DiseaseMatcher(scoring='lsa', lsa_components=32)
+    mapped.fit_from_csv(str(csv_path))
+    assert not mapped.model.lsa.embeddings.flags.writeable
+    assert mapped.model.lsa.embeddings.shape == (123, 32)
+
+    queries = ['runny nose', 'itchy eyes and sneezing', 'fever chills']
+    assert mapped.match_many(queries) == [fitted.match(q) for q in queries]
+    # probing every list is an exhaustive search of the embeddings
+    lsa = mapped.model.lsa
+    q = lsa.embed(mapped.vectorizer.transform(['runny nose']))[0]
+    rows, sims = lsa.search(q, nprobe=lsa.n_lists)
+    assert np.allclose(np.sort(sims), np.sort(lsa.embeddings @ q))
+    assert mapped.match('runny nose')[0][0].startswith(('Common Cold', 'Allergic Rhinitis', 'Sinusitis'))
+
+
+def test_stage_timings_are_recorded_only_when_enabled():
+    from src.timing import Histogram
+
+    m = DiseaseMatcher(cache_size=0)
+    m.fit_from_csv('data/diseases.csv')
+    m.match('fever cough')
+    assert set(m.stats()) == {'fit'}
+
+    m.timer.enabled = True
+    m.match('fever cough')
+    m.match_many(['headache', 'rash'])
+    m.find_by_name('cold')
+    stats = m.stats()
+    assert {'normalize', 'expand', 'tokenize', 'correct', 'transform', 'score', 'results', 'match',
+            'batch.transform', 'batch.score', 'find'} <= set(stats)
+    assert stats['match']['count'] == 1
+    assert stats['match']['p50_ms'] <= stats['match']['max_ms']
+
+    hist = Histogram()
+    for ms in range(1, 101):
+        hist.add(ms / 1000)
+    assert abs(hist.percentile(50) - 0.050) / 0.050 < 0.1
+    assert abs(hist.percentile(99) - 0.099) / 0.099 < 0.1